@@ -91,7 +91,7 @@ ipcMain.handle('python:getVideoInfo', async (event, { videoPath }) => {
 });
 
 // Python backend communication
-ipcMain.handle('python:getPreview', async (event, { fitPath, videoPath, timestamp, config }) => {
+ipcMain.handle('python:getPreview', async (event, { fitPath, videoPath, timestamp, config, maxWidth, maxHeight, offset }) => {
     return new Promise((resolve, reject) => {
         const pythonScript = path.join(__dirname, 'src/api/preview_server.py');
         const venvPython = path.join(__dirname, '.venv/bin/python');
@@ -103,6 +103,10 @@ ipcMain.handle('python:getPreview', async (event, { fitPath, videoPath, timestam
             '--timestamp', timestamp.toString(),
             '--config', JSON.stringify(config)
         ];
+        // Render at the display size instead of the full source resolution
+        if (maxWidth) args.push('--max-width', String(maxWidth));
+        if (maxHeight) args.push('--max-height', String(maxHeight));
+        if (offset !== undefined && offset !== null) args.push('--offset', String(offset));
 
         const proc = spawn(venvPython, args);
         let stdout = '';
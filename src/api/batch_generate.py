@@ -0,0 +1,235 @@
+"""
+Batch video generation: many clips from one ride against a single FIT file.
+Called from the command line or the job runner.
+Reports progress via stdout (same PROGRESS:/STATUS: protocol as generate.py).
+
+The FIT file is parsed once while all clips are probed in parallel, and every
+clip's overlay chunks go through one shared worker pool. Workers keep their
+render assets (map background, elevation profile, fonts) across clips.
+Each clip is composited as soon as its last chunk is rendered, overlapping
+encoding with the rendering of the remaining clips.
+"""
+import sys
+import os
+import glob
+import argparse
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.api.generate import (
+    get_video_metadata, init_worker, make_render_spec, render_overlay_chunk,
+    compute_sync_offset, telemetry_span, plan_chunks, plan_layers, prepare_chunks, record_chunk,
+    concat_layers, cleanup_job, build_encode_opts, has_overlay_cuda,
+    composite_command, run_ffmpeg_with_progress,
+)
+from src.core.extract import parse_fit
+from src.core.metrics import add_metrics
+from src.core import manifest as chunk_manifest
+from src.core.cache import ChunkCache, DEFAULT_CHUNK_CACHE_GB
+from src.core.workspace import job_id_for, make_scratch_dir, remove_dir
+from src.core.framepipe import DEFAULT_RING_FRAMES
+from src.core.metadata import VIDEO_EXTENSIONS
+
+_report_lock = threading.Lock()
+
+
+def report_progress(percent, status=""):
+    """Thread-safe progress report (composites run in background threads)."""
+    with _report_lock:
+        if status:
+            print(f"STATUS:{status}", flush=True)
+        print(f"PROGRESS:{percent}", flush=True)
+
+
+def expand_videos(patterns):
+    """Expand file paths, directories and glob patterns into a sorted, de-duplicated clip list."""
+    videos = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                       if name.lower().endswith(VIDEO_EXTENSIONS)]
+        else:
+            matches = glob.glob(pattern) or [pattern]
+        videos.extend(os.path.abspath(m) for m in matches)
+    return sorted(set(videos))
+
+
+def render_batch_chunk(args):
+    """Pool task: render one chunk of one clip, tagging the result with the clip index."""
+    clip_idx, task = args
+    return clip_idx, render_overlay_chunk(task)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fit', required=True, help='Path to FIT file')
+    parser.add_argument('--videos', required=True, nargs='+',
+                        help='Video files, directories or glob patterns (e.g. "DCIM/*_D.MP4")')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Directory for outputs (default: next to each clip)')
+    parser.add_argument('--suffix', type=str, default='_overlay', help='Suffix added to each output name')
+    parser.add_argument('--config', type=str, default='{}', help='JSON config')
+    parser.add_argument('--quality', type=str, default='crf', help='Quality mode: crf, match or preview')
+    parser.add_argument('--processes', type=int, default=8, help='Size of the shared render worker pool')
+    parser.add_argument('--frame-buffers', type=int, default=DEFAULT_RING_FRAMES,
+                        help='Frames each worker keeps in flight to its encoder (bounds worker memory)')
+    parser.add_argument('--probe-workers', type=int, default=8, help='Parallel ffprobe calls')
+    parser.add_argument('--composite-jobs', type=int, default=1, help='Clips composited at the same time')
+    parser.add_argument('--keep-chunks', action='store_true',
+                        help='Keep rendered chunks after success so later runs can reuse them')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Shared overlay chunk cache directory')
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_CHUNK_CACHE_GB,
+                        help='Disk cap for the shared chunk cache (LRU eviction)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the shared chunk cache')
+    parser.add_argument('--widget-streams', action='store_true',
+                        help='Render and cache each widget as its own overlay stream')
+    parser.add_argument('--tmpfs', action='store_true',
+                        help='Put concat intermediates on a RAM disk (/dev/shm) when available')
+    args = parser.parse_args()
+
+    config = json.loads(args.config)
+    quality_mode = args.quality.lower()
+
+    videos = expand_videos(args.videos)
+    if not videos:
+        print("No video clips matched", file=sys.stderr)
+        sys.exit(1)
+    report_progress(2, f"Batch: {len(videos)} clips")
+
+    # Probe every clip in parallel while the FIT file is parsed (once) on this thread
+    report_progress(5, "Parsing FIT data and probing clips...")
+    with ThreadPoolExecutor(max_workers=max(1, args.probe_workers)) as executor:
+        probes = {video: executor.submit(get_video_metadata, video) for video in videos}
+        df = parse_fit(args.fit)
+        metadata = {}
+        for video, future in probes.items():
+            try:
+                metadata[video] = future.result()
+            except Exception as e:
+                report_progress(5, f"Skipping {os.path.basename(video)}: probe failed ({e})")
+    df = add_metrics(df, config)
+
+    track_hash = chunk_manifest.hash_track(df)
+    chunk_cache = None
+    if not args.no_cache:
+        chunk_cache = ChunkCache(args.cache_dir, max_bytes=int(args.cache_max_gb * 1024**3))
+
+    # Plan every clip up front so the pool sees all the work at once
+    clips = []
+    scratch_dirs = []
+    try:
+        for video in videos:
+            if video not in metadata:
+                continue
+            w, h, duration, fps, creation_time, source_bitrate = metadata[video]
+            offset, sync_message = compute_sync_offset(df, creation_time)
+            name = os.path.basename(video)
+            report_progress(8, f"{name}: {w}x{h}, {duration:.1f}s @ {fps:.1f}fps. {sync_message}")
+            span = telemetry_span(df, offset, 0, duration, fps)
+            if span is None:
+                report_progress(8, f"Skipping {name}: recorded outside the activity")
+                continue
+
+            if quality_mode == 'preview':
+                # Force 360p resolution for generation
+                w, h = 640, 360
+            layout_scale = h / 1080.0
+            spec = make_render_spec(w, h, fps, offset, layout_scale, args.frame_buffers)
+
+            out_dir = args.output_dir or os.path.dirname(video)
+            os.makedirs(out_dir, exist_ok=True)
+            output = os.path.join(out_dir, os.path.splitext(name)[0] + args.suffix + ".mp4")
+            work_dir = os.path.splitext(output)[0] + ".chunks"
+            scratch_dir, _ = make_scratch_dir(job_id_for(output), work_dir, use_tmpfs=args.tmpfs)
+            scratch_dirs.append(scratch_dir)
+
+            chunks = plan_chunks(span[1], start_time=span[0])
+            layers = plan_layers(config, w, h, layout_scale, widget_streams=args.widget_streams)
+            plan = prepare_chunks(df, spec, layers, chunks, work_dir, chunk_cache, track_hash)
+            clips.append({
+                'name': name, 'video': video, 'output': output, 'duration': duration,
+                'bitrate': source_bitrate, 'span': span, 'chunks': chunks, 'layers': layers,
+                'plan': plan, 'scratch_dir': scratch_dir, 'remaining': len(plan['pending']),
+            })
+
+        total_chunks = max(1, sum(len(c['plan']['expected']) for c in clips))
+        reused = sum(len(c['plan']['files']) for c in clips)
+        rendered = reused
+        finished = 0
+        failures = []
+        state_lock = threading.Lock()
+        report_progress(10, f"Reusing {reused}/{total_chunks} overlay chunks across {len(clips)} clips")
+
+        # Preview uses the pure CPU pipeline (see generate.py)
+        use_gpu_overlay = has_overlay_cuda() and quality_mode != 'preview'
+
+        def overall_progress():
+            # 10-70%: rendering all chunks, 70-99%: compositing clips
+            return min(99, 10 + int(rendered / total_chunks * 60) + int(finished / max(1, len(clips)) * 29))
+
+        def composite_clip(clip):
+            nonlocal finished
+            try:
+                layer_streams = concat_layers(clip['plan'], clip['layers'], clip['chunks'], clip['scratch_dir'])
+                encode_opts, _ = build_encode_opts(quality_mode, clip['bitrate'])
+                cmd = composite_command(clip['video'], clip['layers'], layer_streams, clip['output'],
+                                        quality_mode, encode_opts, use_gpu_overlay, overlay_span=clip['span'])
+                run_ffmpeg_with_progress(cmd)
+                cleanup_job(clip['plan'], layer_streams, keep_chunks=args.keep_chunks)
+                with state_lock:
+                    finished += 1
+                    progress = overall_progress()
+                report_progress(progress, f"Finished {clip['name']} ({finished}/{len(clips)} clips)")
+            except Exception as e:
+                with state_lock:
+                    failures.append(clip['name'])
+                    finished += 1
+                report_progress(overall_progress(), f"Failed {clip['name']}: {e}")
+            finally:
+                # Layer streams and concat intermediates; the chunks stay for a resume
+                remove_dir(clip['scratch_dir'])
+
+        tasks = [(ci, task) for ci, clip in enumerate(clips) for task in clip['plan']['pending']]
+        report_progress(10, f"Rendering {len(tasks)} overlay chunks with one shared pool...")
+
+        with ThreadPoolExecutor(max_workers=max(1, args.composite_jobs)) as compositor:
+            # Clips that are fully reused can be composited right away
+            for clip in clips:
+                if clip['remaining'] == 0:
+                    compositor.submit(composite_clip, clip)
+
+            if tasks:
+                with multiprocessing.Pool(
+                    processes=max(1, args.processes),
+                    initializer=init_worker,
+                    initargs=(df,)
+                ) as pool:
+                    for ci, (key, result) in pool.imap_unordered(render_batch_chunk, tasks):
+                        clip = clips[ci]
+                        record_chunk(clip['plan'], key, result, chunk_cache)
+                        clip['remaining'] -= 1
+                        with state_lock:
+                            rendered += 1
+                            progress = overall_progress()
+                        report_progress(progress, f"Rendering overlay: {rendered}/{total_chunks} chunks complete")
+                        if clip['remaining'] == 0:
+                            report_progress(progress, f"Compositing {clip['name']}...")
+                            compositor.submit(composite_clip, clip)
+    finally:
+        # A failed chunk render aborts the batch; never leave scratch dirs (or RAM disk space) behind
+        for scratch_dir in scratch_dirs:
+            remove_dir(scratch_dir)
+
+    if failures:
+        report_progress(100, f"Done with errors: {len(failures)} clip(s) failed ({', '.join(failures)})")
+        sys.exit(1)
+    report_progress(100, f"Complete! {len(clips)} clips written")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,34 +2,35 @@
 Calculate synchronization offset between Video and FIT file.
 Called from Electron/Web Server.
 Output: JSON { offset: float, video_created: str, fit_start: str }
+
+With --auto the creation_time estimate is refined by matching the video's motion
+against the FIT speed (see src/core/autosync.py); the output then also carries
+estimate, correction and confidence, and method is 'motion' when the match is
+trusted ('creation_time' otherwise).
+
+With --camera the offset comes from telemetry the camera embedded in the clip
+(DJI SRT track, GoPro GPMF) when it has any (see src/core/camera_telemetry.py):
+method is then 'camera_gps' or 'camera_time', with source and error_m. It is
+tried before --auto.
 """
 import sys
 import os
 import json
 import argparse
 import datetime
-import subprocess
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from src.core.extract import parse_fit
+from src.core.metadata import probe_video, creation_datetime
+from src.core.autosync import refine_offset, MIN_CONFIDENCE, DEFAULT_SEARCH_WINDOW
+from src.core.camera_telemetry import sync_from_camera
 
 def get_video_creation_time(video_path):
     """Extract creation_time from video metadata."""
     try:
-        cmd = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0",
-            "-show_entries", "format_tags=creation_time",
-            "-of", "json", video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        info = json.loads(result.stdout)
-        creation_time_str = info.get('format', {}).get('tags', {}).get('creation_time', None)
-        
-        if creation_time_str:
-            # Handle Z for UTC
-            return datetime.datetime.fromisoformat(creation_time_str.replace('Z', '+00:00'))
+        return creation_datetime(probe_video(video_path))
     except Exception as e:
         sys.stderr.write(f"Metadata error: {e}\n")
     return None
@@ -38,12 +39,19 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--fit', required=True, help='Path to FIT file')
     parser.add_argument('--video', required=True, help='Path to video file')
+    parser.add_argument('--auto', action='store_true',
+                        help='Refine the offset by correlating video motion with FIT speed')
+    parser.add_argument('--window', type=float, default=DEFAULT_SEARCH_WINDOW,
+                        help='Seconds searched either side of the creation_time estimate (with --auto/--camera)')
+    parser.add_argument('--camera', action='store_true',
+                        help='Sync from GPS/time telemetry embedded by the camera (DJI SRT, GoPro GPMF)')
     args = parser.parse_args()
     
     result = {
         'offset': 0,
         'video_created': None,
         'fit_start': None,
+        'method': 'creation_time',
         'success': False,
         'message': ''
     }
@@ -51,12 +59,12 @@ def main():
     try:
         # Get Video Time
         creation_time = get_video_creation_time(args.video)
-        if not creation_time:
+        if not creation_time and not (args.auto or args.camera):
             result['message'] = 'Could not extract creation time from video'
             print(json.dumps(result))
             return
 
-        result['video_created'] = creation_time.isoformat()
+        result['video_created'] = creation_time.isoformat() if creation_time else None
         
         # Get FIT Time
         df = parse_fit(args.fit)
@@ -72,9 +80,37 @@ def main():
         result['fit_start'] = fit_start.isoformat()
         
         # Calculate
-        offset = (creation_time - fit_start).total_seconds()
-        result['offset'] = offset
+        offset = (creation_time - fit_start).total_seconds() if creation_time else None
+        result['offset'] = offset or 0
         result['success'] = True
+
+        camera = None
+        if args.camera:
+            try:
+                camera = sync_from_camera(args.video, df, offset, args.window)
+            except Exception as e:
+                result['message'] = f'Camera telemetry unreadable: {e}'
+        if camera:
+            result.update(camera)
+            result['estimate'] = offset
+            result['correction'] = None if offset is None else camera['offset'] - offset
+            result['success'] = True
+        elif args.auto:
+            # Without creation_time the whole activity is searched
+            match = refine_offset(args.video, df, offset, args.window)
+            if match and match['confidence'] >= MIN_CONFIDENCE:
+                result.update(match)
+                result['method'] = 'motion'
+            elif offset is None:
+                result['success'] = False
+                result['message'] = 'No creation time and no reliable motion match'
+            else:
+                result['message'] = 'Motion match not reliable; using creation time'
+                if match:
+                    result['confidence'] = match['confidence']
+        elif offset is None:
+            result['success'] = False
+            result['message'] = 'No creation time and no usable camera telemetry'
         
     except Exception as e:
         result['message'] = str(e)
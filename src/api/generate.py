@@ -8,135 +8,259 @@ import os
 import json
 import argparse
 import datetime
-
-# Ensure FFmpeg is found
-os.environ["IMAGEIO_FFMPEG_EXE"] = "/usr/bin/ffmpeg"
+import math
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from moviepy import VideoClip
 import numpy as np
 import pandas as pd
 import multiprocessing
 import subprocess
+import shutil
 import time
 
 from src.core.extract import parse_fit
-from src.core.overlay import create_frame_rgba
+from src.core.metrics import add_metrics
+from src.core.overlay import (
+    create_frame_rgba, WIDGETS, TRACK_WIDGETS,
+    get_widget_cfg, widget_config, widget_key, widget_columns, widget_region, chart_column, track_color_column,
+)
+from src.core import manifest as chunk_manifest
+from src.core.cache import ChunkCache, DEFAULT_CHUNK_CACHE_GB
+from src.core.workspace import job_id_for, make_scratch_dir, remove_dir
+from src.core.timecode import shift_timecode
+from src.core.metadata import probe_video, creation_datetime
+from src.core.autosync import refine_offset, MIN_CONFIDENCE
+from src.core.camera_telemetry import sync_from_camera
+from src.core.framepipe import (
+    DEFAULT_RING_FRAMES, QTRLE_OPTS, chunk_frame_range, rawvideo_writer_command, encode_frames,
+    SharedFrameRing, attach_ring, stream_shared_ring,
+)
 
 
 def get_video_metadata(path):
-    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", 
-           "-show_entries", "stream=width,height,duration,avg_frame_rate,bit_rate:format=bit_rate:format_tags=creation_time", 
-           "-of", "json", path]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    info = json.loads(result.stdout)
-    stream = info['streams'][0]
-    w, h, dur = int(stream['width']), int(stream['height']), float(stream['duration'])
-    
-    # Try to get creation_time
-    creation_time_str = info.get('format', {}).get('tags', {}).get('creation_time', None)
-    creation_time = None
-    if creation_time_str:
-        # ISO format: 2026-01-29T04:06:37.000000Z
-        try:
-             # Handle Z for UTC
-            creation_time = datetime.datetime.fromisoformat(creation_time_str.replace('Z', '+00:00'))
-        except:
-            pass
+    """
+    (width, height, duration, fps, creation_time, bitrate) of a clip, from the
+    cached probe in src/core/metadata.py. The size is that of the decoded
+    (auto-rotated) frames the overlay is composited onto.
+    """
+    metadata = probe_video(path)
+    return (metadata['display_width'], metadata['display_height'], metadata['duration'],
+            metadata['fps'], creation_datetime(metadata), metadata['bitrate'])
 
-    fps_parts = stream['avg_frame_rate'].split('/')
-    fps = float(fps_parts[0]) / float(fps_parts[1]) if len(fps_parts) == 2 else float(fps_parts[0])
-    
-    # Get bitrate (prefer stream bitrate, fallback to format bitrate)
-    bitrate = None
-    if 'bit_rate' in stream and stream['bit_rate'] != 'N/A':
-        try:
-            bitrate = int(stream['bit_rate'])
-        except:
-            pass
-    if bitrate is None and 'format' in info and 'bit_rate' in info['format']:
-        try:
-            bitrate = int(info['format']['bit_rate'])
-        except:
-            pass
-    
-    return w, h, dur, fps, creation_time, bitrate
 
+# Length of each overlay chunk rendered by a worker
+CHUNK_DURATION = 30
+# Chunks shorter than this (range edges) are merged into a neighbour
+MIN_CHUNK_DURATION = 1.0
+# Seconds past either end of the FIT track that still count as covered (1Hz rows)
+TELEMETRY_TOLERANCE = 0.5
 
 # Globals for multiprocessing
 DF_GLOBAL = None
-META_W = 0
-META_H = 0
-META_FPS = 0
-OFFSET_SECONDS = 0
-VIDEO_PATH = None
-CONFIG = None
-LAYOUT_SCALE = 1.0
 
 
-def init_worker(df, w, h, fps, video_path, config, offset, l_scale):
-    global DF_GLOBAL, META_W, META_H, META_FPS, VIDEO_PATH, CONFIG, OFFSET_SECONDS, LAYOUT_SCALE
+def init_worker(df):
+    global DF_GLOBAL
     DF_GLOBAL = df
-    META_W = w
-    META_H = h
-    META_FPS = fps
-    VIDEO_PATH = video_path
-    CONFIG = config
-    OFFSET_SECONDS = offset
-    LAYOUT_SCALE = l_scale
+
+
+def make_render_spec(w, h, fps, offset, layout_scale, ring_frames=DEFAULT_RING_FRAMES, chunk_format=None):
+    """
+    Per-video render parameters, sent with every chunk task so one worker pool
+    can render chunks for several videos (see batch_generate.py).
+    ring_frames bounds the frames a worker holds in flight to its encoder.
+    chunk_format encodes chunks straight in an OVERLAY_EXPORT_FORMATS codec
+    (overlay-only exports) instead of QuickTime RLE.
+    """
+    return {'width': w, 'height': h, 'fps': fps, 'offset': offset, 'layout_scale': layout_scale,
+            'ring_frames': ring_frames, 'chunk_format': chunk_format}
+
+
+def chunk_codec(spec):
+    """(file extension, ffmpeg video options) of a spec's chunks and layer streams."""
+    fmt = spec.get('chunk_format')
+    if fmt:
+        return OVERLAY_EXPORT_FORMATS[fmt][1], OVERLAY_EXPORT_FORMATS[fmt][2]
+    return ".mov", QTRLE_OPTS
 
 
 def render_overlay_chunk(args):
-    start_time, end_time, idx = args
-    duration = end_time - start_time
-    output_filename = f"temp_ovr_{idx:03d}.mov"
-
-    last_t = -1
-    last_img_rgba = None
-
-    def get_rgba_frame(t):
-        nonlocal last_t, last_img_rgba
-        if t != last_t:
-            absolute_t = start_time + t
-            time_into_activity = absolute_t + OFFSET_SECONDS
-            target_timestamp = DF_GLOBAL.index[0] + pd.Timedelta(seconds=time_into_activity)
+    spec, start_time, end_time, key, output_filename, layer_config, region = args
+    # Render to a partial file first so an interrupted job never leaves a
+    # truncated chunk that looks finished on restart.
+    base, ext = os.path.splitext(output_filename)
+    partial_filename = base + ".part" + ext
+    
+    # Per-widget layers are only as large as their region
+    if region:
+        width, height = region[2] - region[0], region[3] - region[1]
+    else:
+        width, height = spec['width'], spec['height']
+    first_frame, last_frame = chunk_frame_range(start_time, end_time, spec['fps'])
+    render_into = make_chunk_renderer(spec, first_frame, start_time, layer_config, region)
+
+    command = rawvideo_writer_command(partial_filename, width, height, spec['fps'], chunk_codec(spec)[1])
+    encode_frames(command, width, height, last_frame - first_frame, render_into,
+                  spec.get('ring_frames', DEFAULT_RING_FRAMES))
+    
+    os.replace(partial_filename, output_filename)
+    return key, output_filename
+
+
+def make_chunk_renderer(spec, first_frame, start_time, layer_config, region):
+    """
+    render_into(n, buf) for encode_frames: draws frame first_frame + n of a chunk
+    from DF_GLOBAL into buf. Holds one frame of pixels between calls.
+    """
+    fps = spec['fps']
+    last_idx = None
+    last_pixels = None
+
+    def render_into(n, buf):
+        nonlocal last_idx, last_pixels
+        absolute_t = (first_frame + n) / fps
+        time_into_activity = absolute_t + spec['offset']
+        target_timestamp = DF_GLOBAL.index[0] + pd.Timedelta(seconds=time_into_activity)
+        try:
+            idx_val = DF_GLOBAL.index.get_indexer([target_timestamp], method='nearest')[0]
+        except:
+            idx_val = None
+        
+        # The HUD only changes with the telemetry row (1Hz), so consecutive
+        # frames reading the same row reuse the last rendered pixels.
+        if last_pixels is None or idx_val != last_idx:
             try:
-                idx_val = DF_GLOBAL.index.get_indexer([target_timestamp], method='nearest')[0]
                 row = DF_GLOBAL.iloc[idx_val]
             except:
                 row = {}
             row_dict = row.to_dict() if isinstance(row, pd.Series) else {}
             row_dict['full_track_df'] = DF_GLOBAL
+            row_dict['track_index'] = idx_val
             
-            # Use calculated layout scale
-            scale_factor = LAYOUT_SCALE
-            
-            last_img_rgba = create_frame_rgba(t, row_dict, META_W, META_H, config=CONFIG, layout_scale=scale_factor)
-            last_t = t
-        return last_img_rgba
-
-    def make_frame_rgb(t):
-        return np.array(get_rgba_frame(t).convert('RGB'))
-
-    def make_mask(t):
-        return np.array(get_rgba_frame(t).split()[-1]) / 255.0
-
-    color_clip = VideoClip(make_frame_rgb, duration=duration)
-    mask_clip = VideoClip(make_mask, duration=duration)
-    final_clip = color_clip.with_mask(mask_clip)
-
-    final_clip.write_videofile(
-        output_filename, 
-        fps=META_FPS, 
-        codec='qtrle',  # QuickTime RLE: lossless RGBA, smaller than PNG
-        audio=False,
-        logger=None
-    )
-    
-    final_clip.close()
-    return output_filename
+            img = create_frame_rgba(absolute_t - start_time, row_dict, spec['width'], spec['height'],
+                                    config=layer_config, layout_scale=spec['layout_scale'], region=region)
+            last_pixels = np.asarray(img)
+            last_idx = idx_val
+        np.copyto(buf, last_pixels)
+
+    return render_into
+
+
+def plan_frame_runs(df, offset, first_frame, last_frame, fps):
+    """
+    Group frames [first_frame, last_frame) into runs that read the same telemetry row.
+    Returns a list of (row index, first frame of the run, frame count).
+    """
+    if last_frame <= first_frame:
+        return []
+    seconds = np.arange(first_frame, last_frame) / fps + offset
+    targets = df.index[0] + pd.to_timedelta(seconds, unit='s')
+    rows = df.index.get_indexer(targets, method='nearest')
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(rows)) + 1))
+    counts = np.diff(np.concatenate((starts, [len(rows)])))
+    return [(int(rows[s]), first_frame + int(s), int(c)) for s, c in zip(starts, counts)]
+
+
+def render_run_into_slot(args):
+    """Pool task for the shared ring: draw one telemetry row's HUD straight into a ring slot."""
+    handle, slot, (spec, layer_config, region, row_idx, t) = args
+    row_dict = DF_GLOBAL.iloc[row_idx].to_dict()
+    row_dict['full_track_df'] = DF_GLOBAL
+    row_dict['track_index'] = row_idx
+    img = create_frame_rgba(t, row_dict, spec['width'], spec['height'], config=layer_config,
+                            layout_scale=spec['layout_scale'], region=region)
+    np.copyto(attach_ring(handle).slot(slot), np.asarray(img))
+    return slot
+
+
+def render_layers_shared(pool, df, spec, layers, span, scratch_dir, slots, progress_callback=None):
+    """
+    Render each layer as one overlay stream through a SharedFrameRing: pool workers
+    draw into shared memory and this process feeds a single encoder in frame order,
+    so there are no per-chunk encoders and no concat step.
+    progress_callback(fraction) reports overall progress. Returns the stream paths.
+    """
+    fps = spec['fps']
+    first_frame, last_frame = chunk_frame_range(span[0], span[1], fps)
+    frame_runs = plan_frame_runs(df, spec['offset'], first_frame, last_frame, fps)
+    layer_streams = []
+    for li, (name, layer_config, region) in enumerate(layers):
+        if region:
+            width, height = region[2] - region[0], region[3] - region[1]
+        else:
+            width, height = spec['width'], spec['height']
+        ext, codec_opts = chunk_codec(spec)
+        stream = layer_stream_path(scratch_dir, name, ext)
+        runs = [((spec, layer_config, region, row, n / fps - span[0]), count) for row, n, count in frame_runs]
+        
+        def layer_progress(written, total):
+            if progress_callback:
+                progress_callback((li + written / float(total)) / len(layers))
+        
+        ring = SharedFrameRing(width, height, slots)
+        try:
+            stream_shared_ring(pool, ring, render_run_into_slot, runs,
+                               rawvideo_writer_command(stream, width, height, fps, codec_opts), layer_progress)
+        finally:
+            ring.close()
+        layer_streams.append(stream)
+    return layer_streams
+
+
+def plan_layers(config, w, h, layout_scale, widget_streams=False):
+    """
+    Split the overlay into independently rendered layers.
+    By default there is one full-frame layer. With widget_streams, every enabled
+    widget gets its own small layer, so a config change to one widget only
+    invalidates that widget's chunks.
+    Each layer is (name, layer_config, region) with region = (x0, y0, x1, y1) or None.
+    """
+    if not widget_streams:
+        return [('all', config, None)]
+    layers = []
+    for name in WIDGETS:
+        if not get_widget_cfg(config, name).get('enabled', True):
+            continue
+        region = widget_region(name, w, h, config, layout_scale)
+        layers.append((name, widget_config(config, name), region))
+    return layers
+
+
+def build_overlay_filter(layers, use_gpu_overlay, base_filter="", enable=None, base_size=None):
+    """
+    Build the filter graph that stacks each layer's overlay stream (inputs 1..N)
+    onto the source video (input 0) at the layer's position.
+    enable=(start, end) limits the overlay to that output time span; outside it
+    (and after an overlay stream ends) the source frames pass through untouched.
+    base_size=(w, h) scales the source to the size the overlays were rendered at.
+    """
+    if use_gpu_overlay:
+        # Hybrid Pipeline: CPU Decode -> GPU Overlay -> GPU Encode
+        size = f"{base_size[0]}:{base_size[1]}:" if base_size else ""
+        parts = [f"[0:v]format=yuv420p,hwupload_cuda,scale_cuda={size}format=yuv420p[base0]"]
+    else:
+        if base_size:
+            base_filter += f",scale={base_size[0]}:{base_size[1]}"
+        parts = [f"[0:v]format=yuv420p{base_filter}[base0]"]
+    # Overlay streams may be shorter than the source (no telemetry at the edges)
+    opts = ":eof_action=pass"
+    if enable and not use_gpu_overlay:
+        opts += f":enable='between(t,{enable[0]:.3f},{enable[1]:.3f})'"
+    for i, (_, _, region) in enumerate(layers):
+        x, y = (region[0], region[1]) if region else (0, 0)
+        out = "[out]" if i == len(layers) - 1 else f"[base{i + 1}]"
+        if use_gpu_overlay:
+            parts.append(f"[{i + 1}:v]format=rgba,hwupload_cuda[ovr{i}]")
+            parts.append(f"[base{i}][ovr{i}]overlay_cuda={x}:{y}{opts}{out}")
+        else:
+            fmt = ",format=yuv420p" if out == "[out]" else ""
+            parts.append(f"[{i + 1}:v]format=rgba[ovr{i}]")
+            parts.append(f"[base{i}][ovr{i}]overlay={x}:{y}{opts}{fmt}{out}")
+    if not layers:
+        parts[0] = parts[0].replace("[base0]", "[out]")
+    return ";".join(parts)
 
 
 def report_progress(percent, status=""):
@@ -146,14 +270,17 @@ def report_progress(percent, status=""):
     print(f"PROGRESS:{percent}", flush=True)
 
 
-def hierarchical_concat(files, output_file, batch_size=10, progress_callback=None):
+def hierarchical_concat(files, output_file, batch_size=10, progress_callback=None, temp_dir="."):
     """
     Concatenate files in a tree structure to avoid memory issues.
     Instead of concat([f0..f119]) at once, do:
       Round 1: concat f0..f9 -> batch0, f10..f19 -> batch1, ...
       Round 2: concat batch0..batch9 -> super0, ...
       Round 3: ...until one file remains
+    Intermediate batches are written to temp_dir (the job's scratch directory),
+    in the container of output_file.
     """
+    ext = os.path.splitext(output_file)[1]
     round_num = 0
     current_files = files[:]
     all_temp_files = []  # Track all intermediate files for cleanup
@@ -173,15 +300,15 @@ def hierarchical_concat(files, output_file, batch_size=10, progress_callback=Non
                 next_files.append(batch_files[0])
             else:
                 # Concatenate this batch
-                batch_output = f"temp_concat_r{round_num}_b{batch_idx}.mov"
+                batch_output = os.path.join(temp_dir, f"temp_concat_r{round_num}_b{batch_idx}{ext}")
                 all_temp_files.append(batch_output)
                 
                 # Write concat list
-                list_file = f"temp_concat_r{round_num}_b{batch_idx}.txt"
+                list_file = os.path.join(temp_dir, f"temp_concat_r{round_num}_b{batch_idx}.txt")
                 all_temp_files.append(list_file)
                 with open(list_file, 'w') as f:
                     for bf in batch_files:
-                        f.write(f"file '{bf}'\n")
+                        f.write(f"file '{os.path.abspath(bf)}'\n")
                 
                 # Run FFmpeg concat
                 subprocess.run(
@@ -197,7 +324,7 @@ def hierarchical_concat(files, output_file, batch_size=10, progress_callback=Non
         # Clean up files from previous round (except original input files)
         if round_num > 1:
             for f in current_files:
-                if f.startswith('temp_concat_') and os.path.exists(f):
+                if os.path.basename(f).startswith('temp_concat_') and os.path.exists(f):
                     os.remove(f)
         
         current_files = next_files
@@ -208,7 +335,11 @@ def hierarchical_concat(files, output_file, batch_size=10, progress_callback=Non
         if final_file != output_file:
             if os.path.exists(output_file):
                 os.remove(output_file)
-            os.rename(final_file, output_file)
+            if final_file in files:
+                # Never consume an input chunk; it may be reused by a later run
+                shutil.copyfile(final_file, output_file)
+            else:
+                os.rename(final_file, output_file)
     
     # Clean up remaining temp files (list files, etc.)
     for f in all_temp_files:
@@ -219,167 +350,383 @@ def hierarchical_concat(files, output_file, batch_size=10, progress_callback=Non
                 pass
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--fit', required=True, help='Path to FIT file')
-    parser.add_argument('--video', required=True, help='Path to video file')
-    parser.add_argument('--output', required=True, help='Output path')
-    parser.add_argument('--config', type=str, default='{}', help='JSON config')
-    parser.add_argument('--quality', type=str, default='crf', help='Quality mode: crf or match')
-    args = parser.parse_args()
-    
-    config = json.loads(args.config)
-    
-    report_progress(5, "Parsing FIT data...")
-    
-    df = parse_fit(args.fit)
-    w, h, duration, fps, creation_time, source_bitrate = get_video_metadata(args.video)
-    
-    calculated_offset = 0
+def compute_sync_offset(df, creation_time, manual_offset=None):
+    """
+    Offset (seconds) from video start to activity start, plus a status message.
+    A manual offset wins over the creation_time based auto-sync.
+    """
+    if manual_offset is not None:
+        return manual_offset, f"Using manual sync offset: {manual_offset:.2f}s"
     if creation_time and len(df) > 0:
         fit_start = df.index[0]
         # Ensure fit_start is timezone aware (UTC) if not already
         if fit_start.tzinfo is None:
             fit_start = fit_start.replace(tzinfo=datetime.timezone.utc)
             
-        calculated_offset = (creation_time - fit_start).total_seconds()
-        report_progress(7, f"Auto-Sync: Video created {creation_time}, Activity started {fit_start}, Offset: {calculated_offset:.2f}s")
-    else:
-        report_progress(7, "Warning: Could not auto-sync (missing metadata). Using default offset 0s")
+        offset = (creation_time - fit_start).total_seconds()
+        return offset, f"Auto-Sync: Video created {creation_time}, Activity started {fit_start}, Offset: {offset:.2f}s"
+    return 0, "Warning: Could not auto-sync (missing metadata). Using default offset 0s"
 
-    report_progress(10, f"Video: {w}x{h}, {duration:.1f}s @ {fps:.1f}fps")
 
-    # Check Quality Mode and modify resolution if needed
-    quality_mode = args.quality.lower()
-    if quality_mode == 'preview':
-        # Force 360p resolution for generation
-        w, h = 640, 360
-        report_progress(11, "Preview Mode: Overriding resolution to 640x360 for speed.")
+def telemetry_span(df, offset, start, end, fps=None):
+    """
+    Part of the video range [start, end) that has real telemetry, as (start, end),
+    or None if the whole range is before or after the activity.
+    Outside the span, frames would only repeat the first/last FIT record.
+    With fps, the span is snapped inwards to frame boundaries.
+    """
+    if len(df) == 0:
+        return None
+    track_len = (df.index[-1] - df.index[0]).total_seconds()
+    # A frame within half a row (1Hz) of the track edge still reads its own row
+    lo = max(start, -offset - TELEMETRY_TOLERANCE)
+    hi = min(end, track_len - offset + TELEMETRY_TOLERANCE)
+    if fps:
+        lo = max(start, math.ceil(lo * fps - 1e-6) / fps)
+        hi = min(end, math.floor(hi * fps + 1e-6) / fps)
+    if hi <= lo:
+        return None
+    return lo, hi
 
-    # Calculate layout scale (Reference height: 1080p)
-    # If 4K (2160p), scale=2.0. If 360p, scale=0.33.
-    layout_scale = h / 1080.0
-    
-    num_processes = 8
-    chunk_duration = 30
-    
+
+def plan_chunks(end_time, chunk_duration=CHUNK_DURATION, start_time=0):
+    """
+    Split [start_time, end_time) into (start, end, idx) chunks.
+    Chunks follow a fixed grid from t=0 (idx = grid cell), so exporting a
+    different range only changes the chunks at its edges. Slivers shorter than
+    MIN_CHUNK_DURATION are merged into their neighbour.
+    """
     chunks = []
-    t = 0; idx = 0
-    while t < duration:
-        end = min(t + chunk_duration, duration)
+    t = start_time
+    while t < end_time:
+        idx = int(t // chunk_duration)
+        end = min((idx + 1) * chunk_duration, end_time)
+        if end - t < MIN_CHUNK_DURATION:
+            end = min(end + chunk_duration, end_time)
+        if end_time - end < MIN_CHUNK_DURATION:
+            end = end_time
         chunks.append((t, end, idx))
-        t = end; idx += 1
-    
-    # Render overlay chunks
-    report_progress(15, f"Rendering {len(chunks)} overlay chunks...")
-    with multiprocessing.Pool(
-        processes=num_processes, 
-        initializer=init_worker, 
-        initargs=(df, w, h, fps, args.video, config, calculated_offset, layout_scale)
-    ) as pool:
-        ovr_files = []
-        for i, result in enumerate(pool.imap(render_overlay_chunk, chunks)):
-            ovr_files.append(result)
-            progress = 15 + int((i + 1) / len(chunks) * 55)
-            report_progress(progress, f"Rendering overlay: {i+1}/{len(chunks)} chunks complete")
-    
-    report_progress(75, "Concatenating overlay chunks...")
-    
-    # Hierarchical concatenation
-    full_ovr = "temp_overlay_full.mov"
-    
-    def concat_progress(round_num, batch, total):
-        # Map to 75-85% progress range
-        progress = 75 + int((batch / total) * 10)
-        report_progress(progress, f"Concat Round {round_num}: Batch {batch}/{total}")
+        t = end
+    return chunks
+
+
+def chunk_key(layer_name, idx):
+    """Manifest key (and file stem) of one layer's chunk."""
+    return f"{idx:03d}" if layer_name == 'all' else f"{layer_name}_{idx:03d}"
+
+
+def prepare_chunks(df, spec, layers, chunks, work_dir, chunk_cache=None, track_hash=None):
+    """
+    Decide which chunks of a job must be rendered.
+    Chunks recorded as valid in the job's manifest are reused, then the shared
+    cache is consulted; everything else becomes a pending render task.
+    Returns a plan dict used by record_chunk(), concat_layers() and cleanup_job().
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    manifest_path = os.path.join(work_dir, chunk_manifest.MANIFEST_NAME)
+    manifest = chunk_manifest.load_manifest(manifest_path)
+    if track_hash is None:
+        track_hash = chunk_manifest.hash_track(df)
     
-    hierarchical_concat(ovr_files, full_ovr, batch_size=10, progress_callback=concat_progress)
+    plan = {
+        'work_dir': work_dir,
+        'manifest': manifest,
+        'manifest_path': manifest_path,
+        'files': {},
+        'expected': {},
+        'cache_keys': {},
+        'pending': [],
+        'cache_hits': 0,
+    }
     
-    report_progress(85, "Compositing final video...")
+    for name, layer_config, region in layers:
+        if name == 'all':
+            columns, layer_track_hash = None, track_hash
+        else:
+            columns = widget_columns(layer_config, name)
+            layer_track_hash = track_hash if name in TRACK_WIDGETS else None
+        # The chart (past minute, whole-ride scale) and a colored map track read full columns too
+        full_columns = []
+        if get_widget_cfg(layer_config, 'chart').get('enabled', True):
+            full_columns.append(chart_column(layer_config))
+        if get_widget_cfg(layer_config, 'map').get('enabled', True) and track_color_column(layer_config):
+            full_columns.append(track_color_column(layer_config))
+        full_columns = [c for c in dict.fromkeys(full_columns) if c in df.columns]
+        if full_columns:
+            layer_track_hash = (layer_track_hash or '') + chunk_manifest.hash_frame(df[full_columns])
+        # Layer position and layout are part of what determines its pixels; a widget
+        # layer only depends on its own settings (and the layout inputs it reads)
+        layer_key = {'layer': name, 'config': layer_config if name == 'all' else widget_key(layer_config, name),
+                     'region': region, 'layout_scale': spec['layout_scale']}
+        if spec.get('chunk_format'):
+            # Chunks in an export codec must never stand in for QuickTime RLE ones
+            layer_key['format'] = spec['chunk_format']
+        config_hash = chunk_manifest.hash_config(layer_key)
+        
+        for start, end, idx in chunks:
+            key = chunk_key(name, idx)
+            chunk_path = os.path.join(work_dir, f"ovr_{key}{chunk_codec(spec)[0]}")
+            telemetry_hash = chunk_manifest.hash_telemetry_slice(
+                df, spec['offset'], start, end, layer_track_hash, columns)
+            expected = chunk_manifest.chunk_entry(
+                start, end, spec['width'], spec['height'], spec['fps'], config_hash, telemetry_hash, chunk_path)
+            plan['expected'][key] = expected
+            plan['cache_keys'][key] = ChunkCache.make_key(
+                telemetry_hash, config_hash, spec['width'], spec['height'], spec['fps'], start, end)
+            if chunk_manifest.is_chunk_valid(manifest, key, expected, work_dir):
+                plan['files'][key] = chunk_path
+            elif chunk_cache and chunk_cache.get(plan['cache_keys'][key], chunk_path):
+                plan['files'][key] = chunk_path
+                manifest['chunks'][key] = expected
+                plan['cache_hits'] += 1
+            else:
+                manifest['chunks'].pop(key, None)
+                plan['pending'].append((spec, start, end, key, chunk_path, layer_config, region))
     
-    # Build encoding options based on quality mode
-    quality_mode = args.quality.lower()
+    # Drop records for chunks that no longer exist in this job (e.g. shorter duration)
+    for key in list(manifest['chunks']):
+        if key not in plan['expected']:
+            del manifest['chunks'][key]
+    chunk_manifest.save_manifest(manifest_path, manifest)
+    return plan
+
+
+def record_chunk(plan, key, path, chunk_cache=None):
+    """Mark a freshly rendered chunk as done in the manifest and share it via the cache."""
+    plan['files'][key] = path
+    plan['manifest']['chunks'][key] = plan['expected'][key]
+    chunk_manifest.save_manifest(plan['manifest_path'], plan['manifest'])
+    if chunk_cache:
+        chunk_cache.put(plan['cache_keys'][key], path)
+
+
+def layer_stream_path(scratch_dir, layer_name, ext=".mov"):
+    """Full-length overlay stream of one layer."""
+    return os.path.join(scratch_dir, ("temp_overlay_full" if layer_name == 'all' else f"temp_overlay_{layer_name}") + ext)
+
+
+def concat_layers(plan, layers, chunks, scratch_dir, progress_callback=None, ext=".mov"):
+    """
+    Concatenate each layer's chunks into one full-length stream in scratch_dir.
+    progress_callback(fraction, round_num, batch, total) reports overall progress.
+    Returns the stream paths, in layer order.
+    """
+    layer_streams = []
+    for li, (name, _, _) in enumerate(layers):
+        layer_files = [plan['files'][chunk_key(name, idx)] for _, _, idx in chunks]
+        full_ovr = layer_stream_path(scratch_dir, name, ext)
+        
+        def layer_progress(round_num, batch, total):
+            if progress_callback:
+                progress_callback((li + batch / total) / len(layers), round_num, batch, total)
+        
+        hierarchical_concat(layer_files, full_ovr, batch_size=10, progress_callback=layer_progress,
+                            temp_dir=scratch_dir)
+        layer_streams.append(full_ovr)
+    return layer_streams
+
+
+def cleanup_job(plan, layer_streams, keep_chunks=False):
+    """Remove full-length streams and, unless kept for reuse, the job's chunks and manifest."""
+    temp_files = list(layer_streams)
+    # Without a plan (shared ring rendering) there are no chunks to remove
+    keep_chunks = keep_chunks or plan is None
+    if not keep_chunks:
+        temp_files += list(plan['files'].values()) + [plan['manifest_path']]
+    for tf in temp_files:
+        if os.path.exists(tf):
+            try:
+                os.remove(tf)
+            except:
+                pass
+    if not keep_chunks:
+        try:
+            os.rmdir(plan['work_dir'])
+        except OSError:
+            pass
+
+
+def build_encode_opts(quality_mode, source_bitrate):
+    """FFmpeg video encoding options for a quality mode, plus a status message."""
     if quality_mode == 'match' and source_bitrate:
         # Match original bitrate
         bitrate_str = f"{source_bitrate // 1000}k"  # Convert to kbps
-        encode_opts = ["-c:v", "h264_nvenc", "-preset", "p4", "-b:v", bitrate_str]
-        report_progress(86, f"Using 'Match Original' mode: {source_bitrate // 1000000}Mbps")
+        return (["-c:v", "h264_nvenc", "-preset", "p4", "-b:v", bitrate_str],
+                f"Using 'Match Original' mode: {source_bitrate // 1000000}Mbps")
     elif quality_mode == 'preview':
         # Fast Preview: 360p, libx264 ultrafast (CPU encoding is fast enough at 360p and safer for alignment)
-        w, h = 640, 360
-        report_progress(11, "Preview Mode: Overriding resolution to 640x360 for speed.")
-        # Re-calc layout scale for 360p
-        layout_scale = h / 1080.0
-        
-        encode_opts = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-pix_fmt", "yuv420p"]
-        report_progress(86, "Using 'Fast Preview' mode (360p CPU/libx264)")
+        return (["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-pix_fmt", "yuv420p"],
+                "Using 'Fast Preview' mode (360p CPU/libx264)")
     else:
         # CRF mode (visually lossless)
-        encode_opts = ["-c:v", "h264_nvenc", "-preset", "p4", "-rc", "vbr", "-cq", "18", "-b:v", "0"]
-        report_progress(86, "Using 'CRF 18' mode (visually lossless)")
-    
-    # Function to check for overlay_cuda support
-    def has_overlay_cuda():
-        try:
-            result = subprocess.run(["/usr/bin/ffmpeg", "-filters"], capture_output=True, text=True)
-            return "overlay_cuda" in result.stdout
-        except:
-            return False
+        return (["-c:v", "h264_nvenc", "-preset", "p4", "-rc", "vbr", "-cq", "18", "-b:v", "0"],
+                "Using 'CRF 18' mode (visually lossless)")
 
-    use_gpu_overlay = has_overlay_cuda()
-    
-    # Override for Preview: Use Pure CPU Pipeline
-    # Why: 
-    # 1. CPU Decoding needed for Rotation fix.
-    # 2. CPU Overlay/Encoding avoids Green Bar (NVENC padding/alignment issues).
-    # 3. 360p scaling/encoding on CPU is negligible (fast enough).
-    if quality_mode == 'preview':
-        use_gpu_overlay = False
-        report_progress(87, "Preview Mode: Using CPU pipeline for robustness (Rotation/Colors).")
 
-    if use_gpu_overlay:
-        report_progress(87, "Using GPU-accelerated overlay (overlay_cuda)")
-    
-    # Final composite with progress reporting
+# Overlay-only exports for editors: format -> (extension, chunk extension, ffmpeg video options)
+# Chunks are encoded in the export codec, so concat and export only stream-copy.
+# VP9 keeps its alpha only in WebM/Matroska; 'png' chunks are PNG-in-MOV, copied
+# out as a numbered image sequence into a directory.
+OVERLAY_EXPORT_FORMATS = {
+    'prores': ('.mov', '.mov', ["-c:v", "prores_ks", "-profile:v", "4444", "-pix_fmt", "yuva444p10le", "-vendor", "apl0"]),
+    'vp9': ('.webm', '.webm', ["-c:v", "libvpx-vp9", "-pix_fmt", "yuva420p", "-crf", "30", "-b:v", "0", "-row-mt", "1"]),
+    'qtrle': ('.mov', '.mov', QTRLE_OPTS),
+    'png': ('', '.mov', ["-c:v", "png", "-pix_fmt", "rgba"]),
+}
+
+
+def overlay_export_path(output_path, fmt, layer_name=None):
+    """Output path of one exported layer (a directory for PNG sequences)."""
+    base = os.path.splitext(output_path)[0]
+    if layer_name and layer_name != 'all':
+        base += f"_{layer_name}"
+    return base + OVERLAY_EXPORT_FORMATS[fmt][0]
+
+
+def export_overlay_command(stream, output_path, fmt, fps, timecode, start_frame=0):
+    """
+    FFmpeg command that re-wraps an overlay stream already encoded in fmt's codec
+    (stream copy, no re-encode). MOV/WebM outputs carry the timecode of the source
+    frame they start on; PNG sequences are numbered with the source frame index instead.
+    """
+    cmd = ["/usr/bin/ffmpeg", "-y", "-i", stream, "-c:v", "copy", "-an"]
+    if fmt == 'png':
+        os.makedirs(output_path, exist_ok=True)
+        return cmd + ["-start_number", str(start_frame), "-progress", "pipe:1",
+                      os.path.join(output_path, "frame_%06d.png")]
+    if fmt == 'vp9':
+        # WebM has no timecode track; keep it as a tag for tools that read it
+        cmd += ["-metadata", f"timecode={timecode}"]
+    else:
+        cmd += ["-timecode", timecode]
+    return cmd + ["-progress", "pipe:1", output_path]
+
+
+def has_overlay_cuda():
+    """Check whether this FFmpeg build has the overlay_cuda filter."""
+    try:
+        result = subprocess.run(["/usr/bin/ffmpeg", "-filters"], capture_output=True, text=True)
+        return "overlay_cuda" in result.stdout
+    except:
+        return False
+
+
+def composite_inputs(video_path, layer_streams, clip_range=None, overlay_span=None):
+    """
+    FFmpeg input arguments for the source (input 0) and the overlay layer streams.
+    clip_range=(start, end) exports only that part of the source; overlay_span is
+    the (start, end) source time the overlay streams cover.
+    Returns (args, enable) where enable is the overlay time span in output time.
+    """
     # NOTE: We use CPU decoding to ensure rotation metadata is respected (fixing upside-down issues).
     # We then upload to GPU for the heavy overlay work.
-    cmd = [
-        "/usr/bin/ffmpeg", "-y",
-        "-i", args.video,
-        "-i", full_ovr,
-    ]
+    cmd = []
+    range_start = 0
+    if clip_range:
+        range_start = clip_range[0]
+        cmd += ["-ss", f"{clip_range[0]:.3f}", "-to", f"{clip_range[1]:.3f}"]
+    cmd += ["-i", video_path]
     
-    if use_gpu_overlay:
-        # Hybrid Pipeline: CPU Decode -> GPU Overlay -> GPU Encode
-        cmd += [
-            "-filter_complex", 
-            "[0:v]format=yuv420p,hwupload_cuda,scale_cuda=format=yuv420p[base];[1:v]format=rgba,hwupload_cuda[ovr];[base][ovr]overlay_cuda=0:0[out]",
-            "-map", "[out]",
-            "-map", "0:a",
-        ]
+    enable = None
+    if overlay_span:
+        # Output timestamps start at 0 at range_start; overlays begin at their span
+        shift = overlay_span[0] - range_start
+        enable = (shift, overlay_span[1] - range_start)
+        for stream in layer_streams:
+            cmd += ["-itsoffset", f"{shift:.3f}", "-i", stream]
     else:
-        # Fallback: CPU overlay
-        # For preview, we scale inputs to 640x360
-        scale_filter = ",scale=640:360" if quality_mode == 'preview' else ""
-        cmd += [
-            "-filter_complex", f"[0:v]format=yuv420p{scale_filter}[base];[1:v]format=rgba{scale_filter}[ovr];[base][ovr]overlay=0:0,format=yuv420p[out]",
-            "-map", "[out]",
-            "-map", "0:a",
-        ]
+        for stream in layer_streams:
+            cmd += ["-i", stream]
+    return cmd, enable
+
+
+def composite_command(video_path, layers, layer_streams, output_path, quality_mode, encode_opts, use_gpu_overlay,
+                      clip_range=None, overlay_span=None):
+    """FFmpeg command that composites the overlay layer streams onto the source video."""
+    inputs, enable = composite_inputs(video_path, layer_streams, clip_range, overlay_span)
+    cmd = ["/usr/bin/ffmpeg", "-y"] + inputs
+    
+    # For preview, we scale the source to 640x360 (overlays are already rendered at that size)
+    scale_filter = ",scale=640:360" if quality_mode == 'preview' else ""
+    cmd += [
+        "-filter_complex", build_overlay_filter(layers, use_gpu_overlay, scale_filter, enable),
+        "-map", "[out]",
+        "-map", "0:a",
+    ]
     
     cmd += encode_opts + [
         "-c:a", "aac",
         "-shortest",
         "-progress", "pipe:1",  # Output progress to stdout
-        args.output
+        output_path
     ]
+    return cmd
+
+
+def parse_renditions(specs, src_w, src_h, default_quality):
+    """
+    Parse rendition specs like '2160', '1080:match' or '360:preview' (output height
+    and optional quality mode) into dicts sorted from largest to smallest.
+    Widths keep the source aspect ratio; sizes are rounded to even numbers.
+    """
+    renditions = []
+    for spec in specs:
+        height, _, quality = str(spec).partition(':')
+        height = int(height) // 2 * 2
+        width = int(round(src_w * height / src_h / 2.0)) * 2
+        renditions.append({'width': width, 'height': height, 'quality': (quality or default_quality).lower()})
+    renditions.sort(key=lambda r: r['height'], reverse=True)
+    return renditions
+
+
+def rendition_output_path(output_path, rendition):
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_{rendition['height']}p{ext or '.mp4'}"
+
+
+def ladder_command(video_path, layers, layer_streams, output_path, renditions, source_bitrate, src_size,
+                   use_gpu_overlay, clip_range=None, overlay_span=None):
+    """
+    FFmpeg command that decodes the source once, composites the overlays once at the
+    largest rendition's size, then splits and downscales into every rendition.
+    Returns (cmd, output paths).
+    """
+    inputs, enable = composite_inputs(video_path, layer_streams, clip_range, overlay_span)
+    top = renditions[0]
+    base_size = (top['width'], top['height']) if (top['width'], top['height']) != tuple(src_size) else None
+    graph = build_overlay_filter(layers, use_gpu_overlay, "", enable, base_size)
+    
+    labels = "".join(f"[split{i}]" for i in range(len(renditions)))
+    graph += f";[out]split={len(renditions)}{labels}"
+    for i, r in enumerate(renditions):
+        if use_gpu_overlay:
+            graph += f";[split{i}]scale_cuda={r['width']}:{r['height']}[v{i}]"
+        else:
+            graph += f";[split{i}]scale={r['width']}:{r['height']}:flags=lanczos,format=yuv420p[v{i}]"
     
-    # Run with progress parsing
-    import re
+    cmd = ["/usr/bin/ffmpeg", "-y", "-progress", "pipe:1"] + inputs + ["-filter_complex", graph]
+    outputs = []
+    for i, r in enumerate(renditions):
+        # 'match' keeps the source bits per pixel at each size
+        bitrate = None
+        if source_bitrate:
+            bitrate = int(source_bitrate * r['width'] * r['height'] / float(src_size[0] * src_size[1]))
+        encode_opts, _ = build_encode_opts(r['quality'], bitrate)
+        output = rendition_output_path(output_path, r)
+        outputs.append(output)
+        cmd += ["-map", f"[v{i}]", "-map", "0:a"] + encode_opts + ["-c:a", "aac", "-shortest", output]
+    return cmd, outputs
+
+
+def run_ffmpeg_with_progress(cmd, on_time=None, on_heartbeat=None):
+    """
+    Run an FFmpeg command that writes '-progress pipe:1' to stdout.
+    on_time(seconds) is called for every parsed out_time and returns True if it
+    reported progress; on_heartbeat() is called after 10s without a report.
+    """
     # Merge stderr into stdout to prevent buffer deadlock
     process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
     
-    last_progress = 85
     last_update_time = time.time()
     
     while True:
@@ -401,10 +748,7 @@ def main():
                         seconds = float(parts[2])
                         time_s = hours * 3600 + minutes * 60 + seconds
                         
-                        encode_progress = min(94, 85 + int((time_s / duration) * 9))
-                        if encode_progress > last_progress or (time.time() - last_update_time > 5):
-                            report_progress(encode_progress, f"Encoding: {int(time_s)}s / {int(duration)}s")
-                            last_progress = encode_progress
+                        if on_time and on_time(time_s):
                             last_update_time = time.time()
             except Exception as e:
                 pass
@@ -415,24 +759,295 @@ def main():
 
         # Heartbeat: send update every 10s even if parsing fails
         if time.time() - last_update_time > 10:
-            report_progress(last_progress, "Encoding in progress...")
+            if on_heartbeat:
+                on_heartbeat()
             last_update_time = time.time()
     
     # Check for errors
     if process.returncode != 0:
         raise subprocess.CalledProcessError(process.returncode, cmd, stderr="See stdout for details")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fit', required=True, help='Path to FIT file')
+    parser.add_argument('--video', required=True, help='Path to video file')
+    parser.add_argument('--output', required=True, help='Output path')
+    parser.add_argument('--config', type=str, default='{}', help='JSON config')
+    parser.add_argument('--quality', type=str, default='crf', help='Quality mode: crf or match')
+    parser.add_argument('--offset', type=float, default=None, help='Sync offset in seconds (overrides auto-sync)')
+    parser.add_argument('--auto-sync', action='store_true',
+                        help='Refine the creation_time sync from embedded camera GPS (DJI/GoPro), '
+                             'else by matching video motion with FIT speed')
+    parser.add_argument('--start', type=float, default=None, help='Export from this video time (seconds)')
+    parser.add_argument('--end', type=float, default=None, help='Export up to this video time (seconds)')
+    parser.add_argument('--overlay-only', choices=sorted(OVERLAY_EXPORT_FORMATS), default=None,
+                        help='Write only the overlay track (with alpha) for an editor, skipping the composite')
+    parser.add_argument('--renditions', nargs='+', default=None,
+                        help='Encode several sizes in one pass, e.g. 2160 1080 360:preview (height[:quality])')
+    parser.add_argument('--work-dir', type=str, default=None,
+                        help='Directory for overlay chunks and the resume manifest (default: <output>.chunks)')
+    parser.add_argument('--keep-chunks', action='store_true',
+                        help='Keep rendered chunks after success so later runs can reuse them')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Shared overlay chunk cache directory')
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_CHUNK_CACHE_GB,
+                        help='Disk cap for the shared chunk cache (LRU eviction)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the shared chunk cache')
+    parser.add_argument('--widget-streams', action='store_true',
+                        help='Render and cache each widget as its own overlay stream')
+    parser.add_argument('--processes', type=int, default=8, help='Number of overlay render workers')
+    parser.add_argument('--frame-buffers', type=int, default=DEFAULT_RING_FRAMES,
+                        help='Frames each worker keeps in flight to its encoder (bounds worker memory)')
+    parser.add_argument('--shared-ring', action='store_true',
+                        help='Render through shared memory into one encoder per layer (no chunk resume/cache)')
+    parser.add_argument('--scratch-dir', type=str, default=None,
+                        help='Directory for concat intermediates (default: <work-dir>/scratch)')
+    parser.add_argument('--tmpfs', action='store_true',
+                        help='Put concat intermediates on a RAM disk (/dev/shm) when available')
+    args = parser.parse_args()
+    if args.renditions and args.overlay_only:
+        parser.error("--renditions and --overlay-only cannot be combined")
     
-    # Cleanup
-    report_progress(95, "Cleaning up temp files...")
-    for tf in ovr_files + [full_ovr]:
-        if os.path.exists(tf):
+    config = json.loads(args.config)
+    
+    report_progress(5, "Parsing FIT data...")
+    
+    df = parse_fit(args.fit)
+    # Rolling power, zones etc. selected by the config, as plain columns
+    df = add_metrics(df, config)
+    w, h, duration, fps, creation_time, source_bitrate = get_video_metadata(args.video)
+    
+    calculated_offset, sync_message = compute_sync_offset(df, creation_time, args.offset)
+    report_progress(7, sync_message)
+    if args.auto_sync and args.offset is None:
+        estimate = calculated_offset if creation_time else None
+        report_progress(8, "Refining sync from camera telemetry...")
+        try:
+            camera = sync_from_camera(args.video, df, estimate)
+        except Exception as e:
+            camera = None
+            report_progress(8, f"Camera telemetry unreadable ({e})")
+        match = None
+        if camera is None:
+            report_progress(8, "Refining sync from video motion...")
+            match = refine_offset(args.video, df, estimate)
+        if camera:
+            calculated_offset = camera['offset']
+            report_progress(9, f"Camera sync ({camera['source']}, {camera['method']}): offset {calculated_offset:.2f}s")
+        elif match and match['confidence'] >= MIN_CONFIDENCE:
+            calculated_offset = match['offset']
+            report_progress(9, f"Motion sync: offset {calculated_offset:.2f}s (confidence {match['confidence']:.2f})")
+        else:
+            report_progress(9, "Motion sync not reliable; keeping the creation_time offset")
+
+    report_progress(10, f"Video: {w}x{h}, {duration:.1f}s @ {fps:.1f}fps")
+    
+    # Export range; overlays are only rendered where the FIT file has data
+    range_start = max(0, args.start or 0)
+    range_end = min(duration, args.end) if args.end is not None else duration
+    if range_end <= range_start:
+        print(f"Empty export range: {range_start:.2f}s - {range_end:.2f}s", file=sys.stderr)
+        sys.exit(1)
+    clip_range = (range_start, range_end) if (range_start, range_end) != (0, duration) else None
+    span = telemetry_span(df, calculated_offset, range_start, range_end, fps)
+    if span is None:
+        if args.overlay_only:
+            print("No telemetry in the export range; nothing to export", file=sys.stderr)
+            sys.exit(1)
+        report_progress(10, "No telemetry in the export range; the overlay will be empty")
+    elif span != (range_start, range_end):
+        report_progress(10, f"Telemetry covers {span[0]:.1f}s - {span[1]:.1f}s; "
+                            f"skipping {(range_end - range_start) - (span[1] - span[0]):.1f}s without data")
+
+    # Check Quality Mode and modify resolution if needed
+    quality_mode = args.quality.lower()
+    src_size = (w, h)
+    renditions = None
+    if args.renditions:
+        # Overlays are rendered once at the largest rendition and downscaled for the rest
+        renditions = parse_renditions(args.renditions, w, h, quality_mode)
+        w, h = renditions[0]['width'], renditions[0]['height']
+        report_progress(11, "Renditions: " + ", ".join(
+            f"{r['width']}x{r['height']} ({r['quality']})" for r in renditions))
+    elif quality_mode == 'preview':
+        # Force 360p resolution for generation
+        w, h = 640, 360
+        report_progress(11, "Preview Mode: Overriding resolution to 640x360 for speed.")
+
+    # Calculate layout scale (Reference height: 1080p)
+    # If 4K (2160p), scale=2.0. If 360p, scale=0.33.
+    layout_scale = h / 1080.0
+    spec = make_render_spec(w, h, fps, calculated_offset, layout_scale, args.frame_buffers, args.overlay_only)
+    
+    num_processes = max(1, args.processes)
+    chunks = plan_chunks(span[1], start_time=span[0]) if span else []
+    
+    layers = plan_layers(config, w, h, layout_scale, widget_streams=args.widget_streams) if span else []
+    if args.widget_streams:
+        report_progress(12, f"Widget streams: {', '.join(name for name, _, _ in layers) or 'none'}")
+    
+    # Resume support: chunks whose inputs are unchanged since the last run are reused
+    work_dir = os.path.abspath(args.work_dir or os.path.splitext(args.output)[0] + ".chunks")
+    os.makedirs(work_dir, exist_ok=True)
+    if args.scratch_dir:
+        scratch_dir = os.path.abspath(args.scratch_dir)
+        os.makedirs(scratch_dir, exist_ok=True)
+    else:
+        scratch_dir, on_tmpfs = make_scratch_dir(job_id_for(args.output), work_dir, use_tmpfs=args.tmpfs)
+        if args.tmpfs and not on_tmpfs:
+            report_progress(12, "Warning: no RAM disk available, using work directory for intermediates")
+    
+    plan = None
+    layer_streams = []
+    done_message = "Complete!"
+    succeeded = False
+    try:
+        if args.shared_ring:
+            # One encoder per layer fed from shared memory; no chunks, so no resume or cache
+            slots = max(args.frame_buffers, num_processes + 1)
+            report_progress(15, f"Rendering overlay through a shared frame ring ({slots} slots, "
+                                f"{slots * w * h * 4 / 1024**2:.0f} MB)...")
+            
+            last_percent = -1
+            
+            def ring_progress(fraction):
+                nonlocal last_percent
+                if int(fraction * 100) != last_percent:
+                    last_percent = int(fraction * 100)
+                    report_progress(15 + int(fraction * 70), f"Rendering overlay: {last_percent}%")
+            
+            layer_streams = []
+            if layers:
+                with multiprocessing.Pool(
+                    processes=num_processes,
+                    initializer=init_worker,
+                    initargs=(df,)
+                ) as pool:
+                    layer_streams = render_layers_shared(pool, df, spec, layers, span, scratch_dir, slots, ring_progress)
+        else:
+            # Cross-job cache: identical chunks rendered by other jobs are linked in instead of re-rendered
+            chunk_cache = None
+            if not args.no_cache:
+                chunk_cache = ChunkCache(args.cache_dir, max_bytes=int(args.cache_max_gb * 1024**3))
+            
+            plan = prepare_chunks(df, spec, layers, chunks, work_dir, chunk_cache)
+            
+            total_chunks = max(1, len(plan['expected']))
+            reused = len(plan['files'])
+            if reused:
+                report_progress(15, f"Reusing {reused}/{total_chunks} overlay chunks "
+                                    f"({reused - plan['cache_hits']} from previous run, {plan['cache_hits']} from cache)")
+            
+            # Render overlay chunks
+            pending = plan['pending']
+            report_progress(15 + int(reused / total_chunks * 55), f"Rendering {len(pending)} overlay chunks...")
+            if pending:
+                with multiprocessing.Pool(
+                    processes=num_processes, 
+                    initializer=init_worker, 
+                    initargs=(df,)
+                ) as pool:
+                    for i, (key, result) in enumerate(pool.imap_unordered(render_overlay_chunk, pending)):
+                        record_chunk(plan, key, result, chunk_cache)
+                        
+                        done = reused + i + 1
+                        progress = 15 + int(done / total_chunks * 55)
+                        report_progress(progress, f"Rendering overlay: {done}/{total_chunks} chunks complete ({reused} reused)")
+            
+            report_progress(75, "Concatenating overlay chunks...")
+            
+            def concat_progress(fraction, round_num, batch, total):
+                # Map to 75-85% progress range
+                progress = 75 + int(fraction * 10)
+                report_progress(progress, f"Concat Round {round_num}: Batch {batch}/{total}")
+            
+            # Hierarchical concatenation, one full-length stream per layer
+            layer_streams = concat_layers(plan, layers, chunks, scratch_dir, concat_progress, chunk_codec(spec)[0])
+        
+        if args.overlay_only:
+            # Editor workflow: no source decode and no composite; the layer streams are
+            # already in the export codec, so this only re-wraps them with a timecode
+            timecode = shift_timecode(probe_video(args.video)['timecode'], fps, span[0])
+            start_frame = int(round(span[0] * fps))
+            report_progress(85, f"Exporting overlay ({args.overlay_only}), starting at source timecode {timecode}")
+            for li, ((name, _, _), stream) in enumerate(zip(layers, layer_streams)):
+                out_path = overlay_export_path(args.output, args.overlay_only, name)
+                cmd = export_overlay_command(stream, out_path, args.overlay_only, fps, timecode, start_frame)
+                run_ffmpeg_with_progress(cmd)
+                report_progress(85 + int((li + 1) / len(layers) * 10), f"Wrote {out_path}")
+        else:
+            report_progress(85, "Compositing final video...")
+            
+            # Build encoding options based on quality mode
+            if renditions:
+                report_progress(86, f"Encoding {len(renditions)} renditions from a single decode")
+            else:
+                encode_opts, encode_message = build_encode_opts(quality_mode, source_bitrate)
+                report_progress(86, encode_message)
+            
+            use_gpu_overlay = has_overlay_cuda()
+            
+            # Override for Preview: Use Pure CPU Pipeline
+            # Why: 
+            # 1. CPU Decoding needed for Rotation fix.
+            # 2. CPU Overlay/Encoding avoids Green Bar (NVENC padding/alignment issues).
+            # 3. 360p scaling/encoding on CPU is negligible (fast enough).
+            if quality_mode == 'preview' and not renditions:
+                use_gpu_overlay = False
+                report_progress(87, "Preview Mode: Using CPU pipeline for robustness (Rotation/Colors).")
+            elif renditions and any(r['quality'] == 'preview' for r in renditions):
+                # The preview rendition is encoded by libx264, which can't take CUDA frames
+                use_gpu_overlay = False
+                report_progress(87, "Preview rendition requested: Using CPU pipeline for all renditions.")
+
+            if use_gpu_overlay:
+                report_progress(87, "Using GPU-accelerated overlay (overlay_cuda)")
+            
+            # Final composite with progress reporting
+            if renditions:
+                cmd, outputs = ladder_command(args.video, layers, layer_streams, args.output, renditions, source_bitrate,
+                                              src_size, use_gpu_overlay, clip_range=clip_range, overlay_span=span)
+            else:
+                cmd = composite_command(args.video, layers, layer_streams, args.output, quality_mode, encode_opts,
+                                        use_gpu_overlay, clip_range=clip_range, overlay_span=span)
+            encode_duration = range_end - range_start
+            
+            last_progress = 85
+            last_update_time = time.time()
+            
+            def encode_progress_update(time_s):
+                nonlocal last_progress, last_update_time
+                encode_progress = min(94, 85 + int((time_s / encode_duration) * 9))
+                if encode_progress > last_progress or (time.time() - last_update_time > 5):
+                    report_progress(encode_progress, f"Encoding: {int(time_s)}s / {int(encode_duration)}s")
+                    last_progress = encode_progress
+                    last_update_time = time.time()
+                    return True
+                return False
+            
+            run_ffmpeg_with_progress(
+                cmd, on_time=encode_progress_update,
+                on_heartbeat=lambda: report_progress(last_progress, "Encoding in progress...")
+            )
+
+            if renditions:
+                done_message = "Complete! Wrote " + ", ".join(os.path.basename(o) for o in outputs)
+        succeeded = True
+    finally:
+        # Always free the intermediates (RAM with --tmpfs), even when a render or ffmpeg step failed
+        if succeeded:
+            report_progress(95, "Cleaning up temp files...")
+        if not args.scratch_dir:
+            remove_dir(scratch_dir)
+        # A failed job keeps its chunks and manifest so the next run resumes from them
+        cleanup_job(plan, layer_streams, keep_chunks=args.keep_chunks or not succeeded)
+        if plan is None:
             try:
-                os.remove(tf)
-            except:
+                os.rmdir(work_dir)
+            except OSError:
                 pass
     
-    report_progress(100, "Complete!")
-
+    report_progress(100, done_message)
 
 if __name__ == '__main__':
     main()
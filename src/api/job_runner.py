@@ -0,0 +1,183 @@
+"""
+Job runner for concurrent video generation.
+Runs a queue of generate.py jobs under a global CPU budget, so several rides
+can render at once without overcommitting the machine.
+
+Jobs come from a JSON file (--jobs) or, for the web server, as JSON lines on
+stdin (--stdin). Each job is an object:
+    {"id": "...", "fit": "...", "video": "...", "output": "...",
+     "config": {...}, "quality": "crf", "processes": 4}
+
+Output (one line each, prefixed with the job id):
+    JOB:<id>:QUEUED / JOB:<id>:STARTED
+    JOB:<id>:STATUS:<message> / JOB:<id>:PROGRESS:<percent>
+    JOB:<id>:DONE:<exit code>
+"""
+import sys
+import os
+import json
+import argparse
+import subprocess
+import threading
+from collections import deque
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.core.workspace import job_id_for
+
+
+GENERATE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate.py")
+
+# Render workers per job unless the job asks for a specific number
+DEFAULT_JOB_PROCESSES = 8
+
+_print_lock = threading.Lock()
+
+
+def emit(job_id, line):
+    """Write one prefixed line for a job (thread-safe)."""
+    with _print_lock:
+        print(f"JOB:{job_id}:{line}", flush=True)
+
+
+class JobRunner:
+    """FIFO job queue whose running jobs never use more than cpu_budget render workers."""
+
+    def __init__(self, cpu_budget, workspace_root=None, use_tmpfs=False):
+        self.cpu_budget = max(1, cpu_budget)
+        self.workspace_root = workspace_root
+        self.use_tmpfs = use_tmpfs
+        self.queue = deque()
+        self.running = {}  # job id -> (process, cpus, output path)
+        self.cpus_in_use = 0
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def submit(self, job):
+        for key in ('fit', 'video', 'output'):
+            if key not in job:
+                raise KeyError(key)
+        job = dict(job)
+        job.setdefault('id', job_id_for(job['output']))
+        # Checked here, not in _schedule: a bad value there would kill the relay thread
+        try:
+            processes = job.get('processes')
+            job['processes'] = DEFAULT_JOB_PROCESSES if processes is None else int(processes)
+        except (TypeError, ValueError):
+            emit(job['id'], f"STATUS:Invalid processes value: {job.get('processes')!r}")
+            emit(job['id'], "DONE:1")
+            return
+        with self.cond:
+            self.queue.append(job)
+            emit(job['id'], "QUEUED")
+            self._schedule()
+
+    def close(self):
+        """No more jobs will be submitted; wait() returns once the queue drains."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def wait(self):
+        with self.cond:
+            while not (self.closed and not self.queue and not self.running):
+                self.cond.wait()
+
+    def _job_cpus(self, job):
+        return max(1, min(job['processes'], self.cpu_budget))
+
+    def _schedule(self):
+        """Start queued jobs while they fit in the budget. Caller holds self.cond."""
+        while self.queue:
+            job = self.queue[0]
+            cpus = self._job_cpus(job)
+            if self.cpus_in_use + cpus > self.cpu_budget:
+                break
+            self.queue.popleft()
+
+            # Two jobs writing the same output would share a workspace
+            output = os.path.abspath(job['output'])
+            if any(out == output for _, _, out in self.running.values()):
+                emit(job['id'], "STATUS:Another job is already writing this output")
+                emit(job['id'], "DONE:1")
+                continue
+
+            self.cpus_in_use += cpus
+            process = subprocess.Popen(
+                self._command(job, cpus), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, bufsize=1
+            )
+            self.running[job['id']] = (process, cpus, output)
+            emit(job['id'], "STARTED")
+            threading.Thread(target=self._relay, args=(job['id'], process), daemon=True).start()
+
+    def _command(self, job, cpus):
+        cmd = [
+            sys.executable, GENERATE_SCRIPT,
+            '--fit', job['fit'],
+            '--video', job['video'],
+            '--output', job['output'],
+            '--config', json.dumps(job.get('config') or {}),
+            '--quality', job.get('quality') or 'crf',
+            '--processes', str(cpus),
+        ]
+        if self.workspace_root:
+            cmd += ['--work-dir', os.path.join(self.workspace_root, job_id_for(job['output']))]
+        if self.use_tmpfs:
+            cmd += ['--tmpfs']
+        for flag in job.get('args', []):
+            cmd.append(str(flag))
+        return cmd
+
+    def _relay(self, job_id, process):
+        """Forward a job's progress lines, then free its CPUs and schedule more work."""
+        for line in process.stdout:
+            line = line.strip()
+            if line.startswith('PROGRESS:') or line.startswith('STATUS:'):
+                emit(job_id, line)
+            elif line:
+                sys.stderr.write(f"[{job_id}] {line}\n")
+        process.wait()
+        emit(job_id, f"DONE:{process.returncode}")
+        with self.cond:
+            _, cpus, _ = self.running.pop(job_id)
+            self.cpus_in_use -= cpus
+            self._schedule()
+            self.cond.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=str, help='JSON file with a list of jobs')
+    parser.add_argument('--stdin', action='store_true', help='Read jobs as JSON lines from stdin')
+    parser.add_argument('--cpu-budget', type=int, default=os.cpu_count() or 1,
+                        help='Total render workers across all running jobs')
+    parser.add_argument('--workspace-root', type=str, default=None,
+                        help='Put each job workspace under this directory')
+    parser.add_argument('--tmpfs', action='store_true', help='Use a RAM disk for job intermediates')
+    args = parser.parse_args()
+
+    runner = JobRunner(args.cpu_budget, args.workspace_root, args.tmpfs)
+
+    if args.jobs:
+        with open(args.jobs, 'r') as f:
+            for job in json.load(f):
+                runner.submit(job)
+
+    if args.stdin:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runner.submit(json.loads(line))
+            except (ValueError, KeyError) as e:
+                sys.stderr.write(f"Invalid job: {e}\n")
+
+    runner.close()
+    runner.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,47 @@
 Python backend for preview generation.
 Called from Electron via subprocess.
 Extracts a video frame and composites the overlay on top.
+
+With --serve it runs as a long-lived service for the web server: one JSON request
+per stdin line, one JSON response per stdout line. Parsed FIT data, video metadata
+and render assets (map background, elevation profile, fonts) stay warm between
+requests, so moving the slider only pays for the frame grab and the overlay draw.
+
+    request:  {"id": 1, "fit": "...", "video": "...", "timestamp": 12.5, "config": {...},
+               "max_width": 1280, "max_height": 720, "format": "jpeg", "quality": 80}
+    response: {"id": 1, "image": "<base64>", "mime": "image/jpeg", "width": 1280, "height": 720, "ms": 42,
+               "timings": {"probe": 0, "fit": 0, "creation_time": 0, "frame": 30, "overlay": 9, ...}}
+              or {"id": 1, "error": "..."}
+
+"mode": "frame" or "overlay" returns just the video frame or just the overlay
+(see handle_request), so the browser can composite and only re-fetch the small
+overlay when the widget config changes. "mode": "timeline" returns the telemetry
+of the whole clip as packed arrays (see build_timeline) for real-time playback
+of the HUD in the browser.
+
+Previews are decoded and rendered at the requested display size (never above the
+source), with the same layout scale generate.py uses at that resolution.
+
+While the service is idle it prefetches around the last timestamp (see plan_prefetch):
+frames are decoded on spare cores and overlays pre-rendered between requests, so
+stepping or scrubbing to a nearby second is answered from cache. A jump drops the
+prefetches that are no longer near the new position.
 """
 import sys
 import os
 import json
+import time
 import base64
+import struct
+import queue
+import threading
 import subprocess
-import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO, StringIO
 import argparse
 import datetime
-import sys
-import subprocess
+import numpy as np
 import pandas as pd
 from PIL import Image
 
@@ -26,119 +55,585 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 # Import with suppressed stdout
 sys.stdout = StringIO()
 from src.core.extract import parse_fit
-from src.core.overlay import create_frame_rgba
+from src.core.metadata import probe_video, creation_datetime
+from src.core.metrics import add_metrics, required_metrics, metric_info
+from src.core.overlay import (
+    TEXT_WIDGETS, WIDGETS, create_frame_rgba, reset_track_cache, get_widget_cfg, text_widget_spec,
+    map_layout, profile_layout, track_pixels, profile_offsets,
+    CHART_WINDOW, CHART_COLORS, chart_column, chart_label, chart_layout, chart_range,
+)
 sys.stdout = _real_stdout
 
+# Warm state for --serve, keyed by (path, mtime) so edited files are reloaded
+FIT_CACHE = {}
+ACTIVE_FIT = None
+# The active FIT data with derived metric columns, by the metric settings of the config
+METRICS_CACHE = {}
 
-def get_video_frame(video_path, timestamp):
-    """Extract a frame from video at the given timestamp using ffmpeg."""
-    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-        tmp_path = tmp.name
-    
+# Decoded preview frames, LRU by (video, mtime, timestamp, size), bounded by bytes
+FRAME_CACHE = OrderedDict()
+FRAME_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FRAME_CACHE_LOCK = threading.Lock()
+# Frame decodes in flight, by frame cache key (a request waits for these instead of decoding twice)
+FRAME_FUTURES = {}
+
+# Rendered overlays, LRU by (fit, video, timestamp, size, config)
+OVERLAY_CACHE = OrderedDict()
+OVERLAY_CACHE_SIZE = 64
+
+# Seconds prefetched around the last request: further ahead in the scrub direction
+PREFETCH_AHEAD = 5
+PREFETCH_BEHIND = 2
+
+# Response image formats: format -> (PIL format, MIME type)
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+DEFAULT_QUALITY = 80
+
+# Marker columns of a telemetry timeline, after the text widgets' data columns (see build_timeline)
+TIMELINE_MARKER_COLUMNS = ['map_x', 'map_y', 'profile_x']
+# Samples per second are capped at this (per-frame at 60 fps)
+TIMELINE_MAX_RATE = 60
+
+# Runs the subprocess-bound stages (ffprobe, ffmpeg) while this thread parses/renders
+PREVIEW_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+# Speculative frame decodes; separate so they never queue ahead of a live request
+PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2))
+
+
+def get_display_size(video_path):
+    """
+    (width, height) of the decoded frames. ffmpeg auto-rotates, so a clip
+    tagged with a 90/270 degree rotation decodes with width and height swapped.
+    """
+    metadata = probe_video(video_path)
+    return metadata['display_width'], metadata['display_height']
+
+
+def decode_frame(video_path, timestamp, size=None):
+    """
+    Decode one frame straight into an (h, w, 4) RGBA array: ffmpeg seeks on the
+    input (jumps to the nearest keyframe, then decodes up to timestamp) and pipes
+    rawvideo to us, so there is no image encode/decode or temp file.
+    """
+    width, height = size or get_display_size(video_path)
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-ss', f"{timestamp:.3f}",
+        '-i', video_path,
+        '-an', '-sn', '-dn',
+        '-frames:v', '1',
+        '-vf', f"scale={width}:{height}",
+        '-pix_fmt', 'rgba',
+        '-f', 'rawvideo', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    frame_bytes = width * height * 4
+    if len(result.stdout) < frame_bytes:
+        raise RuntimeError(f"No frame at {timestamp:.3f}s in {os.path.basename(video_path)}")
+    return np.frombuffer(result.stdout, dtype=np.uint8, count=frame_bytes).reshape(height, width, 4)
+
+
+def frame_key(video_path, timestamp, size):
+    return file_key(video_path) + (round(timestamp, 3), size)
+
+
+def store_frame(key, frame):
+    with FRAME_CACHE_LOCK:
+        FRAME_CACHE[key] = frame
+        # Evict least recently used frames beyond the byte budget (always keep the newest)
+        while len(FRAME_CACHE) > 1 and sum(f.nbytes for f in FRAME_CACHE.values()) > FRAME_CACHE_MAX_BYTES:
+            FRAME_CACHE.popitem(last=False)
+
+
+def get_video_frame(video_path, timestamp, size=None):
+    """Extract a frame from video at the given timestamp (RGBA image), cached."""
+    key = frame_key(video_path, timestamp, size)
+    with FRAME_CACHE_LOCK:
+        frame = FRAME_CACHE.get(key)
+        if frame is not None:
+            FRAME_CACHE.move_to_end(key)
+        future = FRAME_FUTURES.get(key)
+    if frame is None and future is not None:
+        # Being prefetched; wait for it rather than starting a second ffmpeg
+        try:
+            frame = future.result()
+        except:
+            frame = None
+    if frame is None:
+        frame = decode_frame(video_path, timestamp, size)
+        store_frame(key, frame)
+    # The array is read-only (shared with the cache), so PIL copies before any edit
+    return Image.fromarray(frame, 'RGBA')
+
+
+def file_key(path):
+    """Cache key that changes when the file is replaced or modified."""
+    return os.path.abspath(path), os.path.getmtime(path)
+
+
+def load_fit(fit_path):
+    """Parsed FIT data, parsed once per file. Switching files drops the track render cache."""
+    global ACTIVE_FIT
+    key = file_key(fit_path)
+    if key not in FIT_CACHE:
+        # Keep a single track in memory; the service usually serves one ride at a time
+        FIT_CACHE.clear()
+        FIT_CACHE[key] = parse_fit(fit_path)
+    if ACTIVE_FIT != key:
+        reset_track_cache()
+        METRICS_CACHE.clear()
+        ACTIVE_FIT = key
+    return FIT_CACHE[key]
+
+
+def load_telemetry(fit_path, config):
+    """Parsed FIT data plus the metric columns the config selects (see src/core/metrics.py)."""
+    df = load_fit(fit_path)
+    needed = required_metrics(config)
+    if not needed:
+        return df
+    # Only the rider settings change the values; scale/opacity edits reuse the columns
+    key = json.dumps({name: [cfg.get('weight_kg'), cfg.get('max_hr')] for name, cfg in needed.items()},
+                     sort_keys=True)
+    if key not in METRICS_CACHE:
+        METRICS_CACHE[key] = add_metrics(df, config)
+    return METRICS_CACHE[key]
+
+
+def load_creation_time(video_path):
+    """creation_time of the video (None if missing or unreadable)."""
     try:
-        cmd = [
-            'ffmpeg', '-y',
-            '-ss', str(timestamp),
-            '-i', video_path,
-            '-vframes', '1',
-            '-update', '1',
-            '-f', 'image2',
-            tmp_path
-        ]
-        subprocess.run(cmd, capture_output=True, check=True)
+        return creation_datetime(probe_video(video_path))
+    except Exception as e:
+        sys.stderr.write(f"Metadata error: {e}\n")
+    return None
+
+
+def sync_offset(df, creation_time):
+    """Seconds into the activity at video time 0 (creation_time auto-sync, like calculate_sync.py)."""
+    if creation_time and len(df) > 0:
+        fit_start = df.index[0]
+        if fit_start.tzinfo is None:
+            fit_start = fit_start.replace(tzinfo=datetime.timezone.utc)
+        return (creation_time - fit_start).total_seconds()
+    return 0
+
+
+def telemetry_row(df, creation_time, timestamp, offset=None):
+    """
+    Row dict shown at a video timestamp. offset (seconds into the activity at video
+    time 0, e.g. a refined sync) overrides the creation_time auto-sync.
+    """
+    if offset is None:
+        offset = sync_offset(df, creation_time)
         
-        frame = Image.open(tmp_path).convert('RGBA')
-        return frame
+    # Get data at timestamp + offset
+    time_into_activity = timestamp + offset
+    
+    # Find row by time (since index is DatetimeIndex)
+    target_time = df.index[0] + pd.Timedelta(seconds=time_into_activity)
+    
+    try:
+        idx_val = df.index.get_indexer([target_time], method='nearest')[0]
+        row = df.iloc[idx_val]
+    except:
+        if len(df) > 0:
+            idx_val = 0
+            row = df.iloc[0]
+        else:
+            idx_val = None
+            row = {}
+    
+    row_dict = row.to_dict() if isinstance(row, pd.Series) else {}
+    row_dict['full_track_df'] = df
+    row_dict['track_index'] = idx_val
+    return row_dict
+
+
+def preview_size(video_path, max_width=None, max_height=None):
+    """Largest even (w, h) with the video's aspect ratio that fits the bounds (never upscaled)."""
+    width, height = get_display_size(video_path)
+    scale = min(1.0, (max_width or width) / float(width), (max_height or height) / float(height))
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def timed(timings, stage, fn, *args, **kwargs):
+    """Call fn(*args, **kwargs), recording its wall time in ms as timings[stage]."""
+    start = time.time()
+    try:
+        return fn(*args, **kwargs)
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        timings[stage] = int((time.time() - start) * 1000)
+
 
+def overlay_key(fit_path, video_path, timestamp, config, size, offset=None):
+    return (file_key(fit_path), file_key(video_path), round(timestamp, 3), size,
+            json.dumps(config, sort_keys=True), None if offset is None else round(offset, 3))
 
-def get_video_creation_time(video_path):
-    """Extract creation_time from video metadata."""
+
+def render_overlay(fit_path, video_path, timestamp, config, size, timings=None, offset=None):
+    """
+    The overlay alone (RGBA) at timestamp, rendered for a frame of the given size, cached.
+    The creation_time probe runs in the background while the FIT file is parsed.
+    offset overrides the creation_time sync (see telemetry_row).
+    """
+    timings = {} if timings is None else timings
+    key = overlay_key(fit_path, video_path, timestamp, config, size, offset)
+    cached = OVERLAY_CACHE.get(key)
+    if cached is not None:
+        OVERLAY_CACHE.move_to_end(key)
+        timings['overlay'] = 0
+        # Callers composite/crop into new images, so the cached one is never modified
+        return cached
+    overlay = _render_overlay(fit_path, video_path, timestamp, config, size, timings, offset)
+    OVERLAY_CACHE[key] = overlay
+    while len(OVERLAY_CACHE) > OVERLAY_CACHE_SIZE:
+        OVERLAY_CACHE.popitem(last=False)
+    return overlay
+
+
+def _render_overlay(fit_path, video_path, timestamp, config, size, timings, offset=None):
+    creation_future = None
+    if offset is None:
+        creation_future = PREVIEW_EXECUTOR.submit(timed, timings, 'creation_time', load_creation_time, video_path)
+    # Suppress stdout during processing (overlay.py prints diagnostics)
+    sys.stdout = StringIO()
     try:
-        cmd = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0",
-            "-show_entries", "format_tags=creation_time",
-            "-of", "json", video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        info = json.loads(result.stdout)
-        creation_time_str = info.get('format', {}).get('tags', {}).get('creation_time', None)
+        df = timed(timings, 'fit', load_telemetry, fit_path, config)
+        creation_time = creation_future.result() if creation_future else None
+        row_dict = telemetry_row(df, creation_time, timestamp, offset)
+        width, height = size
+        # Same layout scale as a render at this resolution
+        return timed(timings, 'overlay', create_frame_rgba, timestamp, row_dict, width, height,
+                     config=config, layout_scale=height / 1080.0)
+    finally:
+        # Restore stdout
+        sys.stdout = _real_stdout
+
+
+def render_preview(fit_path, video_path, timestamp, config, max_width=None, max_height=None, timings=None,
+                   offset=None):
+    """Video frame at timestamp with the overlay composited on top, fit into max_width x max_height."""
+    timings = {} if timings is None else timings
+    size = timed(timings, 'probe', preview_size, video_path, max_width, max_height)
+    # Extract video frame (decoded at the display size) while the overlay is prepared
+    frame_future = PREVIEW_EXECUTOR.submit(timed, timings, 'frame', get_video_frame, video_path, timestamp, size)
+    overlay_frame = render_overlay(fit_path, video_path, timestamp, config, size, timings, offset)
+    video_frame = frame_future.result()
+    
+    # Composite overlay on video frame (into a new image; the frame is cached)
+    return timed(timings, 'composite', Image.alpha_composite, video_frame, overlay_frame)
+
+
+def build_timeline(fit_path, video_path, config, size, rate=1.0, offset=None):
+    """
+    Telemetry of the whole clip as a compact binary payload, for drawing the HUD
+    in the browser while the video plays natively.
+
+    Samples are taken rate times per video second (sample i at t = i / rate), with
+    the row shown at each sample chosen like telemetry_row. offset overrides the
+    creation_time auto-sync (seconds into the activity at video time 0).
+
+    Payload: uint32 header length, the UTF-8 JSON header (space padded to 4 bytes),
+    then one little-endian float32 array of `count` samples per header 'columns'
+    entry: the text widgets' data columns, then TIMELINE_MARKER_COLUMNS. map_x/map_y are frame pixels of the map dot and profile_x of the
+    profile marker, all NaN where there is nothing to draw. The header carries
+    the layout and the static map/profile layer (a PNG with its position).
+    """
+    width, height = size
+    layout_scale = height / 1080.0
+    rate = min(TIMELINE_MAX_RATE, max(0.1, float(rate)))
+    sys.stdout = StringIO()
+    try:
+        df = load_telemetry(fit_path, config)
+        if offset is None:
+            offset = sync_offset(df, load_creation_time(video_path))
+        count = int(probe_video(video_path)['duration'] * rate) + 1
+
+        # Map and profile without markers; initializes the cached map used for projection
+        static_config = {name: dict(get_widget_cfg(config, name)) for name in WIDGETS}
+        for name in list(TEXT_WIDGETS) + ['chart']:
+            static_config[name]['enabled'] = False
+        static = create_frame_rgba(0, {'full_track_df': df}, width, height, config=static_config,
+                                   layout_scale=layout_scale)
+    finally:
+        sys.stdout = _real_stdout
+
+    seconds = np.arange(count) / rate + offset
+    targets = df.index[0] + pd.to_timedelta(seconds, unit='s')
+    rows = df.iloc[df.index.get_indexer(targets, method='nearest')]
+
+    def column(name):
+        if name not in rows:
+            return np.full(count, np.nan)
+        return pd.to_numeric(rows[name], errors='coerce').to_numpy(dtype=float)
+
+    text = {name: text_widget_spec(config, name) for name in TEXT_WIDGETS}
+    chart = chart_column(config) if get_widget_cfg(config, 'chart').get('enabled', True) else None
+    chart = chart if chart in df else None
+    data_columns = [spec[0] for spec in text.values()] + ([chart] if chart else [])
+    columns = list(dict.fromkeys(data_columns)) + TIMELINE_MARKER_COLUMNS
+    arrays = {name: column(name) for name in columns[:-len(TIMELINE_MARKER_COLUMNS)]}
+    map_x, map_y, map_size, dot_r = map_layout(width, config, layout_scale)
+    pixels = None
+    if get_widget_cfg(config, 'map').get('enabled', True) and 'position_lat' in rows:
+        pixels = track_pixels(column('position_lat'), column('position_long'), map_size)
+    arrays['map_x'] = map_x + pixels[0] if pixels else np.full(count, np.nan)
+    arrays['map_y'] = map_y + pixels[1] if pixels else np.full(count, np.nan)
+    prof_x, prof_y, prof_w, prof_h = profile_layout(width, height, config, layout_scale)
+    arrays['profile_x'] = np.full(count, np.nan)
+    if get_widget_cfg(config, 'elevation').get('enabled', True) and 'distance' in rows and 'altitude' in df:
+        arrays['profile_x'] = prof_x + profile_offsets(column('distance'), df, prof_w)
+
+    bbox = static.getbbox()
+    header = {
+        'count': count, 'rate': rate, 'offset': offset, 'columns': columns,
+        'frame_width': width, 'frame_height': height, 'layout_scale': layout_scale,
+        'map': {'size': map_size, 'dot_radius': dot_r},
+        'profile': {'y': prof_y, 'height': prof_h},
+        'text': {name: {'column': column_name, 'format': fmt, 'label': label,
+                        'y': int(50 * layout_scale) + int(slot * layout_scale)}
+                 for name, (column_name, fmt, label, slot) in text.items()},
+        'static': None,
+        'chart': None,
+    }
+    if chart:
+        # Drawn in the browser from the chart column, on the renderer's fixed scale
+        chart_x, chart_y, chart_w, chart_h = chart_layout(width, config, layout_scale)
+        low, high = chart_range(pd.to_numeric(df[chart], errors='coerce').to_numpy(dtype=float))
+        header['chart'] = {'column': chart, 'x': chart_x, 'y': chart_y, 'width': chart_w, 'height': chart_h,
+                           'low': low, 'high': high, 'window': CHART_WINDOW, 'label': chart_label(chart),
+                           'color': CHART_COLORS.get((metric_info(chart) or (chart,))[0], (255, 255, 255))}
+    if bbox:
+        image, mime = encode_image(static.crop(bbox), 'png')
+        header['static'] = {'image': image, 'mime': mime, 'x': bbox[0], 'y': bbox[1]}
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 4)
+    data = b''.join(arrays[name].astype('<f4').tobytes() for name in columns)
+    return struct.pack('<I', len(header_bytes)) + header_bytes + data
+
+
+def encode_image(image, fmt='png', quality=DEFAULT_QUALITY):
+    """Base64 encoding of an image in a response format, plus its MIME type."""
+    pil_format, mime = IMAGE_FORMATS[fmt]
+    buffer = BytesIO()
+    if pil_format == 'JPEG':
+        # No alpha in JPEG
+        image.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    elif pil_format == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=0)
+    else:
+        image.save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode('utf-8'), mime
+
+
+def request_offset(request):
+    """The request's sync offset in seconds, or None to auto-sync from creation_time."""
+    offset = request.get('offset')
+    return None if offset is None else float(offset)
+
+
+def handle_request(request):
+    """
+    Answer one --serve request (a dict); errors are returned, not raised.
+    mode 'composite' (default) returns the finished preview, 'frame' only the video
+    frame and 'overlay' only the overlay, cropped to its visible pixels, with its
+    x/y position in the frame (for compositing in the browser).
+    The response carries per-stage wall times in ms under 'timings'.
+    """
+    start = time.time()
+    response = {'id': request.get('id')}
+    timings = {}
+    try:
+        mode = request.get('mode') or 'composite'
+        timestamp = float(request.get('timestamp') or 0)
+        config = request.get('config') or {}
+        size = timed(timings, 'probe', preview_size, request['video'], request.get('max_width'),
+                     request.get('max_height'))
+        quality = int(request.get('quality') or DEFAULT_QUALITY)
+        # A sync chosen in the UI (e.g. refined); None uses the creation_time auto-sync
+        offset = request_offset(request)
         
-        if creation_time_str:
-            # Handle Z for UTC
-            return datetime.datetime.fromisoformat(creation_time_str.replace('Z', '+00:00'))
+        if mode == 'timeline':
+            payload = build_timeline(request['fit'], request['video'], config, size,
+                                     request.get('rate') or 1.0, offset)
+            response['timeline'] = base64.b64encode(payload).decode('utf-8')
+            response['frame_width'], response['frame_height'] = size
+            response['ms'] = int((time.time() - start) * 1000)
+            return response
+        if mode == 'frame':
+            image = timed(timings, 'frame', get_video_frame, request['video'], timestamp, size)
+            fmt = request.get('format') or 'jpeg'
+        elif mode == 'overlay':
+            image = render_overlay(request['fit'], request['video'], timestamp, config, size, timings, offset)
+            # Mostly transparent; only send the part with something drawn on it
+            bbox = image.getbbox()
+            response['x'], response['y'] = (bbox[0], bbox[1]) if bbox else (0, 0)
+            image = image.crop(bbox) if bbox else None
+            fmt = request.get('format') or 'png'
+        else:
+            image = render_preview(request['fit'], request['video'], timestamp, config,
+                                   request.get('max_width'), request.get('max_height'), timings, offset)
+            fmt = request.get('format') or 'jpeg'
+        
+        response['frame_width'], response['frame_height'] = size
+        if image is None:
+            response['image'], response['mime'] = None, None
+            response['width'], response['height'] = 0, 0
+        else:
+            response['image'], response['mime'] = timed(timings, 'encode', encode_image, image, fmt, quality)
+            response['width'], response['height'] = image.size
     except Exception as e:
-        sys.stderr.write(f"Metadata error: {e}\n")
-    return None
+        response['error'] = f"{type(e).__name__}: {e}"
+    response['ms'] = int((time.time() - start) * 1000)
+    response['timings'] = timings
+    return response
+
+
+def prefetch_timestamps(timestamp, direction):
+    """Nearby whole-second offsets to warm, nearest first, favouring the scrub direction."""
+    ahead = direction or 1
+    offsets = []
+    for step in range(1, PREFETCH_AHEAD + 1):
+        offsets.append(step * ahead)
+        if step <= PREFETCH_BEHIND:
+            offsets.append(-step * ahead)
+    # Past the end of the clip the decode just fails in the background
+    return [timestamp + o for o in offsets if timestamp + o >= 0]
+
+
+def _decode_into_cache(key, video_path, timestamp, size):
+    frame = decode_frame(video_path, timestamp, size)
+    store_frame(key, frame)
+    return frame
+
+
+def prefetch_frame(video_path, timestamp, size):
+    """Decode a frame into FRAME_CACHE on a spare core; returns its key."""
+    key = frame_key(video_path, timestamp, size)
+    with FRAME_CACHE_LOCK:
+        if key in FRAME_CACHE or key in FRAME_FUTURES:
+            return key
+        future = PREFETCH_EXECUTOR.submit(_decode_into_cache, key, video_path, timestamp, size)
+        FRAME_FUTURES[key] = future
+    future.add_done_callback(lambda f: FRAME_FUTURES.pop(key, None))
+    return key
+
+
+def plan_prefetch(request, last_timestamp):
+    """
+    Start warming the neighbourhood of a request. Frame decodes are submitted right
+    away; overlay renders are returned as a queue of callables for serve() to run
+    while no request is waiting. Queued decodes outside the new window are cancelled.
+    """
+    video_path, fit_path = request.get('video'), request.get('fit')
+    if not video_path or request.get('mode') == 'timeline':
+        return deque()
+    timestamp = float(request.get('timestamp') or 0)
+    direction = 0
+    if last_timestamp is not None and timestamp != last_timestamp:
+        direction = 1 if timestamp > last_timestamp else -1
+    size = preview_size(video_path, request.get('max_width'), request.get('max_height'))
+    timestamps = prefetch_timestamps(timestamp, direction)
+
+    wanted = set(prefetch_frame(video_path, ts, size) for ts in timestamps)
+    with FRAME_CACHE_LOCK:
+        stale = [f for key, f in FRAME_FUTURES.items() if key not in wanted]
+    for future in stale:
+        # Only cancels decodes that have not started; running ones finish into the cache
+        future.cancel()
+
+    tasks = deque()
+    if fit_path and request.get('mode') != 'frame':
+        config = request.get('config') or {}
+        offset = request_offset(request)
+        for ts in timestamps:
+            tasks.append(lambda ts=ts: render_overlay(fit_path, video_path, ts, config, size, None, offset))
+    return tasks
+
+
+def serve():
+    """
+    Answer JSON-line requests from stdin until it closes, prefetching around the
+    last request while idle. A new request always goes before queued prefetches.
+    """
+    lines = queue.Queue()
+
+    def read_stdin():
+        for line in sys.stdin:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+    prefetch = deque()
+    last_timestamp = None
+    while True:
+        try:
+            line = lines.get(block=not prefetch)
+        except queue.Empty:
+            # Idle: pre-render one overlay, then check for requests again
+            try:
+                prefetch.popleft()()
+            except Exception as e:
+                sys.stderr.write(f"Prefetch error: {e}\n")
+            continue
+        if line is None:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'id': None, 'error': f"Invalid request: {e}"}
+            request = None
+        else:
+            response = handle_request(request)
+        _real_stdout.write(json.dumps(response) + "\n")
+        _real_stdout.flush()
+        if request and 'error' not in response:
+            try:
+                prefetch = plan_prefetch(request, last_timestamp)
+                last_timestamp = float(request.get('timestamp') or 0)
+            except Exception as e:
+                prefetch = deque()
+                sys.stderr.write(f"Prefetch error: {e}\n")
+
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--fit', required=True, help='Path to FIT file')
-    parser.add_argument('--video', required=True, help='Path to video file')
-    parser.add_argument('--timestamp', type=int, default=0, help='Timestamp in seconds')
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived JSON-lines preview service')
+    parser.add_argument('--fit', help='Path to FIT file')
+    parser.add_argument('--video', help='Path to video file')
+    parser.add_argument('--timestamp', type=float, default=0, help='Timestamp in seconds')
     parser.add_argument('--config', type=str, default='{}', help='JSON config')
+    parser.add_argument('--max-width', type=int, default=None, help='Fit the preview into this width')
+    parser.add_argument('--max-height', type=int, default=None, help='Fit the preview into this height')
+    parser.add_argument('--format', choices=sorted(IMAGE_FORMATS), default='png', help='Output image format')
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY, help='JPEG/WebP quality')
+    parser.add_argument('--offset', type=float, default=None, help='Sync offset in seconds (overrides auto-sync)')
     args = parser.parse_args()
     
+    if args.serve:
+        serve()
+        return
+    if not args.fit or not args.video:
+        parser.error("--fit and --video are required")
+    
     # Parse config
     config = json.loads(args.config)
     
-    # Suppress stdout during processing
-    sys.stdout = StringIO()
-    
-    try:
-        # Parse FIT data
-        df = parse_fit(args.fit)
-        
-        # Calculate offset
-        creation_time = get_video_creation_time(args.video)
-        offset = 0
-        if creation_time and len(df) > 0:
-            fit_start = df.index[0]
-            if fit_start.tzinfo is None:
-                fit_start = fit_start.replace(tzinfo=datetime.timezone.utc)
-            offset = (creation_time - fit_start).total_seconds()
-            
-        # Get data at timestamp + offset
-        time_into_activity = args.timestamp + offset
-        
-        # Find row by time (since index is DatetimeIndex)
-        target_time = df.index[0] + pd.Timedelta(seconds=time_into_activity)
-        
-        try:
-            idx_val = df.index.get_indexer([target_time], method='nearest')[0]
-            row = df.iloc[idx_val]
-        except:
-            if len(df) > 0:
-                row = df.iloc[0]
-            else:
-                row = {}
-        
-        row_dict = row.to_dict()
-        row_dict['full_track_df'] = df
-        
-        # Extract video frame
-        video_frame = get_video_frame(args.video, args.timestamp)
-        width, height = video_frame.size
-        
-        # Generate overlay frame at video dimensions
-        overlay_frame = create_frame_rgba(args.timestamp, row_dict, width, height, config=config)
-        
-        # Composite overlay on video frame
-        video_frame.paste(overlay_frame, (0, 0), overlay_frame)
-        
-    finally:
-        # Restore stdout
-        sys.stdout = _real_stdout
-    
-    # Encode as base64
-    buffer = BytesIO()
-    video_frame.save(buffer, format='PNG')
-    base64_image = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    video_frame = render_preview(args.fit, args.video, args.timestamp, config, args.max_width, args.max_height,
+                                 offset=args.offset)
     
     # Output to stdout (only the base64 image)
-    print(base64_image)
+    image, _ = encode_image(video_frame, args.format, args.quality)
+    print(image)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+"""
+Bulk metadata scan of a directory of clips.
+Called from the web server (/api/scan-videos).
+
+Every clip is probed through the metadata cache with a bounded pool of ffprobe
+calls, so re-opening the same card is instant. With --fit, the FIT file is
+parsed while the clips are probed and each clip reports how many of its seconds
+fall inside the activity. Prints JSON:
+    {"directory": "...", "activity": {"start": "...", "end": "..."},
+     "clips": [{"path": "...", "name": "...", "duration": 62.1, "width": 3840, "height": 2160,
+                "fps": 29.97, "creation_time": "...", "overlap": 62.1, "overlaps": true}, ...],
+     "errors": [{"path": "...", "error": "..."}]}
+"""
+import sys
+import os
+import json
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.core.metadata import (
+    DEFAULT_PROBE_WORKERS, list_videos, probe_videos, creation_datetime,
+)
+
+
+def activity_span(fit_path):
+    """(start, end) of the FIT activity as aware datetimes, or None if it has no records."""
+    from src.core.extract import parse_fit
+    df = parse_fit(fit_path)
+    if len(df) == 0:
+        return None
+    start, end = df.index[0], df.index[-1]
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=datetime.timezone.utc)
+        end = end.replace(tzinfo=datetime.timezone.utc)
+    return start.to_pydatetime(), end.to_pydatetime()
+
+
+def activity_overlap(creation_time, duration, span):
+    """Seconds of a clip starting at creation_time that fall inside the activity span."""
+    if creation_time is None or span is None:
+        return None
+    if creation_time.tzinfo is None:
+        creation_time = creation_time.replace(tzinfo=datetime.timezone.utc)
+    clip_end = creation_time + datetime.timedelta(seconds=duration)
+    return max(0.0, (min(clip_end, span[1]) - max(creation_time, span[0])).total_seconds())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dir', required=True, help='Directory of video clips')
+    parser.add_argument('--fit', default=None, help='FIT file to check each clip against')
+    parser.add_argument('--workers', type=int, default=DEFAULT_PROBE_WORKERS, help='Parallel ffprobe calls')
+    args = parser.parse_args()
+
+    videos = list_videos(args.dir)
+    # Parse the FIT file while the clips are probed
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        span_future = executor.submit(activity_span, args.fit) if args.fit else None
+        probes = probe_videos(videos, args.workers)
+        span = span_future.result() if span_future else None
+
+    result = {
+        'directory': os.path.abspath(args.dir),
+        'activity': {'start': span[0].isoformat(), 'end': span[1].isoformat()} if span else None,
+        'clips': [],
+        'errors': [],
+    }
+    for path, metadata, error in probes:
+        if error:
+            result['errors'].append({'path': path, 'error': error})
+            continue
+        try:
+            overlap = activity_overlap(creation_datetime(metadata), metadata['duration'], span)
+        except Exception as e:
+            # One odd clip must not fail the whole scan
+            result['errors'].append({'path': path, 'error': f"Activity overlap: {e}"})
+            continue
+        result['clips'].append({
+            'path': path,
+            'name': os.path.basename(path),
+            'duration': metadata['duration'],
+            'width': metadata['display_width'],
+            'height': metadata['display_height'],
+            'fps': metadata['fps'],
+            'creation_time': metadata['creation_time'],
+            'overlap': overlap,
+            'overlaps': bool(overlap) if overlap is not None else None,
+        })
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Scrub thumbnails for the timeline.
+Called from the web server as a one-shot background job.
+
+Decodes the video once (keyframes only, scaled down) and tiles a thumbnail
+every --interval seconds into one JPEG sprite sheet, cached under the video's
+fingerprint. Prints the sprite index as JSON:
+    {"sprite": "...", "interval": 2.0, "count": 300, "columns": 20,
+     "tile_width": 160, "tile_height": 90, "duration": 600.0}
+"""
+import sys
+import os
+import json
+import math
+import argparse
+import subprocess
+
+from PIL import Image
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.core.metadata import probe_video
+from src.core.cache import cache_dir, file_fingerprint
+
+
+SPRITE_COLUMNS = 20
+# Keep sprite sheets within what browsers decode comfortably
+MAX_THUMBNAILS = 2000
+
+
+def build_sprite(video_path, interval, tile_width):
+    """Decode the video once and write its sprite sheet; returns the index dict."""
+    out_dir = cache_dir("thumbnails", file_fingerprint(video_path))
+    index_path = os.path.join(out_dir, f"index_{tile_width}_{interval:g}.json")
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            return json.load(f)
+
+    duration = probe_video(video_path)['duration']
+    # Long videos get sparser thumbnails instead of a huge sheet
+    interval = max(interval, duration / MAX_THUMBNAILS)
+    count = max(1, int(math.ceil(duration / interval)))
+    columns = min(SPRITE_COLUMNS, count)
+    rows = int(math.ceil(count / float(columns)))
+
+    sprite_path = os.path.join(out_dir, f"sprite_{tile_width}_{interval:g}.jpg")
+    partial_path = sprite_path + ".part.jpg"
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        # Only keyframes are decoded; the fps filter picks the one nearest each tick
+        "-skip_frame", "nokey",
+        "-i", video_path,
+        "-an", "-sn", "-dn",
+        "-vf", f"fps=1/{interval:g},scale={tile_width}:-2,tile={columns}x{rows}",
+        "-frames:v", "1",
+        "-q:v", "5",
+        partial_path
+    ]
+    subprocess.run(cmd, capture_output=True, check=True)
+    os.replace(partial_path, sprite_path)
+
+    with Image.open(sprite_path) as sprite:
+        sheet_w, sheet_h = sprite.size
+    index = {
+        'sprite': sprite_path,
+        'interval': interval,
+        'count': count,
+        'columns': columns,
+        'tile_width': sheet_w // columns,
+        'tile_height': sheet_h // rows,
+        'duration': duration,
+    }
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video', required=True, help='Path to video file')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between thumbnails')
+    parser.add_argument('--width', type=int, default=160, help='Thumbnail width in pixels')
+    args = parser.parse_args()
+
+    index = build_sprite(args.video, args.interval, args.width)
+    print(json.dumps(index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure peak frame memory of the render -> encode pipeline (src/core/framepipe.py).
+
+Renders synthetic RGBA frames through a FrameRing into an encoder and reports the
+peak traced allocation against the configured ring size. The default encoder is a
+deliberately slow reader, so the renderer outruns it and backpressure must keep
+memory flat; --ffmpeg encodes real qtrle instead.
+
+    python src/bench_frame_pipeline.py --width 3840 --height 2160 --frames 120 --ring 4
+
+Exits non-zero if the peak exceeds the ring plus one frame of renderer scratch.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.core.framepipe import encode_frames, rawvideo_writer_command, ring_bytes
+
+
+def slow_reader_command(frame_bytes, delay):
+    """A stand-in encoder that reads one frame every `delay` seconds."""
+    code = (
+        "import sys, time\n"
+        f"while sys.stdin.buffer.read({frame_bytes}):\n"
+        f"    time.sleep({delay})\n"
+    )
+    return [sys.executable, "-c", code]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--ring', type=int, default=4, help='Frame buffers in the ring')
+    parser.add_argument('--delay', type=float, default=0.01, help='Seconds the slow encoder spends per frame')
+    parser.add_argument('--ffmpeg', action='store_true', help='Encode qtrle with ffmpeg instead of the slow reader')
+    args = parser.parse_args()
+
+    frame_bytes = args.width * args.height * 4
+    if args.ffmpeg:
+        out_path = os.path.join(tempfile.mkdtemp(), "bench.mov")
+        command = rawvideo_writer_command(out_path, args.width, args.height, 30)
+    else:
+        command = slow_reader_command(frame_bytes, args.delay)
+
+    tracemalloc.start()
+    # The renderer keeps one source frame, like render_overlay_chunk's last_pixels
+    source = np.zeros((args.height, args.width, 4), dtype=np.uint8)
+
+    def render_into(n, buf):
+        source[:, :, 0] = n % 256
+        source[:, :, 3] = 255
+        np.copyto(buf, source)
+
+    start = time.time()
+    encode_frames(command, args.width, args.height, args.frames, render_into, args.ring)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    budget = ring_bytes(args.width, args.height, args.ring) + frame_bytes
+    print(f"{args.frames} frames {args.width}x{args.height} in {elapsed:.2f}s "
+          f"({args.frames / elapsed:.1f} fps)")
+    print(f"Peak traced memory: {peak / 1024**2:.1f} MB "
+          f"(ring of {args.ring}: {ring_bytes(args.width, args.height, args.ring) / 1024**2:.1f} MB, "
+          f"budget {budget / 1024**2:.1f} MB)")
+    # Small slack for queue/thread bookkeeping
+    if peak > budget + 1024**2:
+        print("FAIL: peak memory exceeds the configured ring")
+        sys.exit(1)
+    print("OK: peak memory is bounded by the ring size")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Per-frame cost of overlay widgets (src/core/overlay.py), rendered alone in their region.
+
+Times the history chart against the text widgets on a synthetic ride, with a new
+telemetry row every frame (the worst case; real renders redraw once per row).
+Chart tile renders are included, amortized over the frames that use them.
+For reference it also times a naive chart that redraws its polyline from scratch
+every frame, which is what the cached strip avoids. It is swapped in for
+overlay.chart_window, so both go through create_frame_rgba with the same
+background, border and label.
+
+    python src/bench_widgets.py --height 2160 --frames 600
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.core import overlay
+from src.core.overlay import (
+    TEXT_WIDGETS, CHART_WINDOW, CHART_COLORS, create_frame_rgba, widget_config, widget_region,
+    chart_data,
+)
+
+
+def synthetic_ride(seconds):
+    """A 1 Hz ride with noisy power, heart rate and speed."""
+    rng = np.random.default_rng(0)
+    t = np.arange(seconds)
+    power = np.clip(200 + 80 * np.sin(t / 90.0) + rng.normal(0, 40, seconds), 0, None)
+    index = pd.date_range('2026-01-01', periods=seconds, freq='1s', tz='UTC')
+    return pd.DataFrame({
+        'power': power,
+        'heart_rate': 140 + 20 * np.sin(t / 300.0),
+        'speed_mph': 18 + 4 * np.sin(t / 120.0),
+        'cadence': 85 + rng.normal(0, 5, seconds),
+        'grade': 2 * np.sin(t / 600.0),
+    }, index=index)
+
+
+def time_widget(df, name, config, width, height, layout_scale, frames, start):
+    """Mean ms per frame rendering one widget into its own region."""
+    layer = widget_config(config, name)
+    region = widget_region(name, width, height, config, layout_scale)
+    elapsed = 0.0
+    for n in range(frames):
+        i = start + n
+        row = df.iloc[i].to_dict()
+        row['full_track_df'] = df
+        row['track_index'] = i
+        begin = time.perf_counter()
+        create_frame_rgba(0, row, width, height, config=layer, layout_scale=layout_scale, region=region)
+        elapsed += time.perf_counter() - begin
+    return elapsed / frames * 1000
+
+
+def naive_chart_window(full_track, column, track_index, chart_w, chart_h, line_width):
+    """Drop-in for overlay.chart_window that draws the last CHART_WINDOW seconds as a fresh polyline."""
+    values, low, high = chart_data(full_track, column)
+    window = values[max(0, track_index - CHART_WINDOW):track_index + 1]
+    xs = chart_w - 1 - np.arange(len(window))[::-1] * (chart_w / float(CHART_WINDOW))
+    ys = (chart_h - 1) - (np.clip(window, low, high) - low) * ((chart_h - 2) / (high - low))
+    points = list(zip(xs.tolist(), ys.tolist()))
+    color = CHART_COLORS.get(column, (255, 255, 255))
+    img = Image.new('RGBA', (chart_w, chart_h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.polygon([(points[0][0], chart_h)] + points + [(points[-1][0], chart_h)], fill=color + (70,))
+    draw.line(points, fill=color + (255,), width=line_width)
+    return img
+
+
+def time_naive_chart(df, config, width, height, layout_scale, frames, start):
+    """Mean ms per frame of the chart widget with naive_chart_window in place of the cached strip."""
+    cached = overlay.chart_window
+    overlay.chart_window = naive_chart_window
+    try:
+        return time_widget(df, 'chart', config, width, height, layout_scale, frames, start)
+    finally:
+        overlay.chart_window = cached
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--ride', type=int, default=3 * 3600, help='Ride length in seconds')
+    args = parser.parse_args()
+
+    width = args.height * 16 // 9
+    layout_scale = args.height / 1080.0
+    df = synthetic_ride(args.ride)
+    config = {'chart': {'enabled': True, 'scale': 1.0, 'opacity': 1.0}}
+    # Start past the first window so the chart is full
+    start = min(args.ride - args.frames, 2 * CHART_WINDOW)
+
+    print(f"{width}x{args.height}, {args.frames} frames, one new row per frame")
+    results = {name: time_widget(df, name, config, width, args.height, layout_scale, args.frames, start)
+               for name in list(TEXT_WIDGETS) + ['chart']}
+    for name, ms in results.items():
+        print(f"  {name:<12} {ms:6.3f} ms/frame")
+    naive = time_naive_chart(df, config, width, args.height, layout_scale, args.frames, start)
+    print(f"  {'naive chart':<12} {naive:6.3f} ms/frame (polyline redrawn every frame)")
+    text_mean = np.mean([results[name] for name in TEXT_WIDGETS])
+    print(f"Chart costs {results['chart'] / text_mean:.2f}x a text widget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Sync refinement by cross-correlating video motion with FIT speed.
+
+creation_time is often off by seconds (camera clock drift, time zone mistakes).
+The clip is decoded once and scaled down to tiny grayscale frames; the mean
+absolute difference between consecutive frames, summed per second, gives a
+motion-energy signal that rises and falls with riding speed. Its cross-correlation with the 1 Hz FIT speed
+series (computed with FFTs) peaks at the offset where the two line up; the
+search is limited to a window around the metadata estimate.
+
+When the clip has a keyframe at least every MAX_KEYFRAME_SPACING seconds (see
+keyframe_times) only keyframes are decoded (still at full resolution), so an
+hour of footage with a keyframe per second decodes about 3600 frames instead
+of over 100,000. The keyframe index is read from packet flags only here, on
+first use, and cached on disk next to the video metadata.
+"""
+import json
+import os
+import subprocess
+
+import numpy as np
+
+from src.core.cache import cache_dir, file_fingerprint
+
+
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+
+# Decoded size and sample rate of the motion signal
+MOTION_WIDTH = 64
+MOTION_HEIGHT = 36
+MOTION_FPS = 4
+
+# Decode keyframes only when they are at most this far apart
+MAX_KEYFRAME_SPACING = 2.0
+
+# Seconds searched either side of the metadata estimate
+DEFAULT_SEARCH_WINDOW = 120
+
+# Candidate offsets must line up at least this many seconds of video with the activity
+MIN_OVERLAP = 30
+
+# Below this peak correlation the match is not trusted
+MIN_CONFIDENCE = 0.3
+
+
+def keyframe_times(video_path):
+    """
+    Sorted keyframe timestamps (seconds) of a clip's first video stream, cached per
+    file version. Read from the packet flags, so the file is demuxed but nothing is
+    decoded; [] if ffprobe fails.
+    """
+    fingerprint = file_fingerprint(video_path)
+    cache_path = os.path.join(cache_dir("keyframes", fingerprint[:2]), fingerprint + ".json")
+    try:
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    cmd = [
+        FFPROBE_BIN, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "json", video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        packets = json.loads(result.stdout).get('packets', [])
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return []
+    keyframes = sorted(float(p['pts_time']) for p in packets
+                       if 'K' in p.get('flags', '') and p.get('pts_time') not in (None, 'N/A'))
+
+    # Write-then-rename so concurrent probes never see a partial file
+    partial_path = f"{cache_path}.{os.getpid()}.part"
+    with open(partial_path, 'w') as f:
+        json.dump(keyframes, f)
+    os.replace(partial_path, cache_path)
+    return keyframes
+
+
+def motion_energy(video_path):
+    """Per-second motion energy of a clip: a float array with one value per second of video."""
+    keyframes = np.asarray(keyframe_times(video_path), dtype=float)
+    keyframes_only = len(keyframes) > 2 and np.median(np.diff(keyframes)) <= MAX_KEYFRAME_SPACING
+
+    cmd = [FFMPEG_BIN, "-v", "error"]
+    if keyframes_only:
+        # Between keyframes the fps filter repeats the last one, so motion lands on keyframe ticks
+        cmd += ["-skip_frame", "nokey"]
+    cmd += [
+        "-i", video_path,
+        "-an", "-sn", "-dn",
+        "-vf", f"fps={MOTION_FPS},scale={MOTION_WIDTH}:{MOTION_HEIGHT},format=gray",
+        "-f", "rawvideo", "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+
+    frame_bytes = MOTION_WIDTH * MOTION_HEIGHT
+    count = len(result.stdout) // frame_bytes
+    if count < 2:
+        return np.zeros(0)
+    frames = np.frombuffer(result.stdout, dtype=np.uint8, count=count * frame_bytes)
+    frames = frames.reshape(count, MOTION_HEIGHT, MOTION_WIDTH)
+
+    # Change from the previous frame; the first frame has none
+    diffs = np.zeros(count)
+    diffs[1:] = np.abs(np.diff(frames.astype(np.int16), axis=0)).mean(axis=(1, 2))
+    seconds = count // MOTION_FPS
+    return diffs[:seconds * MOTION_FPS].reshape(seconds, MOTION_FPS).sum(axis=1)
+
+
+def speed_series(df):
+    """FIT speed (m/s), one value per second from the start of the activity."""
+    if 'speed' not in df:
+        return np.zeros(0)
+    return df['speed'].fillna(0).to_numpy(dtype=float)
+
+
+def _zscore(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def correlate_offsets(motion, speed, lags):
+    """
+    Correlation of motion[t] with speed[t + lag] for each integer lag (seconds
+    into the activity at video time 0), normalized by the overlap so scores are
+    comparable to a Pearson coefficient. Lags with less than MIN_OVERLAP
+    seconds of overlap score -inf.
+    """
+    m, s = _zscore(motion), _zscore(speed)
+    n, length = len(m), len(s)
+    size = 1 << int(np.ceil(np.log2(n + length)))
+    # corr[k] = sum_t s[t + k] * m[t]; negative lags wrap around to the end
+    corr = np.fft.irfft(np.fft.rfft(s, size) * np.conj(np.fft.rfft(m, size)), size)
+    overlap = np.minimum(n, length - lags) - np.maximum(0, -lags)
+    scores = corr[lags % size] / np.maximum(overlap, 1)
+    return np.where(overlap >= min(MIN_OVERLAP, n), scores, -np.inf)
+
+
+def refine_offset(video_path, df, estimate=None, window=DEFAULT_SEARCH_WINDOW):
+    """
+    Offset (seconds into the activity at video time 0) that best lines up the
+    clip's motion with the FIT speed, searched within estimate +/- window (the
+    whole activity without an estimate).
+
+    Returns {'offset', 'confidence', 'estimate', 'correction'}, or None when
+    either signal is too short or flat to match. The offset is refined below
+    one second by fitting a parabola through the peak.
+    """
+    motion = motion_energy(video_path)
+    speed = speed_series(df)
+    if len(motion) < 2 or len(speed) < 2 or not motion.std() or not speed.std():
+        return None
+
+    if estimate is None:
+        lags = np.arange(-(len(motion) - 1), len(speed))
+    else:
+        centre = int(round(estimate))
+        lags = np.arange(centre - int(window), centre + int(window) + 1)
+    scores = correlate_offsets(motion, speed, lags)
+    best = int(np.argmax(scores))
+    if not np.isfinite(scores[best]):
+        return None
+
+    offset = float(lags[best])
+    if 0 < best < len(scores) - 1 and np.isfinite(scores[best - 1]) and np.isfinite(scores[best + 1]):
+        y0, y1, y2 = scores[best - 1], scores[best], scores[best + 1]
+        curvature = y0 - 2 * y1 + y2
+        if curvature < 0:
+            offset += 0.5 * (y0 - y2) / curvature
+
+    return {
+        'offset': offset,
+        'confidence': float(scores[best]),
+        'estimate': estimate,
+        'correction': None if estimate is None else offset - estimate,
+    }
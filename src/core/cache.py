@@ -0,0 +1,149 @@
+"""
+On-disk caches shared between jobs.
+
+Rendered overlay chunks are stored content-addressed: the key is a hash of
+everything that determines the pixels (telemetry fingerprint, config,
+resolution, fps and time range), so re-exporting the same ride at another
+output quality or re-running a failed job reuses identical chunks.
+The cache is capped in size and evicts least-recently-used entries.
+"""
+import hashlib
+import os
+import shutil
+import sys
+import uuid
+
+
+# Root for all ProjectOverlay caches (override with PROJECTOVERLAY_CACHE_DIR)
+CACHE_ROOT = os.environ.get(
+    "PROJECTOVERLAY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "projectoverlay")
+)
+
+DEFAULT_CHUNK_CACHE_GB = 20
+
+
+def cache_dir(*parts):
+    """Return (and create) a directory under the cache root."""
+    path = os.path.join(CACHE_ROOT, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_fingerprint(path):
+    """Cheap identity of a media file: path, size and modification time (no content read)."""
+    st = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{st.st_size}|{int(st.st_mtime)}"
+    return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst when possible (same filesystem), otherwise copy."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ChunkCache:
+    """Content-addressed store of rendered overlay segments with LRU eviction."""
+
+    def __init__(self, root=None, max_bytes=DEFAULT_CHUNK_CACHE_GB * 1024**3, suffix=".mov"):
+        self.root = root or cache_dir("chunks")
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        # Running size of the cache as last measured plus what this process stored
+        # since; None until the first put walks the cache
+        self.total_bytes = None
+
+    @staticmethod
+    def make_key(telemetry_hash, config_hash, width, height, fps, start_time, end_time):
+        """Build the cache key for one rendered segment."""
+        parts = [
+            telemetry_hash, config_hash,
+            f"{int(width)}x{int(height)}", f"{float(fps):.6f}",
+            f"{float(start_time):.6f}", f"{float(end_time):.6f}",
+        ]
+        return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def get(self, key, dest_path):
+        """
+        Materialize a cached segment at dest_path.
+        Returns True on a hit. A hit refreshes the entry's LRU timestamp.
+        """
+        path = self.path_for(key)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return False
+        try:
+            os.utime(path, None)
+            link_or_copy(path, dest_path)
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, src_path):
+        """Store a rendered segment, then evict old entries if over the cap."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer: jobs storing the same key must not share a temp file
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            link_or_copy(src_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+            # Renaming onto another link of the same file is a no-op that keeps tmp_path
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except OSError as e:
+            print(f"Chunk cache store failed: {e}", file=sys.stderr)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        if self.total_bytes is None:
+            self.evict()
+            return
+        self.total_bytes += size - replaced
+        # Walk the cache only once the running total says it may be over the cap
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove least-recently-used entries until the cache fits in max_bytes.
+        Measures the whole cache (including entries other processes added) and
+        resets the running total.
+        """
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        self.total_bytes = total
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
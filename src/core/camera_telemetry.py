@@ -0,0 +1,383 @@
+"""
+Camera telemetry embedded in action cam recordings, for exact sync.
+
+DJI cameras write a subtitle track (or a sidecar .SRT) with a timestamp and
+GPS position for every frame; GoPro cameras write a GPMF data track ('gpmd')
+with GPS samples and GPS UTC time. Only that track is read: ffmpeg selects it
+with -map and copies it out, so no video is decoded and a multi-GB file costs
+about as much as reading its few hundred KB of telemetry.
+
+Samples are aligned with the FIT track by matching GPS positions (and, for
+GoPro, GPS UTC time), giving a sub-second sync offset that does not depend on
+the camera clock.
+"""
+import datetime
+import json
+import os
+import re
+import struct
+import subprocess
+import warnings
+
+import numpy as np
+
+
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+
+# Seconds searched either side of an estimate when matching positions
+DEFAULT_SEARCH_WINDOW = 120
+# Step of the sub-second refinement around the best whole-second offset
+FINE_STEP = 0.05
+# Matched samples needed to trust a position match
+MIN_MATCHED_SAMPLES = 20
+# Median distance (m) between camera and FIT positions above which a match is rejected
+MAX_MATCH_ERROR_M = 30.0
+# A camera track smaller than this (m) matches almost any offset, so it is not used
+MIN_TRACK_EXTENT_M = 100.0
+
+EARTH_RADIUS_M = 6371000.0
+
+
+# --- Track discovery and extraction ---
+
+def find_telemetry_stream(video_path):
+    """
+    Where the clip's telemetry lives: ('dji_srt', stream index), ('dji_srt', sidecar
+    path), ('gopro_gpmf', stream index), or None if it has none.
+    """
+    sidecar = os.path.splitext(video_path)[0]
+    for ext in ('.SRT', '.srt'):
+        if os.path.exists(sidecar + ext):
+            return 'dji_srt', sidecar + ext
+
+    cmd = [
+        FFPROBE_BIN, "-v", "error",
+        "-show_entries", "stream=index,codec_type,codec_name,codec_tag_string",
+        "-of", "json", video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get('streams', [])
+    for stream in streams:
+        if stream.get('codec_tag_string') == 'gpmd':
+            return 'gopro_gpmf', stream['index']
+    for stream in streams:
+        if stream.get('codec_type') == 'subtitle':
+            return 'dji_srt', stream['index']
+    return None
+
+
+def extract_subtitle_text(video_path, stream_index):
+    """A subtitle track as SRT text (subtitle packets only; the video is not decoded)."""
+    cmd = [
+        FFMPEG_BIN, "-v", "error", "-i", video_path,
+        "-map", f"0:{stream_index}", "-f", "srt", "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return result.stdout.decode('utf-8', 'replace')
+
+
+def extract_data_packets(video_path, stream_index):
+    """(pts_time, payload bytes) of every packet of a data track, copied without decoding."""
+    cmd = [
+        FFPROBE_BIN, "-v", "error", "-select_streams", str(stream_index),
+        "-show_entries", "packet=pts_time,size", "-of", "json", video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    packets = json.loads(result.stdout).get('packets', [])
+
+    cmd = [
+        FFMPEG_BIN, "-v", "error", "-i", video_path,
+        "-map", f"0:{stream_index}", "-c", "copy", "-f", "data", "-"
+    ]
+    data = subprocess.run(cmd, capture_output=True, check=True).stdout
+
+    out, pos = [], 0
+    for packet in packets:
+        size = int(packet['size'])
+        out.append((float(packet.get('pts_time') or 0), data[pos:pos + size]))
+        pos += size
+    return out
+
+
+# --- DJI SRT ---
+
+_SRT_TIME = re.compile(r'(\d+):(\d+):(\d+)[,.](\d+)\s*-->')
+_SRT_DATETIME = re.compile(r'(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)')
+_SRT_LAT = re.compile(r'latitude\s*:\s*(-?\d+(?:\.\d+)?)', re.I)
+_SRT_LON = re.compile(r'longt?itude\s*:\s*(-?\d+(?:\.\d+)?)', re.I)
+# Older firmware: GPS (lon, lat, alt)
+_SRT_GPS = re.compile(r'GPS\s*\(\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)')
+
+
+def parse_dji_srt(text):
+    """
+    Samples from DJI SRT text: dicts with t (video seconds), time (camera clock,
+    naive datetime or None) and lat/lon (None without a GPS fix).
+    """
+    samples = []
+    for block in re.split(r'\r?\n\s*\r?\n', text):
+        match = _SRT_TIME.search(block)
+        if not match:
+            continue
+        hh, mm, ss, frac = match.groups()
+        t = int(hh) * 3600 + int(mm) * 60 + int(ss) + int(frac) / 10.0 ** len(frac)
+
+        when = None
+        date_match = _SRT_DATETIME.search(block[match.end():])
+        if date_match:
+            value = date_match.group(1).replace(',', '.').replace('T', ' ')
+            try:
+                when = datetime.datetime.fromisoformat(value)
+            except ValueError:
+                pass
+
+        lat = lon = None
+        lat_match, lon_match = _SRT_LAT.search(block), _SRT_LON.search(block)
+        if lat_match and lon_match:
+            lat, lon = float(lat_match.group(1)), float(lon_match.group(1))
+        else:
+            gps_match = _SRT_GPS.search(block)
+            if gps_match:
+                lon, lat = float(gps_match.group(1)), float(gps_match.group(2))
+        if lat == 0 and lon == 0:
+            # No fix
+            lat = lon = None
+        samples.append({'t': t, 'time': when, 'lat': lat, 'lon': lon})
+    return samples
+
+
+# --- GoPro GPMF ---
+
+# GPMF value types: struct format of one element
+_GPMF_TYPES = {
+    'b': 'b', 'B': 'B', 's': 'h', 'S': 'H', 'l': 'i', 'L': 'I',
+    'f': 'f', 'd': 'd', 'j': 'q', 'J': 'Q', 'c': 'c', 'U': 'c',
+}
+
+
+def iter_gpmf(payload):
+    """(key, type, struct size, repeat, data) of each KLV entry, descending into nested ones."""
+    pos = 0
+    while pos + 8 <= len(payload):
+        key = payload[pos:pos + 4].decode('latin-1')
+        type_char = chr(payload[pos + 4])
+        size = payload[pos + 5]
+        repeat = struct.unpack('>H', payload[pos + 6:pos + 8])[0]
+        length = size * repeat
+        data = payload[pos + 8:pos + 8 + length]
+        pos += 8 + (length + 3) // 4 * 4
+        if type_char == '\0':
+            yield from iter_gpmf(data)
+        else:
+            yield key, type_char, size, repeat, data
+
+
+def _gpmf_values(type_char, size, repeat, data, fmt=None):
+    """Rows of numbers of a GPMF entry (fmt: element types for complex '?' entries)."""
+    fmt = fmt or _GPMF_TYPES[type_char] * (size // struct.calcsize('>' + _GPMF_TYPES[type_char]))
+    row = struct.Struct('>' + fmt)
+    return [row.unpack_from(data, i * size) for i in range(repeat)]
+
+
+def _gpsu_datetime(data):
+    # 'yymmddhhmmss.sss', GPS UTC time
+    value = data.decode('ascii', 'replace').strip('\0 ')
+    try:
+        return datetime.datetime.strptime(value, '%y%m%d%H%M%S.%f').replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        return None
+
+
+def parse_gpmf_packet(payload, start, duration):
+    """
+    GPS samples of one GPMF packet covering video time [start, start + duration).
+    Samples are spread evenly over the packet; time is GPS UTC (aware) when known.
+    """
+    samples = []
+    scale, gpsu, type_fmt, fix = None, None, None, None
+    for key, type_char, size, repeat, data in iter_gpmf(payload):
+        if key == 'SCAL':
+            scale = [v for row in _gpmf_values(type_char, size, repeat, data) for v in row]
+        elif key == 'GPSU':
+            gpsu = _gpsu_datetime(data)
+        elif key == 'GPSF':
+            fix = _gpmf_values(type_char, size, repeat, data)[0][0]
+        elif key == 'TYPE':
+            type_fmt = ''.join(_GPMF_TYPES.get(c, 'x') for c in data.decode('latin-1').strip('\0'))
+        elif key in ('GPS5', 'GPS9'):
+            fmt = type_fmt if type_char == '?' else None
+            rows = _gpmf_values(type_char, size, repeat, data, fmt)
+            divisors = scale or [1]
+            if len(divisors) == 1 and rows:
+                # One scale for every field
+                divisors = divisors * len(rows[0])
+            for i, row in enumerate(rows):
+                values = [v / d if d else v for v, d in zip(row, divisors)]
+                t = start + duration * i / len(rows)
+                when = None
+                if key == 'GPS9' and len(values) >= 7:
+                    # Days since 2000-01-01 and seconds since midnight, per sample
+                    when = (datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+                            + datetime.timedelta(days=values[5], seconds=values[6]))
+                    sample_fix = values[8] if len(values) > 8 else fix
+                elif gpsu is not None:
+                    when = gpsu + datetime.timedelta(seconds=duration * i / len(rows))
+                    sample_fix = fix
+                else:
+                    sample_fix = fix
+                has_fix = sample_fix is None or sample_fix >= 2
+                samples.append({
+                    't': t, 'time': when if has_fix else None,
+                    'lat': values[0] if has_fix else None, 'lon': values[1] if has_fix else None,
+                })
+            # Entries of the next stream start a new scale/type
+            scale, type_fmt = None, None
+    return samples
+
+
+def read_gpmf(video_path, stream_index):
+    """GPS samples of a GoPro GPMF track (see parse_gpmf_packet)."""
+    packets = extract_data_packets(video_path, stream_index)
+    samples = []
+    for k, (start, payload) in enumerate(packets):
+        end = packets[k + 1][0] if k + 1 < len(packets) else start + 1.0
+        samples.extend(parse_gpmf_packet(payload, start, max(0.0, end - start)))
+    return samples
+
+
+def camera_samples(video_path):
+    """(source, samples) of the clip's embedded telemetry, or (None, []) without any."""
+    found = find_telemetry_stream(video_path)
+    if found is None:
+        return None, []
+    source, where = found
+    if source == 'gopro_gpmf':
+        return source, read_gpmf(video_path, where)
+    if isinstance(where, str):
+        with open(where, 'r', encoding='utf-8', errors='replace') as f:
+            return source, parse_dji_srt(f.read())
+    return source, parse_dji_srt(extract_subtitle_text(video_path, where))
+
+
+# --- Alignment with the FIT track ---
+
+def _fit_start(df):
+    start = df.index[0]
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=datetime.timezone.utc)
+    return start
+
+
+def time_offset(samples, df):
+    """
+    Offset (seconds into the activity at video time 0) from sample clock times,
+    the median over all samples. Naive times (camera clock) are taken as UTC,
+    like creation_time. None without timed samples.
+    """
+    fit_start = _fit_start(df)
+    offsets = []
+    for s in samples:
+        when = s['time']
+        if when is None:
+            continue
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        offsets.append((when - fit_start).total_seconds() - s['t'])
+    return float(np.median(offsets)) if offsets else None
+
+
+def _match_errors(t, lat, lon, fit_lat, fit_lon, fit_valid, offsets):
+    """Median distance (m) between camera and FIT positions for each candidate offset."""
+    index = t[None, :] + offsets[:, None]
+    grid = np.arange(len(fit_lat))
+    # FIT rows are 1 s apart from the activity start
+    lat_f = np.interp(index, grid, fit_lat)
+    lon_f = np.interp(index, grid, fit_lon)
+    valid = (index >= 0) & (index <= len(fit_lat) - 1) & (np.interp(index, grid, fit_valid) > 0.999)
+    dy = np.radians(lat_f - lat[None, :])
+    dx = np.radians(lon_f - lon[None, :]) * np.cos(np.radians(lat[None, :]))
+    dist = EARTH_RADIUS_M * np.hypot(dx, dy)
+    dist[~valid] = np.nan
+    enough = valid.sum(axis=1) >= min(MIN_MATCHED_SAMPLES, len(t))
+    # Offsets without enough matches are all-NaN rows; they become inf below
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        errors = np.nanmedian(np.where(enough[:, None], dist, np.nan), axis=1)
+    return np.where(enough, errors, np.inf)
+
+
+def gps_offset(samples, df, estimate=None, window=DEFAULT_SEARCH_WINDOW):
+    """
+    Offset that best lines up camera GPS positions with the FIT track, and the
+    median distance (m) at that offset. Searched whole seconds within
+    estimate +/- window (the whole activity without an estimate), then in
+    FINE_STEP steps around the best. None without usable positions.
+    """
+    if 'position_lat' not in df or 'position_long' not in df:
+        return None
+    fixes = [s for s in samples if s['lat'] is not None]
+    if not fixes:
+        return None
+    t = np.array([s['t'] for s in fixes])
+    # About one sample per second is plenty (DJI writes one per frame)
+    _, keep = np.unique(np.floor(t), return_index=True)
+    t = t[keep]
+    lat = np.array([s['lat'] for s in fixes])[keep]
+    lon = np.array([s['lon'] for s in fixes])[keep]
+    extent = EARTH_RADIUS_M * np.hypot(np.radians(np.ptp(lat)),
+                                       np.radians(np.ptp(lon)) * np.cos(np.radians(lat.mean())))
+    if extent < MIN_TRACK_EXTENT_M:
+        return None
+
+    fit_lat = df['position_lat'].to_numpy(dtype=float)
+    fit_lon = df['position_long'].to_numpy(dtype=float)
+    # parse_fit fills missing positions with 0
+    fit_valid = ((fit_lat != 0) | (fit_lon != 0)).astype(float)
+
+    if estimate is None:
+        offsets = np.arange(-np.ceil(t.max()), len(fit_lat), 1.0)
+        # Coarse pass over the whole activity on a sparser set of samples
+        coarse = slice(None, None, max(1, len(t) // 200))
+        errors = _match_errors(t[coarse], lat[coarse], lon[coarse], fit_lat, fit_lon, fit_valid, offsets)
+    else:
+        offsets = np.arange(np.round(estimate) - window, np.round(estimate) + window + 1, 1.0)
+        errors = _match_errors(t, lat, lon, fit_lat, fit_lon, fit_valid, offsets)
+    if not np.isfinite(errors).any():
+        return None
+    best = offsets[int(np.argmin(errors))]
+
+    fine = np.arange(best - 1.0, best + 1.0 + FINE_STEP / 2, FINE_STEP)
+    errors = _match_errors(t, lat, lon, fit_lat, fit_lon, fit_valid, fine)
+    i = int(np.argmin(errors))
+    if not np.isfinite(errors[i]):
+        return None
+    return float(fine[i]), float(errors[i])
+
+
+def sync_from_camera(video_path, df, estimate=None, window=DEFAULT_SEARCH_WINDOW):
+    """
+    Sync offset from the clip's embedded telemetry, or None if it has none usable.
+
+    GPS UTC time (GoPro) narrows the search; GPS positions give the offset
+    whenever they match the FIT track within MAX_MATCH_ERROR_M. Returns
+    {'offset', 'method': 'camera_gps' | 'camera_time', 'source', 'error_m', 'samples'}.
+    """
+    source, samples = camera_samples(video_path)
+    if not samples or len(df) == 0:
+        return None
+
+    # Only GPS time is trustworthy; the DJI camera clock is no better than creation_time
+    gps_time = source == 'gopro_gpmf' and any(s['time'] is not None for s in samples)
+    timed = time_offset(samples, df) if gps_time else None
+    if timed is not None:
+        estimate, window = timed, min(window, 10)
+
+    match = gps_offset(samples, df, estimate, window)
+    if match and match[1] <= MAX_MATCH_ERROR_M:
+        return {'offset': match[0], 'method': 'camera_gps', 'source': source,
+                'error_m': match[1], 'samples': len(samples)}
+    if timed is not None:
+        return {'offset': timed, 'method': 'camera_time', 'source': source,
+                'error_m': None, 'samples': len(samples)}
+    return None
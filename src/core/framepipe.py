@@ -0,0 +1,244 @@
+"""
+Bounded-memory frame pipeline from a renderer to an ffmpeg encoder.
+
+Frames are rendered into a fixed ring of reusable RGBA buffers and streamed to
+ffmpeg's stdin as rawvideo by a writer thread. When the encoder falls behind,
+the renderer blocks until a buffer is free again (backpressure), so the frame
+memory of a render worker is ring_frames * width * height * 4 bytes no matter
+how long the chunk is or how slow the encoder runs.
+
+SharedFrameRing does the same across processes: pool workers draw into slots
+of a shared memory block and a single writer feeds one encoder in frame order.
+"""
+import queue
+import subprocess
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+FFMPEG_BIN = "/usr/bin/ffmpeg"
+
+# Frames in flight between renderer and encoder
+DEFAULT_RING_FRAMES = 4
+
+# QuickTime RLE: lossless RGBA, smaller than PNG
+QTRLE_OPTS = ["-c:v", "qtrle", "-pix_fmt", "argb"]
+
+
+def ring_bytes(width, height, frames=DEFAULT_RING_FRAMES):
+    """Frame memory held by a ring of `frames` RGBA buffers."""
+    return frames * width * height * 4
+
+
+def chunk_frame_range(start_time, end_time, fps):
+    """
+    Global frame indices [first, last) of the frames shown in [start_time, end_time).
+    Using the global frame grid keeps chunk boundaries frame-exact, so
+    concatenated chunks never drift from the source (e.g. at 29.97 fps).
+    """
+    return int(round(start_time * fps)), int(round(end_time * fps))
+
+
+def rawvideo_writer_command(output_path, width, height, fps, codec_opts=None):
+    """FFmpeg command that encodes RGBA rawvideo frames from stdin."""
+    return [
+        FFMPEG_BIN, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", f"{fps}",
+        "-i", "-", "-an",
+    ] + (codec_opts or QTRLE_OPTS) + [output_path]
+
+
+class FrameRing:
+    """Fixed set of reusable RGBA frame buffers handed between a renderer and a writer."""
+
+    def __init__(self, width, height, frames=DEFAULT_RING_FRAMES):
+        self.buffers = [np.zeros((height, width, 4), dtype=np.uint8) for _ in range(max(1, frames))]
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for slot in range(len(self.buffers)):
+            self.free.put(slot)
+
+    def acquire(self):
+        """Slot of a free buffer; blocks while every buffer waits for the encoder."""
+        return self.free.get()
+
+    def publish(self, slot):
+        self.ready.put(slot)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def close(self):
+        self.ready.put(None)
+
+
+def encode_frames(command, width, height, frame_count, render_into, ring_frames=DEFAULT_RING_FRAMES):
+    """
+    Render frame_count frames through a FrameRing into an encoder process.
+
+    render_into(n, buf) draws frame n into buf, an (height, width, 4) uint8 array.
+    command is an encoder reading rawvideo RGBA on stdin (see rawvideo_writer_command).
+    Raises RuntimeError if the encoder fails.
+    """
+    ring = FrameRing(width, height, ring_frames)
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    errors = []
+
+    def writer():
+        while True:
+            slot = ring.ready.get()
+            if slot is None:
+                break
+            if not errors:
+                try:
+                    # The buffer itself is written; no per-frame copy or allocation
+                    process.stdin.write(ring.buffers[slot].data)
+                except Exception as e:
+                    errors.append(e)
+            # Keep recycling after a failure so the renderer never blocks forever
+            ring.release(slot)
+
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    try:
+        for n in range(frame_count):
+            if errors:
+                break
+            slot = ring.acquire()
+            render_into(n, ring.buffers[slot])
+            ring.publish(slot)
+    finally:
+        ring.close()
+        writer_thread.join()
+        try:
+            process.stdin.close()
+        except Exception as e:
+            errors.append(e)
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.wait()
+
+    if process.returncode != 0 or errors:
+        raise RuntimeError(f"Encoder failed ({process.returncode}): {stderr.strip() or errors}")
+
+
+# Rings attached by this (worker) process, by shared memory name
+_ATTACHED_RINGS = {}
+
+
+def _attach_shared_memory(name):
+    try:
+        # Python 3.13+: the creating process owns cleanup, attaching must not
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """
+    Frame slots in a single multiprocessing.shared_memory block.
+
+    The process that creates the ring streams slots to the encoder; render
+    workers attach by name (see attach_ring) and draw straight into a slot, so
+    frames cross process boundaries without being pickled or copied.
+    """
+
+    def __init__(self, width, height, slots, name=None):
+        self.width, self.height, self.slots = width, height, max(1, slots)
+        self.frame_bytes = width * height * 4
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slots * self.frame_bytes)
+        else:
+            self.shm = _attach_shared_memory(name)
+        self.frames = np.ndarray((self.slots, height, width, 4), dtype=np.uint8, buffer=self.shm.buf)
+
+    def describe(self):
+        """Picklable handle workers use to attach: (name, width, height, slots)."""
+        return self.shm.name, self.width, self.height, self.slots
+
+    def slot(self, i):
+        return self.frames[i]
+
+    def close(self):
+        # Views into the block must be gone before it can be closed
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def attach_ring(handle):
+    """Worker side: the ring for a describe() handle, attached once per process."""
+    ring = _ATTACHED_RINGS.get(handle[0])
+    if ring is None:
+        # Only one ring is streamed at a time; drop mappings of finished ones
+        for name in list(_ATTACHED_RINGS):
+            detach_ring((name,))
+        name, width, height, slots = handle
+        ring = _ATTACHED_RINGS[name] = SharedFrameRing(width, height, slots, name=name)
+    return ring
+
+
+def detach_ring(handle):
+    ring = _ATTACHED_RINGS.pop(handle[0], None)
+    if ring:
+        try:
+            ring.close()
+        except BufferError:
+            pass
+
+
+def stream_shared_ring(pool, ring, render_fn, runs, command, progress_callback=None):
+    """
+    Render runs of frames in a worker pool and encode them, in order, with one encoder.
+
+    runs: list of (task, repeat). render_fn((ring handle, slot, task)) runs in a pool
+    worker, draws the task's frame into the slot and returns the slot. The frame is
+    then written `repeat` times (consecutive identical frames are rendered once).
+    At most ring.slots frames are in flight, so a slow encoder throttles the pool.
+    progress_callback(frames_written, total_frames) is called after every run.
+    """
+    handle = ring.describe()
+    total_frames = sum(repeat for _, repeat in runs)
+    pending = iter(runs)
+    free = deque(range(ring.slots))
+    in_flight = deque()
+    written = 0
+
+    def submit_next():
+        for task, repeat in pending:
+            slot = free.popleft()
+            in_flight.append((pool.apply_async(render_fn, ((handle, slot, task),)), slot, repeat))
+            return True
+        return False
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while free and submit_next():
+            pass
+        while in_flight:
+            result, slot, repeat = in_flight.popleft()
+            result.get()
+            # Written straight from shared memory; no per-frame copy
+            data = ring.slot(slot).data
+            for _ in range(repeat):
+                process.stdin.write(data)
+            data.release()
+            written += repeat
+            free.append(slot)
+            while free and submit_next():
+                pass
+            if progress_callback:
+                progress_callback(written, total_frames)
+        process.stdin.close()
+    except:
+        process.kill()
+        process.wait()
+        raise
+    stderr = process.stderr.read().decode('utf-8', 'replace')
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"Encoder failed ({process.returncode}): {stderr.strip()}")
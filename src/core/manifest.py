@@ -0,0 +1,125 @@
+"""
+Per-job chunk manifest for resumable overlay rendering.
+
+The manifest records, for every overlay chunk that finished rendering, the
+inputs that produced it (time range, resolution, fps, config hash and a hash
+of the telemetry rows the chunk reads). On restart a chunk is reused only if
+its recorded inputs match the current job exactly and its file still exists.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Columns that the map and elevation widgets read from the full track
+TRACK_COLUMNS = ['position_lat', 'position_long', 'distance', 'altitude']
+
+
+def hash_config(config):
+    """Stable hash of a JSON-serializable overlay config."""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def hash_frame(df):
+    """Hash the values and index of a DataFrame."""
+    if df is None or len(df) == 0 or len(df.columns) == 0:
+        return hashlib.sha1(b"empty").hexdigest()
+    hashed = pd.util.hash_pandas_object(df, index=True).values
+    h = hashlib.sha1(hashed.tobytes())
+    h.update(",".join(map(str, df.columns)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def hash_track(df):
+    """Hash of the full-track columns (map and elevation profile depend on all of them)."""
+    cols = [c for c in TRACK_COLUMNS if c in df.columns]
+    return hash_frame(df[cols])
+
+
+def telemetry_window(df, offset, start_time, end_time):
+    """
+    Return the (first, last) row positions read by frames in [start_time, end_time].
+    Frames look up the nearest 1Hz row, so the window is clamped to the track edges.
+    """
+    if len(df) == 0:
+        return 0, -1
+    targets = [
+        df.index[0] + pd.Timedelta(seconds=start_time + offset),
+        df.index[0] + pd.Timedelta(seconds=end_time + offset),
+    ]
+    first, last = df.index.get_indexer(targets, method='nearest')
+    return int(first), int(last)
+
+
+def hash_telemetry_slice(df, offset, start_time, end_time, track_hash=None, columns=None):
+    """
+    Hash everything a chunk reads from the telemetry: the rows in its window,
+    where the chunk's frames fall on the track before clamping (which decides the
+    nearest row for each frame, including how many frames read a clamped edge row)
+    and, for renderers that draw the whole track, the full-track fingerprint.
+
+    columns: restrict the slice to the columns the renderer reads (None = all).
+    track_hash: full-track fingerprint to mix in, or None if the full track is not read.
+    """
+    first, last = telemetry_window(df, offset, start_time, end_time)
+    window = df.iloc[first:last + 1]
+    if columns is not None:
+        window = window[[c for c in columns if c in df.columns]]
+    h = hashlib.sha1(hash_frame(window).encode('utf-8'))
+    # A window clamped at both ends has the same rows for many offsets
+    h.update(f"{start_time + offset:.6f}|{end_time + offset:.6f}".encode('utf-8'))
+    if track_hash:
+        h.update(track_hash.encode('utf-8'))
+    return h.hexdigest()
+
+
+def chunk_entry(start_time, end_time, width, height, fps, config_hash, telemetry_hash, path):
+    """Build the manifest record for one chunk."""
+    return {
+        'start': round(float(start_time), 6),
+        'end': round(float(end_time), 6),
+        'width': int(width),
+        'height': int(height),
+        'fps': round(float(fps), 6),
+        'config_hash': config_hash,
+        'telemetry_hash': telemetry_hash,
+        'file': os.path.basename(path),
+    }
+
+
+def load_manifest(path):
+    """Load a manifest, returning an empty one if missing, corrupt or from another version."""
+    empty = {'version': MANIFEST_VERSION, 'chunks': {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if manifest.get('version') != MANIFEST_VERSION or not isinstance(manifest.get('chunks'), dict):
+        return empty
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically so a crash never leaves a half-written file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_chunk_valid(manifest, key, expected, work_dir):
+    """True if the recorded chunk matches the expected entry and its file is intact."""
+    entry = manifest['chunks'].get(key)
+    if entry != expected:
+        return False
+    chunk_path = os.path.join(work_dir, entry['file'])
+    return os.path.exists(chunk_path) and os.path.getsize(chunk_path) > 0
@@ -0,0 +1,179 @@
+"""
+Video metadata from a single ffprobe call, cached on disk.
+
+probe_video reads everything the pipeline needs about a clip in one ffprobe
+run (dimensions, rotation, fps, duration, bitrate, creation_time and timecode)
+and stores it as JSON under the video's fingerprint (path,
+size and mtime), so repeated UI actions and later jobs never re-probe an
+unchanged file. probe_videos does the same for many clips with a bounded pool.
+
+Only stream and container headers are read, never the packets, so a probe costs
+the same for a 10 s clip and a multi-GB recording. (The keyframe index autosync
+needs is a separate, lazily built probe; see src/core/autosync.py.)
+"""
+import datetime
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.cache import cache_dir, file_fingerprint
+
+
+FFPROBE_BIN = "ffprobe"
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+# Parallel ffprobe calls for bulk scans (I/O bound; a card reader is the bottleneck)
+DEFAULT_PROBE_WORKERS = 8
+
+# Bump when the cached fields change so old entries are re-probed
+METADATA_VERSION = 2
+
+# Probed clips in this process, by fingerprint
+_MEMORY_CACHE = {}
+
+
+def _parse_rate(rate):
+    parts = (rate or "0").split('/')
+    if len(parts) == 2:
+        return float(parts[0]) / float(parts[1]) if float(parts[1]) else 0.0
+    return float(parts[0])
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except:
+        return None
+
+
+def run_ffprobe(path):
+    """The raw ffprobe JSON for the first video stream and its container (headers only)."""
+    cmd = [
+        FFPROBE_BIN, "-v", "error", "-select_streams", "v:0",
+        "-show_entries",
+        "stream=width,height,duration,avg_frame_rate,bit_rate:stream_tags=rotate,timecode"
+        ":stream_side_data=rotation:format=duration,bit_rate:format_tags=creation_time,timecode",
+        "-of", "json", path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def parse_probe(info):
+    """Metadata dict from run_ffprobe output."""
+    stream = info['streams'][0]
+    fmt = info.get('format', {})
+    stream_tags = stream.get('tags', {})
+    format_tags = fmt.get('tags', {})
+
+    rotation = stream_tags.get('rotate', 0)
+    for side_data in stream.get('side_data_list', []):
+        rotation = side_data.get('rotation', rotation)
+    rotation = int(float(rotation)) % 360
+
+    width, height = int(stream['width']), int(stream['height'])
+    # ffmpeg auto-rotates, so decoded frames of a 90/270 degree clip are swapped
+    display_width, display_height = (height, width) if rotation % 180 else (width, height)
+
+    duration = stream.get('duration')
+    if duration in (None, 'N/A'):
+        duration = fmt.get('duration')
+
+    # Prefer the video stream bitrate, fall back to the container's
+    bitrate = _parse_int(stream.get('bit_rate'))
+    if bitrate is None:
+        bitrate = _parse_int(fmt.get('bit_rate'))
+
+    return {
+        'version': METADATA_VERSION,
+        'width': width,
+        'height': height,
+        'display_width': display_width,
+        'display_height': display_height,
+        'rotation': rotation,
+        'duration': float(duration or 0),
+        'fps': _parse_rate(stream.get('avg_frame_rate')),
+        'bitrate': bitrate,  # in bits per second
+        'creation_time': format_tags.get('creation_time'),
+        # Start timecode (tmcd track or format tag), or None
+        'timecode': format_tags.get('timecode') or stream_tags.get('timecode'),
+    }
+
+
+def probe_video(path):
+    """
+    Metadata dict of a video file (see parse_probe), probed once per file version.
+    Raises subprocess.CalledProcessError if ffprobe cannot read the file.
+    """
+    fingerprint = file_fingerprint(path)
+    metadata = _MEMORY_CACHE.get(fingerprint)
+    if metadata is not None:
+        return metadata
+
+    cache_path = os.path.join(cache_dir("metadata", fingerprint[:2]), fingerprint + ".json")
+    try:
+        with open(cache_path, 'r') as f:
+            metadata = json.load(f)
+        if metadata.get('version') != METADATA_VERSION:
+            metadata = None
+    except (OSError, ValueError):
+        metadata = None
+
+    if metadata is None:
+        metadata = parse_probe(run_ffprobe(path))
+        # Write-then-rename so concurrent probes never see a partial file
+        partial_path = f"{cache_path}.{os.getpid()}.part"
+        with open(partial_path, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(partial_path, cache_path)
+
+    _MEMORY_CACHE[fingerprint] = metadata
+    return metadata
+
+
+def creation_datetime(metadata):
+    """The creation_time tag as an aware datetime, or None if missing or unparseable."""
+    value = metadata.get('creation_time')
+    if not value:
+        return None
+    try:
+        # ISO format: 2026-01-29T04:06:37.000000Z
+        created = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # QuickTime creation_time is UTC; some cameras just omit the zone
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=datetime.timezone.utc)
+    return created
+
+
+def summary(metadata):
+    """Metadata without internal fields (for JSON responses to the UI)."""
+    return {k: v for k, v in metadata.items() if k != 'version'}
+
+
+def list_videos(directory):
+    """Sorted paths of the video files directly inside a directory (hidden files skipped)."""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if not name.startswith('.') and name.lower().endswith(VIDEO_EXTENSIONS)
+        and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def probe_videos(paths, max_workers=DEFAULT_PROBE_WORKERS):
+    """
+    Probe many clips with at most max_workers ffprobe calls at a time.
+    Returns (path, metadata, error) tuples in input order; exactly one of
+    metadata and error (the exception text) is None.
+    """
+    def probe(path):
+        try:
+            return path, probe_video(path), None
+        except Exception as e:
+            return path, None, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(probe, paths))
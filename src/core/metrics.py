@@ -0,0 +1,157 @@
+"""
+Derived metrics computed once per job from the parsed FIT data.
+
+create_frame_rgba only ever reads the current row, so anything that depends on
+a window of samples (3 s / 30 s average power, normalized power, the best value
+of the last N minutes) is computed here up front as ordinary DataFrame columns:
+rolling means from cumulative sums, range maxima from a sparse table. Text
+widgets pick one with a 'metric' key in their config (see
+overlay.text_widget_spec), and add_metrics computes only the metrics the
+config asks for.
+
+Rows are 1 Hz (parse_fit resamples), so windows are counted in rows.
+"""
+import re
+
+import numpy as np
+
+
+# Metric name -> (source column, value format, unit label)
+METRICS = {
+    'power_3s': ('power', "{:.0f}", "W 3S"),
+    'power_30s': ('power', "{:.0f}", "W 30S"),
+    'normalized_power': ('power', "{:.0f}", "NP"),
+    'watts_per_kg': ('power', "{:.1f}", "W/KG"),
+    'hr_zone': ('heart_rate', "Z{:.0f}", "HR ZONE"),
+}
+
+# "<column>_max_<N>m": highest value of a column (or metric) over the last N minutes
+MAX_METRIC = re.compile(r'^(\w+)_max_(\d+)m$')
+
+# Rider settings read from the widget config, with these defaults
+DEFAULT_WEIGHT_KG = 75.0
+DEFAULT_MAX_HR = 190.0
+
+# Upper bounds of heart rate zones 1-4 as fractions of max HR (zone 5 is above)
+HR_ZONE_BOUNDS = (0.6, 0.7, 0.8, 0.9)
+
+# Rolling window of normalized power (seconds)
+NP_WINDOW = 30
+
+
+def metric_info(name):
+    """(source column, value format, unit label) of a metric, or None if it is not one."""
+    if name in METRICS:
+        return METRICS[name]
+    match = MAX_METRIC.match(name or '')
+    if match:
+        source, minutes = match.group(1), int(match.group(2))
+        fmt = METRICS[source][1] if source in METRICS else ("{:.1f}" if source == 'grade' else "{:.0f}")
+        return source, fmt, f"MAX {minutes}MIN"
+    return None
+
+
+def required_metrics(config):
+    """Metrics the enabled widgets of a config select, as {metric: widget settings}."""
+    needed = {}
+    for cfg in (config or {}).values():
+        if not isinstance(cfg, dict) or not cfg.get('enabled', True):
+            continue
+        name = cfg.get('metric')
+        if name and metric_info(name):
+            needed[name] = cfg
+    return needed
+
+
+def rolling_mean(values, window):
+    """Trailing mean over window samples (fewer at the start), from cumulative sums."""
+    sums = np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(0, ends - window)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def normalized_power(power):
+    """Normalized power of the ride so far: fourth root of the running mean of (30 s power)^4."""
+    rolled = rolling_mean(power, NP_WINDOW) ** 4
+    return (np.cumsum(rolled) / np.arange(1, len(rolled) + 1)) ** 0.25
+
+
+def build_sparse_table(values, op=np.maximum):
+    """Levels k = 0, 1, ... where level k holds op over values[i:i + 2**k]."""
+    table = [np.asarray(values, dtype=float)]
+    span = 1
+    while span * 2 <= len(values):
+        prev = table[-1]
+        table.append(op(prev[:-span], prev[span:]))
+        span *= 2
+    return table
+
+
+def range_query(table, starts, ends, op=np.maximum):
+    """op over values[starts[i]:ends[i] + 1] for each i, two overlapping table lookups each."""
+    starts = np.asarray(starts)
+    ends = np.asarray(ends)
+    levels = np.floor(np.log2(ends - starts + 1)).astype(int)
+    result = np.empty(len(starts))
+    # One vectorized lookup per level (at most log2(n) of them)
+    for level in np.unique(levels):
+        mask = levels == level
+        row = table[level]
+        result[mask] = op(row[starts[mask]], row[ends[mask] - (1 << level) + 1])
+    return result
+
+
+def trailing_max(values, window):
+    """Highest value of the last window samples (fewer at the start) at every sample."""
+    ends = np.arange(len(values))
+    return range_query(build_sparse_table(values), np.maximum(0, ends - window + 1), ends)
+
+
+def hr_zones(heart_rate, max_hr):
+    """Heart rate zone 1-5 per sample (0 without a reading)."""
+    zones = np.digitize(heart_rate / float(max_hr), HR_ZONE_BOUNDS) + 1
+    return np.where(heart_rate > 0, zones, 0)
+
+
+def compute_metric(df, name, cfg, computed=None):
+    """Values of one metric for every row of df, or None if its source column is missing."""
+    computed = {} if computed is None else computed
+    if name in computed:
+        return computed[name]
+    source = metric_info(name)[0]
+    if source in df:
+        values = df[source].fillna(0).to_numpy(dtype=float)
+    elif metric_info(source):
+        values = compute_metric(df, source, cfg, computed)
+    else:
+        values = None
+    if values is None or len(values) == 0:
+        return None
+
+    match = MAX_METRIC.match(name)
+    if match:
+        result = trailing_max(values, int(match.group(2)) * 60)
+    elif name == 'power_3s':
+        result = rolling_mean(values, 3)
+    elif name == 'power_30s':
+        result = rolling_mean(values, 30)
+    elif name == 'normalized_power':
+        result = normalized_power(values)
+    elif name == 'watts_per_kg':
+        result = values / float(cfg.get('weight_kg') or DEFAULT_WEIGHT_KG)
+    elif name == 'hr_zone':
+        result = hr_zones(values, cfg.get('max_hr') or DEFAULT_MAX_HR)
+    computed[name] = result
+    return result
+
+
+def add_metrics(df, config):
+    """df with a column for every metric the config needs (df itself if it needs none)."""
+    columns = {}
+    computed = {}
+    for name, cfg in required_metrics(config).items():
+        values = compute_metric(df, name, cfg, computed)
+        if values is not None:
+            columns[name] = values
+    return df.assign(**columns) if columns else df
@@ -1,7 +1,13 @@
 from PIL import Image, ImageDraw, ImageFont
+from collections import OrderedDict
+import weakref
+
 import numpy as np
 import pandas as pd
 
+from src.core.manifest import hash_frame
+from src.core.metrics import metric_info, rolling_mean
+
 
 # Font path constant
 FONT_PATH_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
@@ -22,15 +28,403 @@ def get_scaled_font(font_path, base_size, scale):
 
 # Map cache globals
 CACHED_BACKGROUND = None
+CACHED_BACKGROUND_KEY = None  # track coloring the background was drawn with
 MAP_OBJ = None
 
+# Map track coloring ('color_by' in the map config) -> data column
+TRACK_COLOR_COLUMNS = {'speed': 'speed_mph', 'power': 'power', 'grade': 'grade'}
+# Colormap stops from low to high (blue, cyan, green, yellow, red), quantized to TRACK_COLOR_LEVELS
+TRACK_COLOR_STOPS = [(0, 60, 255), (0, 200, 255), (0, 220, 80), (255, 220, 0), (255, 40, 0)]
+TRACK_COLOR_LEVELS = 32
+# Grade is colored on a fixed scale (percent) so climbs look the same on every ride
+TRACK_GRADE_RANGE = (-10.0, 10.0)
+# Seconds of power averaged for coloring (raw power flickers between neighbours)
+TRACK_POWER_SMOOTHING = 30
+
 # Profile cache globals
 CACHED_PROFILE = None
 PROFILE_W = 0
 PROFILE_H = 0
 
 
-def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=None, layout_scale=1.0):
+# History chart: tiles of one pre-rendered full-ride strip, LRU by (column fingerprint, size, tile)
+CHART_TILES = OrderedDict()
+CHART_TILE_WIDTH = 2048
+CHART_TILE_CACHE_SIZE = 8
+# Column fingerprint -> (values, low, high): the column as floats and its chart_range, LRU
+CHART_DATA = OrderedDict()
+CHART_DATA_CACHE_SIZE = 8
+# id(track) -> (weak reference to the track, {column: fingerprint}), LRU. The weak
+# reference tells a live track from a later one that reuses a collected track's id.
+TRACK_FINGERPRINTS = OrderedDict()
+TRACK_FINGERPRINT_CACHE_SIZE = 8
+# Seconds of history shown
+CHART_WINDOW = 60
+CHART_DEFAULT_COLUMN = 'power'
+# Line color by source column (RGB)
+CHART_COLORS = {
+    'power': (255, 200, 0),
+    'heart_rate': (255, 70, 70),
+    'speed_mph': (0, 200, 255),
+    'cadence': (160, 255, 120),
+}
+
+
+def reset_track_cache():
+    """Forget the map background, elevation profile and chart strips (call when switching FIT files)."""
+    global CACHED_BACKGROUND, CACHED_BACKGROUND_KEY, MAP_OBJ, CACHED_PROFILE, PROFILE_W, PROFILE_H
+    CACHED_BACKGROUND = None
+    CACHED_BACKGROUND_KEY = None
+    MAP_OBJ = None
+    CACHED_PROFILE = None
+    PROFILE_W = 0
+    PROFILE_H = 0
+    CHART_TILES.clear()
+    CHART_DATA.clear()
+    TRACK_FINGERPRINTS.clear()
+
+
+# Overlay widgets, in draw order
+WIDGETS = ['speed', 'power', 'cadence', 'heart_rate', 'gradient', 'map', 'elevation', 'chart']
+
+# Widgets that stay off unless the config enables them
+OPTIONAL_WIDGETS = {'chart'}
+
+# Text widgets: (data column, value format, unit label, vertical slot at 1080p)
+TEXT_WIDGETS = {
+    'speed': ('speed_mph', "{:.0f}", "MPH", 0),
+    'power': ('power', "{:.0f}", "W", 200),
+    'cadence': ('cadence', "{:.0f}", "RPM", 400),
+    'heart_rate': ('heart_rate', "{:.0f}", "BPM", 600),
+    'gradient': ('grade', "{:.1f}%", "GRADIENT", 800),
+}
+
+# Widest value each text widget is expected to show (used to size its region)
+TEXT_WIDGET_SAMPLES = {
+    'speed': "888",
+    'power': "8888",
+    'cadence': "888",
+    'heart_rate': "888",
+    'gradient': "-88.8%",
+}
+
+# Telemetry columns each widget reads from the current row
+WIDGET_COLUMNS = {
+    'speed': ['speed_mph'],
+    'power': ['power'],
+    'cadence': ['cadence'],
+    'heart_rate': ['heart_rate'],
+    'gradient': ['grade'],
+    'map': ['position_lat', 'position_long'],
+    'elevation': ['distance'],
+    'chart': [CHART_DEFAULT_COLUMN],
+}
+
+# Widgets that also read the full track (map background, elevation profile)
+TRACK_WIDGETS = {'map', 'elevation'}
+
+DEFAULT_WIDGET_CFG = {'enabled': True, 'scale': 1.0, 'opacity': 1.0}
+
+
+def get_widget_cfg(config, name):
+    """Settings for one widget; missing widgets default to enabled (OPTIONAL_WIDGETS to disabled)."""
+    default = dict(DEFAULT_WIDGET_CFG, enabled=name not in OPTIONAL_WIDGETS)
+    if config is None:
+        return default
+    return config.get(name, default)
+
+
+def text_widget_spec(config, name):
+    """
+    (data column, value format, unit label, slot) of a text widget. A 'metric' in
+    its config (see src/core/metrics.py) replaces the raw column it shows.
+    """
+    column, fmt, label, slot = TEXT_WIDGETS[name]
+    info = metric_info(get_widget_cfg(config, name).get('metric'))
+    if info:
+        column = get_widget_cfg(config, name)['metric']
+        fmt, label = info[1], info[2]
+    return column, fmt, label, slot
+
+
+def chart_column(config):
+    """Data column plotted by the history chart (a raw column or a metric name)."""
+    return get_widget_cfg(config, 'chart').get('metric') or CHART_DEFAULT_COLUMN
+
+
+def widget_columns(config, name):
+    """Telemetry columns a widget reads from the current row with this config."""
+    if name in TEXT_WIDGETS:
+        return [text_widget_spec(config, name)[0]]
+    if name == 'chart':
+        return [chart_column(config)]
+    return WIDGET_COLUMNS[name]
+
+
+# Settings a widget's layout reads from other widgets (the chart sits below the map)
+WIDGET_LAYOUT_INPUTS = {'chart': {'map': ['scale']}}
+
+
+def widget_key(config, name):
+    """
+    The parts of a config that a single-widget layer depends on: the widget's own
+    settings plus the settings of other widgets that its layout reads. Other widgets'
+    settings are left out, so changing them keeps this layer's chunks valid.
+    """
+    key = {name: get_widget_cfg(config, name)}
+    for other, settings in WIDGET_LAYOUT_INPUTS.get(name, {}).items():
+        cfg = get_widget_cfg(config, other)
+        key[other] = {setting: cfg.get(setting, DEFAULT_WIDGET_CFG.get(setting)) for setting in settings}
+    return key
+
+
+def widget_config(config, name):
+    """Config that renders only the named widget (all others disabled)."""
+    single = {}
+    for other in WIDGETS:
+        cfg = dict(get_widget_cfg(config, other))
+        cfg['enabled'] = cfg.get('enabled', True) and other == name
+        single[other] = cfg
+    return single
+
+
+def map_layout(width, config=None, layout_scale=1.0):
+    """(x, y, size, dot radius) of the mini map in a frame of the given width."""
+    user_scale = get_widget_cfg(config, 'map').get('scale', 1.0)
+    map_size = max(1, int(300 * user_scale * layout_scale))
+    dot_r = max(4, int(6 * user_scale * layout_scale))
+    return width - map_size - int(50 * layout_scale), int(50 * layout_scale), map_size, dot_r
+
+
+def profile_layout(width, height, config=None, layout_scale=1.0):
+    """(x, y, width, height) of the elevation profile in a frame."""
+    user_scale = get_widget_cfg(config, 'elevation').get('scale', 1.0)
+    prof_h = max(1, int(150 * user_scale * layout_scale))
+    return int(50 * layout_scale), height - prof_h - int(50 * layout_scale), width - int(100 * layout_scale), prof_h
+
+
+def chart_label(column):
+    """Caption of the history chart, e.g. "W 60S"."""
+    info = metric_info(column)
+    label = info[2] if info else next(
+        (spec[2] for spec in TEXT_WIDGETS.values() if spec[0] == column), column.upper())
+    return f"{label} {CHART_WINDOW}S"
+
+
+def chart_layout(width, config=None, layout_scale=1.0):
+    """(x, y, width, height) of the history chart, below the mini map."""
+    user_scale = get_widget_cfg(config, 'chart').get('scale', 1.0)
+    chart_w = max(2, int(400 * user_scale * layout_scale))
+    chart_h = max(2, int(120 * user_scale * layout_scale))
+    map_x, map_y, map_size, _ = map_layout(width, config, layout_scale)
+    return width - chart_w - int(50 * layout_scale), map_y + map_size + int(40 * layout_scale), chart_w, chart_h
+
+
+def chart_range(values):
+    """(low, high) of the chart's fixed vertical scale: zero to the 99th percentile, ignoring spikes."""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 0.0, 1.0
+    low = min(0.0, float(finite.min()))
+    high = float(np.percentile(finite, 99)) * 1.1
+    return low, high if high > low else low + 1.0
+
+
+def column_fingerprint(full_track, column):
+    """
+    Content hash of one track column (with its index), hashed once per DataFrame.
+    Tracks with the same data (e.g. copies with other metric columns) share it.
+    """
+    entry = TRACK_FINGERPRINTS.get(id(full_track))
+    if entry is None or entry[0]() is not full_track:
+        entry = (weakref.ref(full_track), {})
+        TRACK_FINGERPRINTS[id(full_track)] = entry
+        while len(TRACK_FINGERPRINTS) > TRACK_FINGERPRINT_CACHE_SIZE:
+            TRACK_FINGERPRINTS.popitem(last=False)
+    TRACK_FINGERPRINTS.move_to_end(id(full_track))
+    if column not in entry[1]:
+        entry[1][column] = f"{column}:{hash_frame(full_track[[column]])}"
+    return entry[1][column]
+
+
+def chart_data(full_track, column):
+    """(values, low, high) of a chart column, converted and ranged once per column content."""
+    key = column_fingerprint(full_track, column)
+    if key in CHART_DATA:
+        CHART_DATA.move_to_end(key)
+        return CHART_DATA[key]
+    values = pd.to_numeric(full_track[column], errors='coerce').to_numpy(dtype=float)
+    CHART_DATA[key] = (values,) + chart_range(values)
+    while len(CHART_DATA) > CHART_DATA_CACHE_SIZE:
+        CHART_DATA.popitem(last=False)
+    return CHART_DATA[key]
+
+
+def chart_tile(full_track, column, chart_w, chart_h, line_width, index):
+    """
+    Tile `index` of the chart strip: the whole ride drawn once at chart_w / CHART_WINDOW
+    pixels per second, split into CHART_TILE_WIDTH pixel tiles rendered on first use.
+    Sample i sits at strip x = i * pixels-per-second, so tiles join seamlessly.
+    """
+    key = (column_fingerprint(full_track, column), chart_w, chart_h, line_width, index)
+    tile = CHART_TILES.get(key)
+    if tile is not None:
+        CHART_TILES.move_to_end(key)
+        return tile
+
+    values, low, high = chart_data(full_track, column)
+    pps = chart_w / float(CHART_WINDOW)
+    x0 = index * CHART_TILE_WIDTH
+    # Samples just outside the tile too, so lines cross its edges
+    first = max(0, int(np.floor(x0 / pps)) - 1)
+    last = min(len(values), int(np.ceil((x0 + CHART_TILE_WIDTH) / pps)) + 2)
+    tile = Image.new('RGBA', (CHART_TILE_WIDTH, chart_h), (0, 0, 0, 0))
+    if last - first > 1:
+        xs = np.arange(first, last) * pps - x0
+        vals = np.clip(np.nan_to_num(values[first:last], nan=low), low, high)
+        ys = (chart_h - 1) - (vals - low) * ((chart_h - 2) / (high - low))
+        points = list(zip(xs.tolist(), ys.tolist()))
+        color = CHART_COLORS.get((metric_info(column) or (column,))[0], (255, 255, 255))
+        tile_draw = ImageDraw.Draw(tile)
+        tile_draw.polygon([(points[0][0], chart_h)] + points + [(points[-1][0], chart_h)], fill=color + (70,))
+        tile_draw.line(points, fill=color + (255,), width=line_width)
+
+    CHART_TILES[key] = tile
+    while len(CHART_TILES) > CHART_TILE_CACHE_SIZE:
+        CHART_TILES.popitem(last=False)
+    return tile
+
+
+def chart_window(full_track, column, track_index, chart_w, chart_h, line_width):
+    """The last CHART_WINDOW seconds of the strip up to track_index, as a chart_w x chart_h image."""
+    pps = chart_w / float(CHART_WINDOW)
+    x_end = int(round(track_index * pps)) + line_width
+    x_start = x_end - chart_w
+    index = x_start // CHART_TILE_WIDTH
+    if x_start >= 0 and x_end <= (index + 1) * CHART_TILE_WIDTH:
+        # Inside one tile (most frames): the crop is the window
+        tile_x = index * CHART_TILE_WIDTH
+        return chart_tile(full_track, column, chart_w, chart_h, line_width, index).crop(
+            (x_start - tile_x, 0, x_end - tile_x, chart_h))
+    window = Image.new('RGBA', (chart_w, chart_h), (0, 0, 0, 0))
+    # Before the ride starts the left part of the window stays empty
+    for index in range(max(0, x_start) // CHART_TILE_WIDTH, (x_end - 1) // CHART_TILE_WIDTH + 1):
+        tile_x = index * CHART_TILE_WIDTH
+        left, right = max(x_start, tile_x), min(x_end, tile_x + CHART_TILE_WIDTH)
+        if right > left:
+            tile = chart_tile(full_track, column, chart_w, chart_h, line_width, index)
+            window.paste(tile.crop((left - tile_x, 0, right - tile_x, chart_h)), (left - x_start, 0))
+    return window
+
+
+def track_pixels(lats, lons, map_size):
+    """
+    Pixel position(s) within a map_size mini map of lat/lon (scalars or arrays).
+    Uses the cached map, so returns None until a frame with the map has been drawn.
+    """
+    if MAP_OBJ is None:
+        return None
+    x, y = MAP_OBJ.to_pixels(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    orig_w, orig_h = MAP_OBJ.img.size if hasattr(MAP_OBJ, 'img') and MAP_OBJ.img else MAP_OBJ.to_pil().size
+    return x * (map_size / orig_w), y * (map_size / orig_h)
+
+
+def track_color_column(config):
+    """Data column the map track is colored by, or None for the flat blue track."""
+    return TRACK_COLOR_COLUMNS.get(get_widget_cfg(config, 'map').get('color_by'))
+
+
+def track_color_levels(values, color_by):
+    """Colormap level (0 .. TRACK_COLOR_LEVELS - 1) of each track sample."""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    if color_by == 'power':
+        values = rolling_mean(values, TRACK_POWER_SMOOTHING)
+    if color_by == 'grade':
+        low, high = TRACK_GRADE_RANGE
+    else:
+        # Robust range so a single sprint or GPS spike does not flatten the colors
+        low, high = np.percentile(values, [5, 95]) if len(values) else (0.0, 1.0)
+    norm = np.clip((values - low) / (high - low), 0, 1) if high > low else np.zeros(len(values))
+    return np.round(norm * (TRACK_COLOR_LEVELS - 1)).astype(int)
+
+
+def track_palette():
+    """TRACK_COLOR_LEVELS RGB tuples interpolated between TRACK_COLOR_STOPS."""
+    stops = np.asarray(TRACK_COLOR_STOPS, dtype=float)
+    at = np.linspace(0, 1, len(stops))
+    levels = np.linspace(0, 1, TRACK_COLOR_LEVELS)
+    channels = [np.interp(levels, at, stops[:, c]) for c in range(3)]
+    return [tuple(int(round(v)) for v in rgb) for rgb in zip(*channels)]
+
+
+def draw_colored_track(draw, xs, ys, levels, width):
+    """Polyline through (xs, ys), one draw call per run of segments with the same color level."""
+    palette = track_palette()
+    points = list(zip(xs.tolist(), ys.tolist()))
+    # Segment i joins points i and i + 1 and takes the color of point i
+    breaks = np.flatnonzero(np.diff(levels[:-1])) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(points) - 1]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        draw.line(points[start:end + 1], fill=palette[levels[start]], width=width)
+
+
+def profile_offsets(dists, full_track, prof_w):
+    """x position(s) within a prof_w wide elevation profile of distance(s) along the track."""
+    track_dists = full_track['distance'].dropna()
+    min_dist, max_dist = track_dists.min(), track_dists.max()
+    scale_x = prof_w / (max_dist - min_dist) if max_dist > min_dist else 0
+    return (np.asarray(dists, dtype=float) - min_dist) * scale_x
+
+
+def widget_region(name, width, height, config=None, layout_scale=1.0):
+    """
+    Bounding box (x0, y0, x1, y1) in frame pixels that the widget can draw into,
+    clamped to the frame and padded to even dimensions for video encoders.
+    """
+    cfg = get_widget_cfg(config, name)
+
+    def sc(val):
+        return int(val * layout_scale)
+
+    if name in TEXT_WIDGETS:
+        _, _, label, slot = text_widget_spec(config, name)
+        scale = cfg.get('scale', 1.0) * layout_scale
+        font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
+        font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
+        value_box = font_large.getbbox(TEXT_WIDGET_SAMPLES[name])
+        label_box = font_label.getbbox(label)
+        x0 = sc(50)
+        y0 = sc(50) + sc(slot)
+        x1 = x0 + int(max(value_box[2], label_box[2]) * 1.1) + 2
+        y1 = y0 + max(value_box[3], int(80 * scale) + label_box[3]) + 2
+    elif name == 'map':
+        map_x, map_y, map_size, dot_r = map_layout(width, config, layout_scale)
+        pad = max(4, dot_r + 1)
+        x0, y0 = map_x - pad, map_y - pad
+        x1, y1 = map_x + map_size + pad, map_y + map_size + pad
+    elif name == 'elevation':
+        x0, y0, prof_w, prof_h = profile_layout(width, height, config, layout_scale)
+        x1 = x0 + prof_w + 2
+        y1 = y0 + prof_h + 1
+    elif name == 'chart':
+        chart_x, chart_y, chart_w, chart_h = chart_layout(width, config, layout_scale)
+        x0, y0 = chart_x - 2, chart_y - 2
+        x1, y1 = chart_x + chart_w + 2, chart_y + chart_h + 2
+    else:
+        raise ValueError(f"Unknown widget: {name}")
+
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(width, x1), min(height, y1)
+    # Even sizes keep yuv/rgb encoders happy
+    if (x1 - x0) % 2:
+        x1 = x1 + 1 if x1 < width else x1 - 1
+    if (y1 - y0) % 2:
+        y1 = y1 + 1 if y1 < height else y1 - 1
+    return x0, y0, max(x0 + 2, x1), max(y0 + 2, y1)
+
+
+def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=None, layout_scale=1.0, region=None):
     """
     Creates a transparent PIL image with the HUD overlay for a specific time t.
     
@@ -38,114 +432,53 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
         {'speed': {'enabled': True, 'scale': 1.0, 'opacity': 1.0}, ...}
 
     layout_scale: Scaling factor for resolution independence (e.g. 1.0 for 1080p, 0.33 for 360p).
+
+    region: Optional (x0, y0, x1, y1) box of the width x height frame. Only that part
+        of the frame is rendered and returned (used for per-widget overlay streams).
     """
     # Default config if not provided
     if config is None:
-        config = {
-            'speed': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'power': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'cadence': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'gradient': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'map': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'elevation': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-            'heart_rate': {'enabled': True, 'scale': 1.0, 'opacity': 1.0},
-        }
+        config = {name: get_widget_cfg(None, name) for name in WIDGETS}
     
     def get_cfg(name):
-        return config.get(name, {'enabled': True, 'scale': 1.0, 'opacity': 1.0})
+        return get_widget_cfg(config, name)
     
     # Helper for layout scaling
     def sc(val):
         return int(val * layout_scale)
     
+    # Origin of the rendered canvas within the frame
+    if region is None:
+        region = (0, 0, width, height)
+    ox, oy = region[0], region[1]
+    
     # Create a background with bg_color (supports RGBA or RGB)
-    img = Image.new('RGBA' if len(bg_color) == 4 else 'RGB', (width, height), bg_color)
+    img = Image.new('RGBA' if len(bg_color) == 4 else 'RGB', (region[2] - ox, region[3] - oy), bg_color)
     draw = ImageDraw.Draw(img)
 
     # Layout configuration
     margin_left = sc(50)
     margin_top = sc(50)
     
-    # 1. Speed (Top Left)
-    cfg = get_cfg('speed')
-    if cfg['enabled']:
+    # 1-5. Text metrics (Speed, Power, Cadence, Heart Rate, Gradient), stacked on the left
+    for name in TEXT_WIDGETS:
+        cfg = get_cfg(name)
+        if not cfg['enabled']:
+            continue
+        column, fmt, label, slot = text_widget_spec(config, name)
         # Combine user scale preference with layout scale
         scale = cfg.get('scale', 1.0) * layout_scale
         font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
         font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
         
-        speed = data_row.get('speed_mph', 0)
-        if pd.isna(speed): speed = 0
-        
-        opacity = int(255 * cfg['opacity'])
-        color = (255, 255, 255, opacity)
-        y_pos = margin_top
-        draw.text((margin_left, y_pos), f"{speed:.0f}", font=font_large, fill=color)
-        draw.text((margin_left, y_pos + int(80 * scale)), "MPH", font=font_label, fill=color)
-    
-    # 2. Power
-    cfg = get_cfg('power')
-    if cfg['enabled']:
-        scale = cfg.get('scale', 1.0) * layout_scale
-        font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
-        font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
-        
-        power = data_row.get('power', 0)
-        if pd.isna(power): power = 0
+        value = data_row.get(column, 0)
+        if pd.isna(value): value = 0
         
         opacity = int(255 * cfg['opacity'])
         color = (255, 255, 255, opacity)
-        y_pos = margin_top + sc(200)
-        draw.text((margin_left, y_pos), f"{power:.0f}", font=font_large, fill=color)
-        draw.text((margin_left, y_pos + int(80 * scale)), "W", font=font_label, fill=color)
-    
-    # 3. Cadence
-    cfg = get_cfg('cadence')
-    if cfg['enabled']:
-        scale = cfg.get('scale', 1.0) * layout_scale
-        font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
-        font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
-        
-        cadence = data_row.get('cadence', 0)
-        if pd.isna(cadence): cadence = 0
-        
-        opacity = int(255 * cfg['opacity'])
-        color = (255, 255, 255, opacity)
-        y_pos = margin_top + sc(400)
-        draw.text((margin_left, y_pos), f"{cadence:.0f}", font=font_large, fill=color)
-        draw.text((margin_left, y_pos + int(80 * scale)), "RPM", font=font_label, fill=color)
-    
-    # 4. Heart Rate (Below Cadence)
-    cfg = get_cfg('heart_rate')
-    if cfg['enabled']:
-        scale = cfg.get('scale', 1.0) * layout_scale
-        font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
-        font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
-        
-        hr = data_row.get('heart_rate', 0)
-        if pd.isna(hr): hr = 0
-        
-        opacity = int(255 * cfg['opacity'])
-        color = (255, 255, 255, opacity)
-        y_pos = margin_top + sc(600)
-        draw.text((margin_left, y_pos), f"{hr:.0f}", font=font_large, fill=color)
-        draw.text((margin_left, y_pos + int(80 * scale)), "BPM", font=font_label, fill=color)
-
-    # 5. Gradient (Below HR)
-    cfg = get_cfg('gradient')
-    if cfg['enabled']:
-        scale = cfg.get('scale', 1.0) * layout_scale
-        font_large = get_scaled_font(FONT_PATH_BOLD, 80, scale)
-        font_label = get_scaled_font(FONT_PATH_REGULAR, 20, scale)
-        
-        grade = data_row.get('grade', 0)
-        if pd.isna(grade): grade = 0
-        
-        opacity = int(255 * cfg['opacity'])
-        color = (255, 255, 255, opacity)
-        y_pos = margin_top + sc(800)
-        draw.text((margin_left, y_pos), f"{grade:.1f}%", font=font_large, fill=color)
-        draw.text((margin_left, y_pos + int(80 * scale)), "GRADIENT", font=font_label, fill=color)
+        y_pos = margin_top + sc(slot)
+        draw.text((margin_left - ox, y_pos - oy), fmt.format(value), font=font_large, fill=color)
+        draw.text((margin_left - ox, y_pos + int(80 * scale) - oy), label, font=font_label, fill=color)
     
     # 6. Mini Map with Real Background
     cfg = get_cfg('map')
@@ -153,15 +486,7 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
         full_track = data_row.get('full_track_df')
         if full_track is not None and not full_track.empty:
             # Map settings - apply scale
-            user_scale = cfg.get('scale', 1.0)
-            base_map_size = 300
-            map_size = int(base_map_size * user_scale * layout_scale)
-            
-            # Ensure map_size is at least 1 pixel
-            map_size = max(1, map_size)
-            
-            map_x = width - map_size - sc(50)
-            map_y = sc(50)
+            map_x, map_y, map_size, dot_r = map_layout(width, config, layout_scale)
             
             # Get bounds
             lats = full_track['position_lat'].dropna()
@@ -177,10 +502,11 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
                 if lat_pad == 0: lat_pad = 0.001
                 if lon_pad == 0: lon_pad = 0.001
                 
-                global CACHED_BACKGROUND, MAP_OBJ
+                global CACHED_BACKGROUND, CACHED_BACKGROUND_KEY, MAP_OBJ
                 
-                # Check for cached background
-                if CACHED_BACKGROUND is None:
+                # Check for cached background (redrawn when the track coloring changes)
+                color_by = cfg.get('color_by') if track_color_column(config) in full_track else None
+                if CACHED_BACKGROUND is None or CACHED_BACKGROUND_KEY != color_by:
                     import smopy
                     try:
                         # 1. Initialize Map
@@ -201,22 +527,20 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
                             # Draw full track on base image
                             map_draw = ImageDraw.Draw(map_img)
                             
-                            # Helper for projection
-                            def project_point_static(lat, lon):
-                                x, y = MAP_OBJ.to_pixels(lat, lon)
-                                orig_w, orig_h = MAP_OBJ.img.size if hasattr(MAP_OBJ, 'img') and MAP_OBJ.img else MAP_OBJ.to_pil().size
-                                scale_x = map_size / orig_w
-                                scale_y = map_size / orig_h
-                                return x * scale_x, y * scale_y
-
-                            points = []
-                            for i in range(0, len(lats), 5): 
-                                points.append(project_point_static(lats.iloc[i], longs.iloc[i]))
+                            # Every 5th fix, projected in one vectorized call
+                            fixes = full_track[full_track['position_lat'].notna() & full_track['position_long'].notna()]
+                            xs, ys = track_pixels(fixes['position_lat'].to_numpy()[::5],
+                                                  fixes['position_long'].to_numpy()[::5], map_size)
                             
-                            if len(points) > 1:
-                                map_draw.line(points, fill="blue", width=3)
+                            if len(xs) > 1 and color_by:
+                                # Colors from the full 1 Hz series, then sampled like the points
+                                levels = track_color_levels(fixes[track_color_column(config)].to_numpy(), color_by)
+                                draw_colored_track(map_draw, xs, ys, levels[::5], width=3)
+                            elif len(xs) > 1:
+                                map_draw.line(list(zip(xs.tolist(), ys.tolist())), fill="blue", width=3)
                                 
                             CACHED_BACKGROUND = map_img
+                            CACHED_BACKGROUND_KEY = color_by
                     except Exception as e:
                         print(f"Map cache init failed: {e}")
                         CACHED_BACKGROUND = None
@@ -238,23 +562,19 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
                         map_copy = Image.merge('RGBA', (r, g, b, a))
                     
                     # 1. Paste Cached Map
-                    draw.rectangle((map_x-2, map_y-2, map_x+map_size+2, map_y+map_size+2), outline="white", width=2)
-                    img.paste(map_copy, (map_x, map_y), map_copy)
+                    draw.rectangle((map_x-2-ox, map_y-2-oy, map_x+map_size+2-ox, map_y+map_size+2-oy), outline="white", width=2)
+                    img.paste(map_copy, (map_x - ox, map_y - oy), map_copy)
                     
                     # 2. Draw Current Position
                     curr_lat = data_row.get('position_lat')
                     curr_lon = data_row.get('position_long')
                     
                     if pd.notna(curr_lat) and pd.notna(curr_lon):
-                        x, y = MAP_OBJ.to_pixels(curr_lat, curr_lon)
-                        orig_w, orig_h = MAP_OBJ.img.size if hasattr(MAP_OBJ, 'img') and MAP_OBJ.img else MAP_OBJ.to_pil().size
-                        scale_x = map_size / orig_w
-                        scale_y = map_size / orig_h
-                        
-                        cx = map_x + x * scale_x
-                        cy = map_y + y * scale_y
+                        x, y = track_pixels(curr_lat, curr_lon, map_size)
+                        cx = map_x + float(x) - ox
+                        cy = map_y + float(y) - oy
                         
-                        r = max(4, int(6 * user_scale * layout_scale))
+                        r = dot_r
                         draw.ellipse((cx-r, cy-r, cx+r, cy+r), fill="yellow", outline="black")
 
     # 7. Elevation Profile (Bottom)
@@ -263,14 +583,7 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
         full_track = data_row.get('full_track_df')
         if full_track is not None and not full_track.empty:
             # Profile settings - apply scale to height
-            user_scale = cfg.get('scale', 1.0)
-            base_prof_h = 150
-            prof_h = int(base_prof_h * user_scale * layout_scale)
-            prof_h = max(1, prof_h)
-            
-            prof_w = width - sc(100)
-            prof_x = sc(50)
-            prof_y = height - prof_h - sc(50)
+            prof_x, prof_y, prof_w, prof_h = profile_layout(width, height, config, layout_scale)
             
             global CACHED_PROFILE, PROFILE_W, PROFILE_H
             
@@ -323,7 +636,7 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
                     # Resize if height scale changed (keep full width, only scale height)
                     target_h = prof_h
                     target_w = prof_w  # Keep full width
-                    if target_h != PROFILE_H:
+                    if (target_w, target_h) != (PROFILE_W, PROFILE_H):
                         prof_copy = CACHED_PROFILE.resize((target_w, target_h), Image.LANCZOS)
                     else:
                         prof_copy = CACHED_PROFILE.copy()
@@ -334,14 +647,35 @@ def create_frame_rgba(t, data_row, width, height, bg_color=(0, 0, 0, 0), config=
                         r, g, b, a = prof_copy.split()
                         a = a.point(lambda x: int(x * prof_opacity))
                         prof_copy = Image.merge('RGBA', (r, g, b, a))
-                    img.paste(prof_copy, (prof_x, prof_y), prof_copy)
+                    img.paste(prof_copy, (prof_x - ox, prof_y - oy), prof_copy)
                     
                     # Draw Current Position Indicator
                     curr_dist = data_row.get('distance')
                     if pd.notna(curr_dist):
-                        scale_x = PROFILE_W / (max_dist - min_dist) if max_dist > min_dist else 0
-                        px = prof_x + (curr_dist - min_dist) * scale_x
-                        draw.line((px, prof_y, px, prof_y + PROFILE_H), fill="yellow", width=2)
+                        px = prof_x + float(profile_offsets(curr_dist, full_track, target_w)) - ox
+                        draw.line((px, prof_y - oy, px, prof_y + target_h - oy), fill="yellow", width=2)
+
+    # 8. History Chart (below the map)
+    cfg = get_cfg('chart')
+    if cfg['enabled']:
+        full_track = data_row.get('full_track_df')
+        track_index = data_row.get('track_index')
+        column = chart_column(config)
+        if full_track is not None and track_index is not None and column in full_track:
+            chart_x, chart_y, chart_w, chart_h = chart_layout(width, config, layout_scale)
+            scale = cfg.get('scale', 1.0) * layout_scale
+            # Only a crop of the cached strip per frame; the polyline is never redrawn
+            chart = chart_window(full_track, column, int(track_index), chart_w, chart_h, max(1, int(2 * scale)))
+            opacity = cfg['opacity']
+            if opacity < 1.0:
+                r, g, b, a = chart.split()
+                a = a.point(lambda x: int(x * opacity))
+                chart = Image.merge('RGBA', (r, g, b, a))
+            draw.rectangle((chart_x - 2 - ox, chart_y - 2 - oy, chart_x + chart_w + 1 - ox, chart_y + chart_h + 1 - oy),
+                           fill=(0, 0, 0, int(90 * opacity)), outline=(255, 255, 255, int(255 * opacity)))
+            img.paste(chart, (chart_x - ox, chart_y - oy), chart)
+            draw.text((chart_x + sc(6) - ox, chart_y + sc(4) - oy), chart_label(column),
+                      font=get_scaled_font(FONT_PATH_REGULAR, 16, scale), fill=(255, 255, 255, int(255 * opacity)))
 
 
     return img
@@ -0,0 +1,60 @@
+"""
+SMPTE timecode helpers.
+
+Used to stamp exported overlay tracks with the timecode of the source frame
+they start on, so an editor can line them up with the clip automatically.
+Drop-frame timecode (HH:MM:SS;FF) is supported for 29.97 and 59.94 fps.
+"""
+
+
+def nominal_fps(fps):
+    """Integer frame rate timecode counts in (29.97 -> 30)."""
+    return max(1, int(round(fps)))
+
+
+def is_drop_frame(tc):
+    return ';' in tc or '.' in tc
+
+
+def _drop_frames(fps):
+    # Frame numbers skipped each minute (except every tenth) in drop-frame timecode
+    return int(round(fps * 0.066666))
+
+
+def timecode_to_frames(tc, fps):
+    """Frame count of a 'HH:MM:SS:FF' (or drop-frame 'HH:MM:SS;FF') timecode."""
+    parts = tc.replace(';', ':').replace('.', ':').split(':')
+    hh, mm, ss, ff = [int(p) for p in parts]
+    nom = nominal_fps(fps)
+    frames = (hh * 3600 + mm * 60 + ss) * nom + ff
+    if is_drop_frame(tc):
+        total_minutes = hh * 60 + mm
+        frames -= _drop_frames(fps) * (total_minutes - total_minutes // 10)
+    return frames
+
+
+def frames_to_timecode(frames, fps, drop_frame=False):
+    """Format a frame count as timecode (wraps at 24 hours)."""
+    nom = nominal_fps(fps)
+    if drop_frame:
+        drop = _drop_frames(fps)
+        per_minute = nom * 60 - drop
+        per_ten_minutes = nom * 600 - drop * 9
+        tens, rem = divmod(frames, per_ten_minutes)
+        frames += drop * 9 * tens
+        if rem > drop:
+            frames += drop * ((rem - drop) // per_minute)
+    frames %= nom * 86400
+    ff = frames % nom
+    ss = frames // nom % 60
+    mm = frames // (nom * 60) % 60
+    hh = frames // (nom * 3600)
+    sep = ';' if drop_frame else ':'
+    return f"{hh:02d}:{mm:02d}:{ss:02d}{sep}{ff:02d}"
+
+
+def shift_timecode(tc, fps, seconds):
+    """Timecode of the frame `seconds` after the frame at `tc` (tc None means 00:00:00:00)."""
+    tc = tc or "00:00:00:00"
+    frames = timecode_to_frames(tc, fps) + int(round(seconds * fps))
+    return frames_to_timecode(frames, fps, is_drop_frame(tc))
@@ -0,0 +1,50 @@
+"""
+Per-job workspaces.
+
+Every generation job gets its own work directory (rendered chunks and the
+resume manifest) and a scratch directory for large, short-lived intermediates
+(concat batches, full-length overlay streams). Scratch can live on a RAM disk
+so concurrent jobs don't fight over disk bandwidth.
+"""
+import hashlib
+import os
+import shutil
+
+
+# Candidate RAM-backed filesystems, in order of preference
+TMPFS_ROOTS = ["/dev/shm"]
+
+
+def job_id_for(output_path):
+    """Stable job id derived from the output path (same output -> same workspace)."""
+    return hashlib.sha1(os.path.abspath(output_path).encode('utf-8')).hexdigest()[:12]
+
+
+def tmpfs_root():
+    """First writable RAM-disk mount, or None if the system has none."""
+    for root in TMPFS_ROOTS:
+        if os.path.isdir(root) and os.access(root, os.W_OK):
+            return root
+    return None
+
+
+def make_scratch_dir(job_id, base_dir=None, use_tmpfs=False):
+    """
+    Create the scratch directory for a job.
+    With use_tmpfs, it is placed on a RAM disk when one is available,
+    otherwise under base_dir.
+    Returns (path, on_tmpfs).
+    """
+    root = tmpfs_root() if use_tmpfs else None
+    if root:
+        path = os.path.join(root, "projectoverlay", job_id)
+    else:
+        path = os.path.join(base_dir or os.getcwd(), "scratch")
+    os.makedirs(path, exist_ok=True)
+    return path, root is not None
+
+
+def remove_dir(path):
+    """Remove a workspace directory, ignoring files that are already gone."""
+    if path and os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
@@ -129,6 +129,8 @@ if (!window.api) {
 
                 if (data.items.length === 0) {
                     fileList.innerHTML = '<div style="padding: 20px; color: #8b949e;">No matching files found</div>';
+                } else if (filter.includes('.mp4')) {
+                    annotateVideos(data.currentPath);
                 }
             } catch (err) {
                 console.error('Load directory error:', err);
@@ -136,6 +138,43 @@ if (!window.api) {
             }
         }
 
+        // Show duration, resolution and FIT overlap next to each clip (one bulk scan per directory)
+        async function annotateVideos(dirPath) {
+            let scan;
+            try {
+                const response = await fetch('/api/scan-videos', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ dirPath, fitPath: state.fitPath })
+                });
+                if (!response.ok) return;
+                scan = await response.json();
+            } catch (err) {
+                console.error('Scan videos error:', err);
+                return;
+            }
+            // The user may have navigated elsewhere meanwhile
+            if (currentDirectory !== dirPath) return;
+
+            const clips = new Map(scan.clips.map(clip => [clip.name, clip]));
+            document.querySelectorAll('#file-list .file-entry:not(.directory)').forEach(entry => {
+                const clip = clips.get(entry.querySelector('.file-name').textContent);
+                if (!clip) return;
+                const minutes = Math.floor(clip.duration / 60);
+                const seconds = Math.floor(clip.duration % 60).toString().padStart(2, '0');
+                const meta = document.createElement('span');
+                meta.className = 'file-meta';
+                meta.textContent = `${minutes}:${seconds} · ${clip.width}×${clip.height}`;
+                if (clip.overlaps === true) {
+                    meta.textContent += ' · in ride';
+                } else if (clip.overlaps === false) {
+                    entry.classList.add('outside-activity');
+                    meta.textContent += ' · outside ride';
+                }
+                entry.appendChild(meta);
+            });
+        }
+
         // Open file browser dialog
         function openFileBrowser(title, filter) {
             return new Promise(async (resolve) => {
@@ -195,6 +234,18 @@ if (!window.api) {
             });
         }
 
+        // Binary timeline from /api/timeline: uint32 header length, JSON header,
+        // then one float32 array per header.columns entry
+        function parseTimeline(buffer) {
+            const headerLength = new DataView(buffer).getUint32(0, true);
+            const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+            const columns = {};
+            header.columns.forEach((name, i) => {
+                columns[name] = new Float32Array(buffer, 4 + headerLength + i * header.count * 4, header.count);
+            });
+            return { header, columns };
+        }
+
         // Initialize file browser when page loads
         if (document.readyState === 'loading') {
             document.addEventListener('DOMContentLoaded', initFileBrowser);
@@ -224,10 +275,54 @@ if (!window.api) {
                     body: JSON.stringify(params)
                 });
                 if (!response.ok) throw new Error('Failed to generate preview');
-                const data = await response.json();
-                return data.image;
+                return response.json();
             },
 
+            // Background frame only; a GET so the browser caches it per timestamp/size
+            getPreviewFrameUrl: (params) => {
+                const query = new URLSearchParams({
+                    videoPath: params.videoPath,
+                    timestamp: params.timestamp,
+                    maxWidth: params.maxWidth,
+                    maxHeight: params.maxHeight
+                });
+                if (params.offset !== null && params.offset !== undefined) query.set('offset', params.offset);
+                return `/api/preview/frame?${query}`;
+            },
+
+            // Scrub thumbnail sprite index ({ status: 'pending' | 'ready' | 'error', ... })
+            getThumbnails: async (params) => {
+                const response = await fetch(`/api/thumbnails?${new URLSearchParams(params)}`);
+                if (!response.ok) throw new Error('Failed to fetch thumbnails');
+                return response.json();
+            },
+
+            getThumbnailSpriteUrl: (params) => `/api/thumbnails/sprite?${new URLSearchParams(params)}`,
+
+            // Overlay only, cropped to the HUD, with its position in the frame
+            getPreviewOverlay: async (params) => {
+                const response = await fetch('/api/preview/overlay', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(params)
+                });
+                if (!response.ok) throw new Error('Failed to generate overlay');
+                return response.json();
+            },
+
+            // Telemetry timeline for real-time HUD playback ({ header, columns })
+            getTimeline: async (params) => {
+                const response = await fetch('/api/timeline', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(params)
+                });
+                if (!response.ok) throw new Error('Failed to load timeline');
+                return parseTimeline(await response.arrayBuffer());
+            },
+
+            getVideoUrl: (params) => `/api/video?${new URLSearchParams(params)}`,
+
             calculateSync: async (params) => {
                 const response = await fetch('/api/calculate-sync', {
                     method: 'POST',
@@ -247,12 +342,13 @@ if (!window.api) {
                 });
 
                 if (!response.ok) throw new Error('Failed to start');
+                const { jobId } = await response.json();
 
-                // Poll for progress
+                // Poll for progress of this job (other jobs may be running too)
                 return new Promise((resolve, reject) => {
                     const poll = setInterval(async () => {
                         try {
-                            const res = await fetch('/api/status');
+                            const res = await fetch(`/api/status?jobId=${encodeURIComponent(jobId)}`);
                             const job = await res.json();
 
                             if (window.browserProgressCallback) window.browserProgressCallback(job.progress);
@@ -346,6 +442,8 @@ const state = {
     videoPath: null,
     fitPath: null,
     duration: 0,
+    syncOffset: null,  // From calculate-sync; null lets the server auto-sync
+    syncMethod: null,  // 'creation_time', 'motion' or 'camera_*' (refined ones are passed on to generate)
     textScale: 1.0,  // Global text scale
     textOpacity: 1.0,  // Global text opacity
     config: {
@@ -355,23 +453,44 @@ const state = {
         heart_rate: { enabled: true, scale: 1.0, opacity: 1.0 },
         gradient: { enabled: true, scale: 1.0, opacity: 1.0 },
         map: { enabled: true, scale: 1.0, opacity: 1.0 },
-        elevation: { enabled: true, 'scale': 1.0, opacity: 1.0 }
+        elevation: { enabled: true, 'scale': 1.0, opacity: 1.0 },
+        chart: { enabled: false, scale: 1.0, opacity: 1.0 }
     }
 };
 
 // Text metrics (toggle only, share global size)
 const textMetrics = [
     { id: 'speed', name: 'Speed (MPH)', icon: '🏃' },
-    { id: 'power', name: 'Power (W)', icon: '⚡' },
+    {
+        id: 'power', name: 'Power (W)', icon: '⚡',
+        // Derived metrics (src/core/metrics.py) the widget can show instead
+        metrics: [['', 'Now'], ['power_3s', '3s avg'], ['power_30s', '30s avg'], ['normalized_power', 'NP'],
+                  ['watts_per_kg', 'W/kg'], ['power_max_5m', 'Max 5 min'], ['power_max_20m', 'Max 20 min']],
+        param: { key: 'weight_kg', label: 'kg', value: 75, metric: 'watts_per_kg' }
+    },
     { id: 'cadence', name: 'Cadence (RPM)', icon: '🔄' },
-    { id: 'heart_rate', name: 'Heart Rate (BPM)', icon: '❤️' },
+    {
+        id: 'heart_rate', name: 'Heart Rate (BPM)', icon: '❤️',
+        metrics: [['', 'Now'], ['hr_zone', 'Zone'], ['heart_rate_max_5m', 'Max 5 min']],
+        param: { key: 'max_hr', label: 'max', value: 190, metric: 'hr_zone' }
+    },
     { id: 'gradient', name: 'Gradient (%)', icon: '📈' }
 ];
 
 // Visual components (have size + opacity controls)
 const visualComponents = [
-    { id: 'map', name: 'Mini Map', icon: '🗺️' },
-    { id: 'elevation', name: 'Elevation Profile', icon: '⛰️' }
+    {
+        id: 'map', name: 'Mini Map', icon: '🗺️',
+        // Track coloring, baked into the cached map background
+        selectKey: 'color_by',
+        metrics: [['', 'Blue'], ['speed', 'By speed'], ['power', 'By power'], ['grade', 'By grade']]
+    },
+    { id: 'elevation', name: 'Elevation Profile', icon: '⛰️' },
+    {
+        id: 'chart', name: 'History Chart', icon: '📉', enabled: false,
+        metrics: [['', 'Power'], ['heart_rate', 'Heart Rate'], ['speed_mph', 'Speed'], ['cadence', 'Cadence'],
+                  ['power_3s', 'Power 3s avg']]
+    }
 ];
 
 // Initialize UI
@@ -416,14 +535,18 @@ function initComponents() {
         debouncePreview();
     });
 
-    // Text metrics (toggle only)
+    // Text metrics (toggle, plus a derived metric where available)
     textMetrics.forEach(comp => {
         const card = document.createElement('div');
         card.className = 'component-card compact';
+        const options = (comp.metrics || []).map(([value, label]) => `<option value="${value}">${label}</option>`);
         card.innerHTML = `
             <div class="component-header">
                 <input type="checkbox" id="${comp.id}-enabled" checked>
                 <label for="${comp.id}-enabled">${comp.icon} ${comp.name}</label>
+                ${comp.metrics ? `<select id="${comp.id}-metric" class="metric-select">${options.join('')}</select>` : ''}
+                ${comp.param ? `<input type="number" id="${comp.id}-param" class="metric-param hidden"
+                    value="${comp.param.value}" title="${comp.param.label}">` : ''}
             </div>
         `;
         container.appendChild(card);
@@ -432,16 +555,33 @@ function initComponents() {
             state.config[comp.id].enabled = e.target.checked;
             debouncePreview();
         });
+        if (comp.metrics) {
+            document.getElementById(`${comp.id}-metric`).addEventListener('change', (e) => {
+                state.config[comp.id].metric = e.target.value || undefined;
+                if (comp.param) {
+                    document.getElementById(`${comp.id}-param`).classList.toggle('hidden', e.target.value !== comp.param.metric);
+                }
+                debouncePreview();
+            });
+        }
+        if (comp.param) {
+            document.getElementById(`${comp.id}-param`).addEventListener('change', (e) => {
+                state.config[comp.id][comp.param.key] = Number(e.target.value) || comp.param.value;
+                debouncePreview();
+            });
+        }
     });
 
     // Visual components (size + opacity)
     visualComponents.forEach(comp => {
         const card = document.createElement('div');
         card.className = 'component-card';
+        const options = (comp.metrics || []).map(([value, label]) => `<option value="${value}">${label}</option>`);
         card.innerHTML = `
             <div class="component-header">
-                <input type="checkbox" id="${comp.id}-enabled" checked>
+                <input type="checkbox" id="${comp.id}-enabled" ${comp.enabled === false ? '' : 'checked'}>
                 <label for="${comp.id}-enabled">${comp.icon} ${comp.name}</label>
+                ${comp.metrics ? `<select id="${comp.id}-metric" class="metric-select">${options.join('')}</select>` : ''}
             </div>
             <div class="component-controls">
                 <span>Size</span>
@@ -461,6 +601,13 @@ function initComponents() {
             debouncePreview();
         });
 
+        if (comp.metrics) {
+            document.getElementById(`${comp.id}-metric`).addEventListener('change', (e) => {
+                state.config[comp.id][comp.selectKey || 'metric'] = e.target.value || undefined;
+                debouncePreview();
+            });
+        }
+
         document.getElementById(`${comp.id}-scale`).addEventListener('input', (e) => {
             const val = e.target.value;
             state.config[comp.id].scale = val / 100;
@@ -494,6 +641,7 @@ document.getElementById('btn-video').addEventListener('click', async () => {
             console.error('Failed to get video info:', error);
             state.duration = 300; // Fallback
         }
+        loadThumbnails(path);
 
         checkReady();
         if (state.fitPath) updatePreview();
@@ -514,30 +662,64 @@ document.getElementById('btn-fit').addEventListener('click', async () => {
 function checkReady() {
     const ready = state.videoPath && state.fitPath;
     document.getElementById('btn-generate').disabled = !ready;
+    document.getElementById('btn-play').disabled = !ready || !window.api.getTimeline;
+    document.getElementById('btn-refine-sync').classList.toggle('hidden', !ready);
+    state.syncOffset = null;
+    state.syncMethod = null;
 
     // Calculate sync offset if ready
     if (ready) {
-        document.getElementById('sync-status').textContent = 'Calculating sync...';
-        window.api.calculateSync({ videoPath: state.videoPath, fitPath: state.fitPath })
-            .then(data => {
-                if (data.success) {
-                    const offset = data.offset.toFixed(2);
-                    document.getElementById('sync-status').innerHTML = `Sync Offset: <b>${offset}s</b> <br><small style="font-size:0.8em; opacity:0.8">Video: ${data.video_created}<br>FIT: ${data.fit_start}</small>`;
-                    document.getElementById('sync-status').style.color = 'var(--text-primary)';
-                } else {
-                    document.getElementById('sync-status').textContent = 'Sync Failed: ' + data.message;
-                    document.getElementById('sync-status').style.color = '#ff6b6b';
-                }
-            })
-            .catch(err => {
-                document.getElementById('sync-status').textContent = 'Sync Error';
-                console.error(err);
-            });
+        calculateSync(false);
     } else {
         document.getElementById('sync-status').textContent = '';
     }
 }
 
+// auto: refine the creation_time estimate by matching video motion with FIT speed
+function calculateSync(auto) {
+    const status = document.getElementById('sync-status');
+    const refineBtn = document.getElementById('btn-refine-sync');
+    status.textContent = auto ? 'Matching video motion with FIT speed...' : 'Calculating sync...';
+    refineBtn.disabled = true;
+    return window.api.calculateSync({ videoPath: state.videoPath, fitPath: state.fitPath, auto })
+        .then(data => {
+            if (data.success) {
+                state.syncOffset = data.offset;
+                state.syncMethod = data.method || 'creation_time';
+                const offset = data.offset.toFixed(2);
+                let details = `Video: ${data.video_created}<br>FIT: ${data.fit_start}`;
+                const correction = data.correction === null || data.correction === undefined
+                    ? '' : ` (${data.correction >= 0 ? '+' : ''}${data.correction.toFixed(2)}s)`;
+                if (data.method === 'motion') {
+                    details = `Matched video motion${correction}, confidence ${data.confidence.toFixed(2)}<br>` + details;
+                } else if (data.method === 'camera_gps') {
+                    details = `Matched camera GPS${correction}, ${data.error_m.toFixed(1)} m apart<br>` + details;
+                } else if (data.method === 'camera_time') {
+                    details = `Camera GPS time${correction}<br>` + details;
+                } else if (data.message) {
+                    details = `${data.message}<br>` + details;
+                }
+                status.innerHTML = `Sync Offset: <b>${offset}s</b> <br><small style="font-size:0.8em; opacity:0.8">${details}</small>`;
+                status.style.color = 'var(--text-primary)';
+                // The HUD timeline and the still preview depend on the offset
+                playback.key = null;
+                updatePreview();
+            } else {
+                status.textContent = 'Sync Failed: ' + data.message;
+                status.style.color = '#ff6b6b';
+            }
+        })
+        .catch(err => {
+            status.textContent = 'Sync Error';
+            console.error(err);
+        })
+        .finally(() => {
+            refineBtn.disabled = false;
+        });
+}
+
+document.getElementById('btn-refine-sync').addEventListener('click', () => calculateSync(true));
+
 // Preview
 let previewTimeout = null;
 function debouncePreview() {
@@ -545,24 +727,136 @@ function debouncePreview() {
     previewTimeout = setTimeout(updatePreview, 200);
 }
 
-async function updatePreview() {
-    if (!state.fitPath || !state.videoPath) return;
+// Client-side compositing: the background frame is only fetched when the
+// timestamp or size changes; config changes only fetch the small overlay.
+const previewFrame = { url: null, image: null, overlay: null };
+let previewRequest = 0;
+
+// Scrub thumbnails: drawn instantly while dragging, then refined by the real preview
+const thumbnails = { videoPath: null, index: null, image: null };
+
+async function loadThumbnails(videoPath) {
+    if (!window.api.getThumbnails) return;
+    thumbnails.videoPath = videoPath;
+    thumbnails.index = null;
+    thumbnails.image = null;
+    // The sprite is built by a background job; poll until it is ready
+    while (thumbnails.videoPath === videoPath) {
+        let index;
+        try {
+            index = await window.api.getThumbnails({ videoPath });
+        } catch (error) {
+            console.error('Thumbnail error:', error);
+            return;
+        }
+        if (index.status === 'ready') {
+            const image = await loadImage(window.api.getThumbnailSpriteUrl({ videoPath }));
+            if (thumbnails.videoPath !== videoPath) return;
+            thumbnails.index = index;
+            thumbnails.image = image;
+            return;
+        }
+        if (index.status === 'error') return;
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
 
-    const timestamp = parseInt(document.getElementById('timeline').value);
+function showThumbnail(timestamp) {
+    const { index, image } = thumbnails;
+    const canvas = document.getElementById('preview-canvas');
+    // Only once a real preview has set up the canvas
+    if (!index || !image || !canvas.width || canvas.classList.contains('hidden')) return;
+
+    const tile = Math.min(index.count - 1, Math.round(timestamp / index.interval));
+    const sx = (tile % index.columns) * index.tile_width;
+    const sy = Math.floor(tile / index.columns) * index.tile_height;
+    const ctx = canvas.getContext('2d');
+    ctx.drawImage(image, sx, sy, index.tile_width, index.tile_height, 0, 0, canvas.width, canvas.height);
+    // Keep the last HUD on top so the layout doesn't flicker while scrubbing
+    const overlay = previewFrame.overlay;
+    if (overlay) ctx.drawImage(overlay.image, overlay.x, overlay.y);
+}
+
+function loadImage(src) {
+    return new Promise((resolve, reject) => {
+        const img = new Image();
+        img.onload = () => resolve(img);
+        img.onerror = () => reject(new Error('Failed to load image'));
+        img.src = src;
+    });
+}
+
+async function getPreviewFrame(url) {
+    if (previewFrame.url !== url) {
+        previewFrame.image = await loadImage(url);
+        previewFrame.url = url;
+    }
+    return previewFrame.image;
+}
+
+async function updateCompositedPreview(params) {
+    const request = ++previewRequest;
+    const [frame, overlay] = await Promise.all([
+        getPreviewFrame(window.api.getPreviewFrameUrl(params)),
+        window.api.getPreviewOverlay(params)
+    ]);
+    const overlayImage = overlay.image ? await loadImage(`data:${overlay.mime};base64,${overlay.image}`) : null;
+    // A newer slider position already started; don't draw a stale frame over it
+    if (request !== previewRequest) return;
+
+    const canvas = document.getElementById('preview-canvas');
+    canvas.width = overlay.frameWidth;
+    canvas.height = overlay.frameHeight;
+    const ctx = canvas.getContext('2d');
+    ctx.drawImage(frame, 0, 0, canvas.width, canvas.height);
+    if (overlayImage) ctx.drawImage(overlayImage, overlay.x, overlay.y);
+    previewFrame.overlay = overlayImage ? { image: overlayImage, x: overlay.x, y: overlay.y } : null;
+
+    canvas.classList.remove('hidden');
+    document.getElementById('preview-placeholder').classList.add('hidden');
+}
+
+function showTime(timestamp) {
     const minutes = Math.floor(timestamp / 60);
     const seconds = timestamp % 60;
     document.getElementById('time-display').textContent = `${minutes}:${seconds.toString().padStart(2, '0')}`;
+}
+
+function previewParams(timestamp) {
+    // Ask for a frame no larger than the preview area (in device pixels)
+    const container = document.querySelector('.preview-container');
+    const dpr = window.devicePixelRatio || 1;
+    return {
+        fitPath: state.fitPath,
+        videoPath: state.videoPath,
+        timestamp: timestamp,
+        config: state.config,
+        maxWidth: Math.round(container.clientWidth * dpr),
+        maxHeight: Math.round(container.clientHeight * dpr),
+        // Same sync as playback and generate; null lets the server use creation_time
+        offset: state.syncOffset
+    };
+}
+
+async function updatePreview() {
+    if (!state.fitPath || !state.videoPath || playback.playing) return;
+
+    const timestamp = parseInt(document.getElementById('timeline').value);
+    showTime(timestamp);
+    const params = previewParams(timestamp);
 
     try {
-        const base64Image = await window.api.getPreview({
-            fitPath: state.fitPath,
-            videoPath: state.videoPath,
-            timestamp: timestamp,
-            config: state.config
-        });
+        if (window.api.getPreviewOverlay) {
+            await updateCompositedPreview(params);
+            return;
+        }
+
+        const result = await window.api.getPreview({ ...params, format: 'jpeg' });
+        // The Electron bridge returns a bare base64 PNG
+        const preview = typeof result === 'string' ? { image: result, mime: 'image/png' } : result;
 
         const img = document.getElementById('preview-img');
-        img.src = `data:image/png;base64,${base64Image}`;
+        img.src = `data:${preview.mime};base64,${preview.image}`;
         img.classList.remove('hidden');
         document.getElementById('preview-placeholder').classList.add('hidden');
     } catch (error) {
@@ -570,7 +864,214 @@ async function updatePreview() {
     }
 }
 
-document.getElementById('timeline').addEventListener('input', debouncePreview);
+document.getElementById('timeline').addEventListener('input', (e) => {
+    if (playback.playing) {
+        document.getElementById('preview-video').currentTime = parseInt(e.target.value);
+        return;
+    }
+    showThumbnail(parseInt(e.target.value));
+    debouncePreview();
+});
+
+// Real-time playback: the browser plays the video natively and draws the HUD on
+// a canvas above it every animation frame, from a telemetry timeline fetched once
+// per clip/config/size. The server does no work while the video plays.
+const TIMELINE_RATE = 4;  // Telemetry samples per second of video
+const playback = { key: null, timeline: null, track: null, playing: false };
+
+async function loadTimeline(params) {
+    const key = JSON.stringify([params.fitPath, params.videoPath, params.config,
+                                params.maxWidth, params.maxHeight, params.offset]);
+    if (playback.key !== key) {
+        const timeline = await window.api.getTimeline(params);
+        const layer = timeline.header.static;
+        // Map and elevation profile without markers; drawn as-is every frame
+        playback.track = layer ? await loadImage(`data:${layer.mime};base64,${layer.image}`) : null;
+        playback.timeline = timeline;
+        playback.key = key;
+    }
+    return playback.timeline;
+}
+
+// Value of a timeline column at video time t: the nearest sample (like the
+// renderer's nearest telemetry row), or interpolated for smooth markers
+function sampleAt(timeline, name, t, interpolate) {
+    const values = timeline.columns[name];
+    const pos = Math.max(0, Math.min(values.length - 1, t * timeline.header.rate));
+    const i = Math.floor(pos);
+    if (!interpolate || i + 1 >= values.length) return values[Math.round(pos)];
+    const a = values[i];
+    const b = values[i + 1];
+    if (Number.isNaN(a) || Number.isNaN(b)) return values[Math.round(pos)];
+    return a + (b - a) * (pos - i);
+}
+
+function formatValue(value, format) {
+    // Python formats from overlay.py/metrics.py: "{:.0f}", "{:.1f}%", "Z{:.0f}"
+    return format.replace(/\{:\.(\d)f\}/, (_, digits) =>
+        (Number.isNaN(value) ? 0 : value).toFixed(Number(digits)));
+}
+
+function drawHud(ctx, timeline, t) {
+    const { header } = timeline;
+    ctx.clearRect(0, 0, header.frame_width, header.frame_height);
+    if (playback.track) ctx.drawImage(playback.track, header.static.x, header.static.y);
+
+    // Text metrics, laid out like create_frame_rgba
+    ctx.textBaseline = 'top';
+    const x = Math.floor(50 * header.layout_scale);
+    for (const [name, text] of Object.entries(header.text)) {
+        const cfg = state.config[name];
+        if (!cfg || !cfg.enabled) continue;
+        const scale = (cfg.scale ?? 1) * header.layout_scale;
+        ctx.fillStyle = `rgba(255, 255, 255, ${cfg.opacity ?? 1})`;
+        ctx.font = `bold ${Math.floor(80 * scale)}px "DejaVu Sans", sans-serif`;
+        ctx.fillText(formatValue(sampleAt(timeline, text.column, t, false), text.format), x, text.y);
+        ctx.font = `${Math.floor(20 * scale)}px "DejaVu Sans", sans-serif`;
+        ctx.fillText(text.label, x, text.y + Math.floor(80 * scale));
+    }
+
+    const mapX = sampleAt(timeline, 'map_x', t, true);
+    const mapY = sampleAt(timeline, 'map_y', t, true);
+    if (!Number.isNaN(mapX) && !Number.isNaN(mapY)) {
+        ctx.beginPath();
+        ctx.arc(mapX, mapY, header.map.dot_radius, 0, 2 * Math.PI);
+        ctx.fillStyle = 'yellow';
+        ctx.fill();
+        ctx.strokeStyle = 'black';
+        ctx.lineWidth = 1;
+        ctx.stroke();
+    }
+
+    // History chart: one point per second of the last header.chart.window seconds
+    const chart = header.chart;
+    const chartCfg = state.config.chart;
+    if (chart && chartCfg && chartCfg.enabled) {
+        const opacity = chartCfg.opacity ?? 1;
+        const scale = (chartCfg.scale ?? 1) * header.layout_scale;
+        const [r, g, b] = chart.color;
+        ctx.fillStyle = `rgba(0, 0, 0, ${0.35 * opacity})`;
+        ctx.fillRect(chart.x - 2, chart.y - 2, chart.width + 4, chart.height + 4);
+        ctx.strokeStyle = `rgba(255, 255, 255, ${opacity})`;
+        ctx.lineWidth = 1;
+        ctx.strokeRect(chart.x - 2, chart.y - 2, chart.width + 4, chart.height + 4);
+        ctx.beginPath();
+        for (let k = 0; k <= chart.window; k++) {
+            const when = t - chart.window + k;
+            if (when < 0) continue;
+            const value = Math.min(chart.high, Math.max(chart.low, sampleAt(timeline, chart.column, when, false) || 0));
+            const px = chart.x + k * chart.width / chart.window;
+            const py = chart.y + chart.height - 1 - (value - chart.low) * (chart.height - 2) / (chart.high - chart.low);
+            ctx.lineTo(px, py);
+        }
+        ctx.strokeStyle = `rgba(${r}, ${g}, ${b}, ${opacity})`;
+        ctx.lineWidth = Math.max(1, Math.floor(2 * scale));
+        ctx.stroke();
+        ctx.fillStyle = `rgba(255, 255, 255, ${opacity})`;
+        ctx.font = `${Math.floor(16 * scale)}px "DejaVu Sans", sans-serif`;
+        ctx.fillText(chart.label, chart.x + Math.floor(6 * header.layout_scale), chart.y + Math.floor(4 * header.layout_scale));
+    }
+
+    const profileX = sampleAt(timeline, 'profile_x', t, true);
+    if (!Number.isNaN(profileX)) {
+        ctx.beginPath();
+        ctx.moveTo(profileX, header.profile.y);
+        ctx.lineTo(profileX, header.profile.y + header.profile.height);
+        ctx.strokeStyle = 'yellow';
+        ctx.lineWidth = 2;
+        ctx.stroke();
+    }
+}
+
+// Keep the HUD canvas exactly over the displayed video
+function alignHud(video, canvas) {
+    const container = document.querySelector('.preview-container').getBoundingClientRect();
+    const rect = video.getBoundingClientRect();
+    canvas.style.left = `${rect.left - container.left}px`;
+    canvas.style.top = `${rect.top - container.top}px`;
+    canvas.style.width = `${rect.width}px`;
+    canvas.style.height = `${rect.height}px`;
+}
+
+async function startPlayback() {
+    const btn = document.getElementById('btn-play');
+    const video = document.getElementById('preview-video');
+    const canvas = document.getElementById('hud-canvas');
+    const timestamp = parseInt(document.getElementById('timeline').value);
+
+    btn.disabled = true;
+    let timeline;
+    try {
+        timeline = await loadTimeline({ ...previewParams(timestamp), rate: TIMELINE_RATE });
+    } catch (error) {
+        console.error('Timeline error:', error);
+        btn.disabled = false;
+        return;
+    }
+
+    const src = window.api.getVideoUrl({ videoPath: state.videoPath });
+    if (video.dataset.src !== src) {
+        video.src = src;
+        video.dataset.src = src;
+    }
+    video.currentTime = timestamp;
+    canvas.width = timeline.header.frame_width;
+    canvas.height = timeline.header.frame_height;
+    document.getElementById('preview-canvas').classList.add('hidden');
+    document.getElementById('preview-img').classList.add('hidden');
+    document.getElementById('preview-placeholder').classList.add('hidden');
+    video.classList.remove('hidden');
+    canvas.classList.remove('hidden');
+
+    playback.playing = true;
+    btn.textContent = '⏸';
+    btn.disabled = false;
+    try {
+        await video.play();
+    } catch (error) {
+        console.error('Playback error:', error);
+        stopPlayback();
+        return;
+    }
+
+    const ctx = canvas.getContext('2d');
+    const slider = document.getElementById('timeline');
+    const frame = () => {
+        if (!playback.playing || playback.timeline !== timeline) return;
+        if (video.ended) {
+            stopPlayback();
+            return;
+        }
+        alignHud(video, canvas);
+        drawHud(ctx, timeline, video.currentTime);
+        const second = Math.floor(video.currentTime);
+        if (parseInt(slider.value) !== second) {
+            slider.value = second;
+            showTime(second);
+        }
+        requestAnimationFrame(frame);
+    };
+    requestAnimationFrame(frame);
+}
+
+function stopPlayback() {
+    const video = document.getElementById('preview-video');
+    playback.playing = false;
+    video.pause();
+    video.classList.add('hidden');
+    document.getElementById('hud-canvas').classList.add('hidden');
+    document.getElementById('btn-play').textContent = '▶';
+    // Back to the server-rendered still at the position playback stopped
+    updatePreview();
+}
+
+document.getElementById('btn-play').addEventListener('click', () => {
+    if (playback.playing) {
+        stopPlayback();
+    } else {
+        startPlayback();
+    }
+});
 
 // Generate
 document.getElementById('btn-generate').addEventListener('click', async () => {
@@ -593,7 +1094,9 @@ document.getElementById('btn-generate').addEventListener('click', async () => {
             videoPath: state.videoPath,
             outputPath: outputPath,
             config: state.config,
-            quality: qualityMode
+            quality: qualityMode,
+            // Only a refined (motion or camera) offset differs from what generate.py computes itself
+            offset: state.syncMethod && state.syncMethod !== 'creation_time' ? state.syncOffset : null
         });
 
         btn.textContent = 'Complete!';
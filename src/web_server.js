@@ -133,12 +133,142 @@ function runPython(script, args) {
     });
 }
 
-// Global job state (simple version for single user)
-let currentJob = {
-    status: 'idle',
-    progress: 0,
-    message: ''
-};
+// Generation jobs, keyed by job id. Jobs run in a shared Python job runner
+// that enforces a global CPU budget across concurrent renders.
+const jobs = new Map();
+let latestJobId = null;
+let jobCounter = 0;
+let jobRunner = null;
+
+// Helper to get (or lazily start) the long-running job runner
+function getJobRunner() {
+    if (jobRunner) return jobRunner;
+
+    const scriptPath = path.join(__dirname, 'api', 'job_runner.py');
+    jobRunner = spawn(PYTHON_PATH, [scriptPath, '--stdin']);
+
+    let buffer = '';
+    jobRunner.stdout.on('data', (data) => {
+        buffer += data.toString();
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            const trimmed = line.trim();
+            if (!trimmed) continue;
+
+            console.log('PY:', trimmed);
+
+            // Format: JOB:<id>:<EVENT>[:<value>]
+            const match = trimmed.match(/^JOB:([^:]+):([A-Z]+):?(.*)$/);
+            if (!match) continue;
+            const job = jobs.get(match[1]);
+            if (!job) continue;
+            const [, , event, value] = match;
+
+            if (event === 'PROGRESS') {
+                job.progress = parseInt(value, 10);
+            } else if (event === 'STATUS') {
+                job.message = value.trim();
+            } else if (event === 'STARTED') {
+                job.status = 'running';
+                job.message = 'Starting...';
+            } else if (event === 'DONE') {
+                const code = parseInt(value, 10);
+                console.log(`Job ${job.id} finished with code`, code);
+                job.status = code === 0 ? 'completed' : 'error';
+                job.progress = 100;
+                job.message = code === 0 ? 'Done!' : 'Detailed error in server logs';
+            }
+        }
+    });
+
+    jobRunner.stderr.on('data', (data) => {
+        console.error('PY ERR:', data.toString());
+    });
+
+    jobRunner.on('close', (code) => {
+        console.error('Job runner exited with code', code);
+        jobRunner = null;
+        for (const job of jobs.values()) {
+            if (job.status === 'queued' || job.status === 'running') {
+                job.status = 'error';
+                job.message = 'Job runner exited unexpectedly';
+            }
+        }
+    });
+
+    return jobRunner;
+}
+
+// Long-running preview service (preview_server.py --serve). It keeps the FIT data,
+// video metadata and map/profile assets warm, so previews skip Python startup.
+let previewService = null;
+let previewRequestId = 0;
+const pendingPreviews = new Map();
+const PREVIEW_TIMEOUT_MS = 30000;
+
+// Helper to get (or lazily start) the preview service
+function getPreviewService() {
+    if (previewService) return previewService;
+
+    const scriptPath = path.join(__dirname, 'api', 'preview_server.py');
+    previewService = spawn(PYTHON_PATH, [scriptPath, '--serve']);
+
+    let buffer = '';
+    previewService.stdout.on('data', (data) => {
+        buffer += data.toString();
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            let response;
+            try {
+                response = JSON.parse(line);
+            } catch (err) {
+                console.error('Preview service sent invalid JSON:', line.slice(0, 200));
+                continue;
+            }
+            const pending = pendingPreviews.get(response.id);
+            if (!pending) continue;
+            pendingPreviews.delete(response.id);
+            clearTimeout(pending.timer);
+            if (response.error) {
+                pending.reject(response.error);
+            } else {
+                pending.resolve(response);
+            }
+        }
+    });
+
+    previewService.stderr.on('data', (data) => {
+        console.error('PREVIEW ERR:', data.toString());
+    });
+
+    previewService.on('close', (code) => {
+        console.error('Preview service exited with code', code);
+        previewService = null;
+        for (const pending of pendingPreviews.values()) {
+            clearTimeout(pending.timer);
+            pending.reject('Preview service exited unexpectedly');
+        }
+        pendingPreviews.clear();
+    });
+
+    return previewService;
+}
+
+// Helper to send one request to the preview service
+function requestPreview(request) {
+    return new Promise((resolve, reject) => {
+        const id = ++previewRequestId;
+        const timer = setTimeout(() => {
+            pendingPreviews.delete(id);
+            reject('Preview timed out');
+        }, PREVIEW_TIMEOUT_MS);
+        pendingPreviews.set(id, { resolve, reject, timer });
+        getPreviewService().stdin.write(JSON.stringify({ id, ...request }) + '\n');
+    });
+}
 
 // API: Get Video Info
 app.post('/api/video-info', async (req, res) => {
@@ -158,19 +288,38 @@ app.post('/api/video-info', async (req, res) => {
     }
 });
 
+// API: Metadata of every clip in a directory in one call (bounded parallel ffprobe,
+// disk-cached), with each clip's overlap with the FIT activity when fitPath is given
+app.post('/api/scan-videos', async (req, res) => {
+    try {
+        const { dirPath, fitPath } = req.body;
+        if (!dirPath) return res.status(400).json({ error: 'Missing dirPath' });
+
+        const scriptPath = path.join(__dirname, 'api', 'scan_videos.py');
+        const args = ['--dir', dirPath];
+        if (fitPath) args.push('--fit', fitPath);
+        const output = await runPython(scriptPath, args);
+
+        res.json(JSON.parse(output));
+    } catch (err) {
+        console.error('Scan videos error:', err);
+        res.status(500).json({ error: err.toString() });
+    }
+});
+
 // API: Calculate Sync Offset
 app.post('/api/calculate-sync', async (req, res) => {
     try {
-        const { fitPath, videoPath } = req.body;
+        const { fitPath, videoPath, auto } = req.body;
         if (!fitPath || !videoPath) {
             return res.status(400).json({ error: 'Missing fitPath or videoPath' });
         }
 
         const scriptPath = path.join(__dirname, 'api', 'calculate_sync.py');
-        const output = await runPython(scriptPath, [
-            '--fit', fitPath,
-            '--video', videoPath
-        ]);
+        const args = ['--fit', fitPath, '--video', videoPath];
+        // Refine from embedded camera telemetry, else by matching video motion with FIT speed
+        if (auto) args.push('--camera', '--auto');
+        const output = await runPython(scriptPath, args);
 
         const data = JSON.parse(output);
         res.json(data);
@@ -180,106 +329,265 @@ app.post('/api/calculate-sync', async (req, res) => {
     }
 });
 
+// Sync offset from a request (seconds); null lets the preview service auto-sync
+function syncOffset(offset) {
+    if (offset === undefined || offset === null || offset === '') return null;
+    const value = Number(offset);
+    return Number.isFinite(value) ? value : null;
+}
+
 // API: Preview - Generate a single frame preview
 app.post('/api/preview', async (req, res) => {
     try {
-        const { fitPath, videoPath, timestamp, config } = req.body;
+        const { fitPath, videoPath, timestamp, config, maxWidth, maxHeight, format, quality, offset } = req.body;
         if (!fitPath || !videoPath) {
             return res.status(400).json({ error: 'Missing fitPath or videoPath' });
         }
 
-        const scriptPath = path.join(__dirname, 'api', 'preview_server.py');
-        const configStr = JSON.stringify(config || {});
-
-        const output = await runPython(scriptPath, [
-            '--fit', fitPath,
-            '--video', videoPath,
-            '--timestamp', String(timestamp || 0),
-            '--config', configStr
-        ]);
+        // Rendered at the display size; JPEG unless the client asks otherwise
+        const result = await requestPreview({
+            fit: fitPath,
+            video: videoPath,
+            timestamp: Number(timestamp) || 0,
+            config: config || {},
+            max_width: maxWidth || null,
+            max_height: maxHeight || null,
+            format: format || 'jpeg',
+            quality: quality || null,
+            offset: syncOffset(offset)
+        });
 
-        // Output is base64 encoded image
-        res.json({ image: output.trim() });
+        // Image is base64 encoded
+        res.json({
+            image: result.image,
+            mime: result.mime,
+            width: result.width,
+            height: result.height,
+            ms: result.ms,
+            timings: result.timings
+        });
     } catch (err) {
         console.error('Preview error:', err);
         res.status(500).json({ error: err.toString() });
     }
 });
 
-// API: Check Health/Status
-app.get('/api/status', (req, res) => {
-    res.json(currentJob);
+// API: Preview background frame only (binary image, cacheable by the browser)
+app.get('/api/preview/frame', async (req, res) => {
+    try {
+        const { videoPath, timestamp, maxWidth, maxHeight, quality, offset } = req.query;
+        if (!videoPath) {
+            return res.status(400).json({ error: 'Missing videoPath' });
+        }
+
+        const result = await requestPreview({
+            mode: 'frame',
+            video: videoPath,
+            timestamp: Number(timestamp) || 0,
+            max_width: Number(maxWidth) || null,
+            max_height: Number(maxHeight) || null,
+            format: 'jpeg',
+            quality: Number(quality) || null,
+            offset: syncOffset(offset)
+        });
+
+        // Same URL -> same frame, so let the browser keep it
+        res.set('Content-Type', result.mime);
+        res.set('Cache-Control', 'private, max-age=3600');
+        res.send(Buffer.from(result.image, 'base64'));
+    } catch (err) {
+        console.error('Preview frame error:', err);
+        res.status(500).json({ error: err.toString() });
+    }
 });
 
-// API: Generate Overlay
-// This spawns the process and updates global state
-app.post('/api/generate', (req, res) => {
-    if (currentJob.status === 'running') {
-        return res.status(409).json({ error: 'Job already running' });
+// API: Preview overlay only (RGBA PNG cropped to the HUD, plus its position)
+app.post('/api/preview/overlay', async (req, res) => {
+    try {
+        const { fitPath, videoPath, timestamp, config, maxWidth, maxHeight, offset } = req.body;
+        if (!fitPath || !videoPath) {
+            return res.status(400).json({ error: 'Missing fitPath or videoPath' });
+        }
+
+        const result = await requestPreview({
+            mode: 'overlay',
+            fit: fitPath,
+            video: videoPath,
+            timestamp: Number(timestamp) || 0,
+            config: config || {},
+            max_width: maxWidth || null,
+            max_height: maxHeight || null,
+            offset: syncOffset(offset)
+        });
+
+        res.json({
+            image: result.image,
+            mime: result.mime,
+            x: result.x,
+            y: result.y,
+            width: result.width,
+            height: result.height,
+            frameWidth: result.frame_width,
+            frameHeight: result.frame_height,
+            ms: result.ms,
+            timings: result.timings
+        });
+    } catch (err) {
+        console.error('Preview overlay error:', err);
+        res.status(500).json({ error: err.toString() });
     }
+});
 
-    const { videoPath, fitPath, outputPath, config, quality } = req.body;
+// API: Telemetry timeline for real-time HUD playback in the browser. Binary:
+// uint32 header length, JSON header, then float32 columns (see build_timeline
+// in preview_server.py).
+app.post('/api/timeline', async (req, res) => {
+    try {
+        const { fitPath, videoPath, config, maxWidth, maxHeight, rate, offset } = req.body;
+        if (!fitPath || !videoPath) {
+            return res.status(400).json({ error: 'Missing fitPath or videoPath' });
+        }
 
-    // Reset state
-    currentJob = {
-        status: 'running',
-        progress: 0,
-        message: 'Starting...'
-    };
+        const result = await requestPreview({
+            mode: 'timeline',
+            fit: fitPath,
+            video: videoPath,
+            config: config || {},
+            max_width: maxWidth || null,
+            max_height: maxHeight || null,
+            rate: Number(rate) || 1,
+            offset: syncOffset(offset)
+        });
 
-    // Serialize config
-    const configStr = JSON.stringify(config);
-    const scriptPath = path.join(__dirname, 'api', 'generate.py');
+        res.set('Content-Type', 'application/octet-stream');
+        res.send(Buffer.from(result.timeline, 'base64'));
+    } catch (err) {
+        console.error('Timeline error:', err);
+        res.status(500).json({ error: err.toString() });
+    }
+});
 
-    console.log('Starting generation for:', videoPath);
-    console.log('Output path:', outputPath);
+// Containers the video picker offers (VIDEO_EXTENSIONS in src/core/metadata.py)
+const VIDEO_EXTENSIONS = new Set(['.mp4', '.mov', '.avi', '.mkv']);
 
-    const child = spawn(PYTHON_PATH, [
-        scriptPath,
-        '--fit', fitPath,
-        '--video', videoPath,
-        '--output', outputPath,
-        '--config', configStr,
-        '--quality', quality || 'crf'
-    ]);
+// API: The source video itself, for native playback (sendFile handles Range requests).
+// The server may be reachable over the LAN, so only video files are ever served.
+app.get('/api/video', (req, res) => {
+    const { videoPath } = req.query;
+    if (!videoPath) {
+        return res.status(400).json({ error: 'Missing videoPath' });
+    }
+    const resolved = path.resolve(videoPath);
+    let isFile = false;
+    try {
+        isFile = fs.statSync(resolved).isFile();
+    } catch (err) {
+        isFile = false;
+    }
+    if (!isFile || !VIDEO_EXTENSIONS.has(path.extname(resolved).toLowerCase())) {
+        return res.status(404).json({ error: 'Not a video file' });
+    }
+    res.sendFile(resolved);
+});
 
-    // Non-blocking response
-    res.json({ success: true, message: 'Job started' });
+// Scrub thumbnail sprites, by video path. Built once per video by a background
+// thumbnails.py job (which caches the sprite by video fingerprint on disk).
+const thumbnailJobs = new Map();
 
-    // Handle streaming output
-    child.stdout.on('data', (data) => {
-        const lines = data.toString().split('\n');
-        for (const line of lines) {
-            const trimmed = line.trim();
-            if (!trimmed) continue;
+// API: Thumbnail sprite index; starts the job on first request
+app.get('/api/thumbnails', (req, res) => {
+    const { videoPath } = req.query;
+    if (!videoPath) {
+        return res.status(400).json({ error: 'Missing videoPath' });
+    }
 
-            console.log('PY:', trimmed);
+    let job = thumbnailJobs.get(videoPath);
+    if (!job) {
+        job = { status: 'pending' };
+        thumbnailJobs.set(videoPath, job);
+        const scriptPath = path.join(__dirname, 'api', 'thumbnails.py');
+        runPython(scriptPath, ['--video', videoPath])
+            .then((output) => {
+                job.status = 'ready';
+                job.index = JSON.parse(output);
+            })
+            .catch((err) => {
+                console.error('Thumbnail error:', err);
+                job.status = 'error';
+            });
+    }
 
-            if (trimmed.startsWith('PROGRESS:')) {
-                const parts = trimmed.split(':');
-                if (parts.length >= 2) {
-                    currentJob.progress = parseInt(parts[1], 10);
-                }
-            } else if (trimmed.startsWith('STATUS:')) {
-                currentJob.message = trimmed.substring(7).trim();
-            }
-        }
-    });
+    if (job.status !== 'ready') {
+        return res.json({ status: job.status });
+    }
+    const { sprite, ...index } = job.index;
+    res.json({ status: 'ready', ...index });
+});
 
-    child.stderr.on('data', (data) => {
-        console.error('PY ERR:', data.toString());
-    });
+// API: Thumbnail sprite sheet image
+app.get('/api/thumbnails/sprite', (req, res) => {
+    const job = thumbnailJobs.get(req.query.videoPath);
+    if (!job || job.status !== 'ready') {
+        return res.status(404).json({ error: 'Thumbnails not ready' });
+    }
+    res.set('Cache-Control', 'private, max-age=3600');
+    res.sendFile(job.index.sprite);
+});
 
-    child.on('close', (code) => {
-        console.log('Job finished with code', code);
-        currentJob.status = code === 0 ? 'completed' : 'error';
-        currentJob.progress = 100;
-        if (code !== 0) {
-            currentJob.message = 'Detailed error in server logs';
-        } else {
-            currentJob.message = 'Done!';
-        }
+// API: Check Health/Status
+// With ?jobId=... returns that job, otherwise the most recently started job
+app.get('/api/status', (req, res) => {
+    const jobId = req.query.jobId || latestJobId;
+    const job = jobId ? jobs.get(jobId) : null;
+    if (!job) {
+        return res.json({ status: 'idle', progress: 0, message: '' });
+    }
+    res.json(job);
+});
+
+// API: List all generation jobs
+app.get('/api/jobs', (req, res) => {
+    res.json({ jobs: Array.from(jobs.values()) });
+});
+
+// API: Generate Overlay
+// Queues the job in the job runner; several jobs may run at once
+app.post('/api/generate', (req, res) => {
+    const { videoPath, fitPath, outputPath, config, quality, offset } = req.body;
+    if (!videoPath || !fitPath || !outputPath) {
+        return res.status(400).json({ error: 'Missing videoPath, fitPath or outputPath' });
+    }
+    const hasOffset = !(offset === undefined || offset === null || offset === '');
+    if (hasOffset && !Number.isFinite(Number(offset))) {
+        return res.status(400).json({ error: `Invalid offset: ${offset}` });
+    }
+
+    const jobId = `job${Date.now()}-${++jobCounter}`;
+    jobs.set(jobId, {
+        id: jobId,
+        status: 'queued',
+        progress: 0,
+        message: 'Queued...',
+        outputPath
     });
+    latestJobId = jobId;
+
+    console.log('Queueing generation for:', videoPath);
+    console.log('Output path:', outputPath);
+
+    getJobRunner().stdin.write(JSON.stringify({
+        id: jobId,
+        fit: fitPath,
+        video: videoPath,
+        output: outputPath,
+        config: config || {},
+        quality: quality || 'crf',
+        // A sync offset chosen in the UI (e.g. motion-refined) overrides auto-sync
+        args: hasOffset ? ['--offset', Number(offset)] : []
+    }) + '\n');
+
+    // Non-blocking response
+    res.json({ success: true, jobId, message: 'Job queued' });
 });
 
 app.listen(PORT, () => {
@@ -0,0 +1,76 @@
+"""
+Motion / speed cross-correlation (src/core/autosync.py) on synthetic signals with
+a known shift.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import autosync
+from src.core.autosync import correlate_offsets, MIN_OVERLAP
+
+
+def ride_speed(seconds=3600, seed=0):
+    """Speed (m/s) that varies over a few seconds around a steady mean."""
+    rng = np.random.default_rng(seed)
+    speed = np.convolve(rng.normal(0, 3, seconds), np.ones(5) / 5, mode='same')
+    return np.clip(8 + speed, 0, None)
+
+
+def clip_motion(speed, lag, length, seed=1):
+    """Motion energy of a clip whose first frame is `lag` seconds into the activity."""
+    rng = np.random.default_rng(seed)
+    motion = rng.normal(0, 0.3, length)
+    t = np.arange(length)
+    inside = (t + lag >= 0) & (t + lag < len(speed))
+    motion[inside] += 2.5 * speed[t[inside] + lag]
+    return motion
+
+
+def test_finds_the_shift():
+    speed = ride_speed()
+    motion = clip_motion(speed, 1234, 600)
+    lags = np.arange(1000, 1500)
+    scores = correlate_offsets(motion, speed, lags)
+    assert lags[np.argmax(scores)] == 1234
+    assert scores.max() > 0.9
+
+
+def test_clip_starting_before_the_activity():
+    speed = ride_speed()
+    motion = clip_motion(speed, -45, 300)
+    lags = np.arange(-200, 200)
+    assert lags[np.argmax(correlate_offsets(motion, speed, lags))] == -45
+
+
+def test_too_little_overlap_scores_minus_inf():
+    speed = ride_speed(600)
+    motion = clip_motion(speed, 0, 120)
+    lags = np.array([0, 600 - MIN_OVERLAP, 600 - MIN_OVERLAP + 1, -(120 - MIN_OVERLAP) - 1])
+    scores = correlate_offsets(motion, speed, lags)
+    assert np.isfinite(scores[:2]).all()
+    assert np.isneginf(scores[2:]).all()
+
+
+def test_refine_offset_corrects_the_estimate(monkeypatch):
+    speed = ride_speed()
+    motion = clip_motion(speed, 812, 900)
+    monkeypatch.setattr(autosync, 'motion_energy', lambda video_path: motion)
+    index = pd.date_range('2026-01-01', periods=len(speed), freq='1s', tz='UTC')
+    df = pd.DataFrame({'speed': speed}, index=index)
+
+    match = autosync.refine_offset("clip.mp4", df, estimate=800.0, window=60)
+    assert abs(match['offset'] - 812) < 0.5
+    assert abs(match['correction'] - 12) < 0.5
+    assert match['confidence'] > 0.9
+
+
+def test_flat_signal_has_no_match(monkeypatch):
+    monkeypatch.setattr(autosync, 'motion_energy', lambda video_path: np.ones(600))
+    df = pd.DataFrame({'speed': ride_speed(1200)})
+    assert autosync.refine_offset("clip.mp4", df, estimate=100.0) is None
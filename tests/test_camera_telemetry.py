@@ -0,0 +1,149 @@
+"""
+Embedded camera telemetry (src/core/camera_telemetry.py): DJI SRT subtitles and
+GoPro GPMF packets are parsed without ffmpeg, and GPS positions line up with a
+FIT track at the right offset.
+"""
+import datetime
+import os
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.camera_telemetry import parse_dji_srt, parse_gpmf_packet, time_offset, gps_offset
+
+
+UTC = datetime.timezone.utc
+
+DJI_SRT = """1
+00:00:00,000 --> 00:00:00,033
+<font size="28">FrameCnt: 1, DiffTime: 33ms
+2024-05-01 10:00:00.123
+[iso: 100] [shutter: 1/500.0] [fnum: 1.7] [ev: 0] [latitude: 47.123456] [longitude: 8.654321] [rel_alt: 1.2 abs_alt: 400.5] </font>
+
+2
+00:00:01,500 --> 00:00:01,533
+<font size="28">FrameCnt: 46, DiffTime: 33ms
+2024-05-01 10:00:01.623
+[iso: 100] [latitude: 0.000000] [longtitude: 0.000000] </font>
+"""
+
+DJI_SRT_OLD = """1
+00:00:02,000 --> 00:00:03,000
+HOME(8.6500,47.1200) 2019.05.01 10:00:02
+GPS(8.654321,47.123456,15) BAROMETER:12.3
+"""
+
+
+def test_dji_srt():
+    first, second = parse_dji_srt(DJI_SRT)
+    assert first['t'] == 0.0
+    assert first['time'] == datetime.datetime(2024, 5, 1, 10, 0, 0, 123000)
+    assert (first['lat'], first['lon']) == (47.123456, 8.654321)
+    assert second['t'] == 1.5
+    # 0, 0 means no fix ("longtitude" is how some firmware spells it)
+    assert (second['lat'], second['lon']) == (None, None)
+
+
+def test_dji_srt_older_gps_format():
+    sample, = parse_dji_srt(DJI_SRT_OLD.replace('\n', '\r\n'))
+    assert sample['t'] == 2.0
+    assert (sample['lat'], sample['lon']) == (47.123456, 8.654321)
+
+
+def klv(key, type_char, size, values=b'', repeat=None):
+    """One GPMF KLV entry, padded to 32 bits."""
+    data = values
+    if repeat is None:
+        repeat = len(data) // size if size else 0
+    entry = key.encode('latin-1') + type_char.encode('latin-1') + bytes([size]) + struct.pack('>H', repeat) + data
+    return entry + b'\0' * (-len(entry) % 4)
+
+
+def nested(key, *children):
+    body = b''.join(children)
+    return klv(key, '\0', 1, body, repeat=len(body))
+
+
+def gps5_packet(points, fix=3):
+    scale = struct.pack('>5l', 10000000, 10000000, 1000, 1000, 100)
+    rows = b''.join(struct.pack('>5l', int(round(lat * 1e7)), int(round(lon * 1e7)), 400000, 8000, 800)
+                    for lat, lon in points)
+    return nested('DEVC', nested('STRM',
+        klv('SCAL', 'l', 4, scale),
+        klv('GPSU', 'U', 16, b'240501100000.000'),
+        klv('GPSF', 'L', 4, struct.pack('>L', fix)),
+        klv('GPS5', 'l', 20, rows),
+    ))
+
+
+def test_gpmf_gps5():
+    points = [(47.1 + i * 1e-4, 8.6 + i * 1e-4) for i in range(10)]
+    samples = parse_gpmf_packet(gps5_packet(points), start=4.0, duration=1.0)
+    assert len(samples) == 10
+    assert samples[0]['t'] == 4.0 and abs(samples[5]['t'] - 4.5) < 1e-9
+    assert abs(samples[3]['lat'] - 47.1003) < 1e-7 and abs(samples[3]['lon'] - 8.6003) < 1e-7
+    # GPSU is the time of the first sample; the rest are spread over the packet
+    assert samples[0]['time'] == datetime.datetime(2024, 5, 1, 10, 0, 0, tzinfo=UTC)
+    assert samples[5]['time'] == datetime.datetime(2024, 5, 1, 10, 0, 0, 500000, tzinfo=UTC)
+
+
+def test_gpmf_without_fix():
+    samples = parse_gpmf_packet(gps5_packet([(47.1, 8.6)], fix=0), start=0.0, duration=1.0)
+    assert samples == [{'t': 0.0, 'time': None, 'lat': None, 'lon': None}]
+
+
+def test_gpmf_gps9_carries_time_per_sample():
+    # lat, lon, alt, 2D speed, 3D speed, days since 2000, seconds of day, DOP, fix
+    scale = struct.pack('>9l', 10000000, 10000000, 1000, 1000, 100, 1, 1000, 100, 1)
+    days = (datetime.date(2024, 5, 1) - datetime.date(2000, 1, 1)).days
+    rows = b''.join(struct.pack('>7l2H', 471000000, 86000000, 400000, 8000, 800, days, 36000000 + 100 * i, 150, 3)
+                    for i in range(2))
+    payload = nested('DEVC', nested('STRM',
+        klv('SCAL', 'l', 4, scale),
+        klv('TYPE', 'c', 1, b'lllllllSS'),
+        klv('GPS9', '?', 32, rows),
+    ))
+    first, second = parse_gpmf_packet(payload, start=0.0, duration=1.0)
+    assert (first['lat'], first['lon']) == (47.1, 8.6)
+    assert first['time'] == datetime.datetime(2024, 5, 1, 10, 0, 0, tzinfo=UTC)
+    assert second['time'] == datetime.datetime(2024, 5, 1, 10, 0, 0, 100000, tzinfo=UTC)
+
+
+def fit_track(seconds=600):
+    """A 1 Hz FIT track heading north-east at about 8 m/s, with a bend halfway."""
+    t = np.arange(seconds)
+    lat = 47.0 + np.where(t < seconds // 2, t, seconds // 2) * 7e-5
+    lon = 8.0 + np.where(t < seconds // 2, 0, t - seconds // 2) * 1e-4 + t * 2e-5
+    index = pd.date_range('2024-05-01 09:50', periods=seconds, freq='1s', tz='UTC')
+    return pd.DataFrame({'position_lat': lat, 'position_long': lon}, index=index)
+
+
+def test_gps_offset_finds_the_shift():
+    df = fit_track()
+    offset = 237.0
+    lat, lon = df['position_lat'].to_numpy(), df['position_long'].to_numpy()
+    samples = [{'t': float(t), 'time': None, 'lat': lat[t + int(offset)], 'lon': lon[t + int(offset)]}
+               for t in range(120)]
+    found, error = gps_offset(samples, df)
+    assert abs(found - offset) < 0.1
+    assert error < 1.0
+    # With an estimate only a window around it is searched
+    found, _ = gps_offset(samples, df, estimate=230.0, window=20)
+    assert abs(found - offset) < 0.1
+
+
+def test_time_offset_from_sample_clocks():
+    df = fit_track()
+    start = df.index[0].to_pydatetime()
+    samples = [{'t': float(t), 'time': start + datetime.timedelta(seconds=100 + t), 'lat': None, 'lon': None}
+               for t in range(30)]
+    assert time_offset(samples, df) == 100.0
+    # Naive camera clock times are taken as UTC
+    naive = [dict(s, time=s['time'].replace(tzinfo=None)) for s in samples]
+    assert time_offset(naive, df) == 100.0
+    assert time_offset([{'t': 0.0, 'time': None, 'lat': None, 'lon': None}], df) is None
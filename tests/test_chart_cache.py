@@ -0,0 +1,53 @@
+"""
+History chart caches (src/core/overlay.py): keyed on column content, not object
+identity, and bounded like the tile cache.
+"""
+import gc
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import overlay
+
+
+def track(values):
+    index = pd.date_range('2026-01-01', periods=len(values), freq='1s', tz='UTC')
+    return pd.DataFrame({'power': np.asarray(values, dtype=float)}, index=index)
+
+
+def test_new_tracks_never_see_stale_values():
+    overlay.reset_track_cache()
+    # Short-lived frames, as the preview server's metric cache creates; CPython
+    # reuses the ids of collected ones
+    for n in range(50):
+        df = track(np.full(300, float(n)))
+        values, low, high = overlay.chart_data(df, 'power')
+        assert (values == n).all()
+        tile = overlay.chart_tile(df, 'power', 400, 120, 2, 0)
+        # The tile served is the one drawn for this track's data
+        key = next(k for k, v in overlay.CHART_TILES.items() if v is tile)
+        assert key[0] == overlay.column_fingerprint(df, 'power')
+        del df, values, tile
+        gc.collect()
+    assert len(overlay.CHART_DATA) <= overlay.CHART_DATA_CACHE_SIZE
+    assert len(overlay.CHART_TILES) <= overlay.CHART_TILE_CACHE_SIZE
+    assert len(overlay.TRACK_FINGERPRINTS) <= overlay.TRACK_FINGERPRINT_CACHE_SIZE
+
+
+def test_same_column_content_shares_one_entry():
+    overlay.reset_track_cache()
+    df = track(np.arange(300))
+    with_metrics = df.assign(power_3s=df['power'].rolling(3, min_periods=1).mean())
+    assert overlay.column_fingerprint(df, 'power') == overlay.column_fingerprint(with_metrics, 'power')
+    assert overlay.chart_data(df, 'power') is overlay.chart_data(with_metrics, 'power')
+    assert len(overlay.CHART_DATA) == 1
+
+    edited = df.copy()
+    edited.iloc[10, 0] = 1000.0
+    assert overlay.column_fingerprint(edited, 'power') != overlay.column_fingerprint(df, 'power')
+    assert overlay.chart_data(edited, 'power')[0][10] == 1000.0
@@ -0,0 +1,98 @@
+"""
+Shared chunk cache (src/core/cache.py): least-recently-used entries go first,
+the cache is kept under its cap, and the whole cache is only walked once a
+running total says it may be over.
+"""
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.cache import ChunkCache
+
+
+def segment(tmp_path, name, size=100):
+    path = os.path.join(str(tmp_path), name)
+    with open(path, 'wb') as f:
+        f.write(b"x" * size)
+    return path
+
+
+def cached_files(cache):
+    return sorted(name for _, _, names in os.walk(cache.root) for name in names)
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=10**6)
+    cache.put("ab12", segment(tmp_path, "a.mov"))
+    dest = os.path.join(str(tmp_path), "out.mov")
+    assert cache.get("ab12", dest)
+    assert os.path.getsize(dest) == 100
+    assert not cache.get("cd34", dest)
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=10**6)
+    for key in ("aa01", "bb02", "cc03"):
+        cache.put(key, segment(tmp_path, key + ".mov"))
+    # aa01 oldest, then bb02, then cc03; reading aa01 makes it the newest
+    for age, key in enumerate(("aa01", "bb02", "cc03")):
+        os.utime(cache.path_for(key), (1000 + age, 1000 + age))
+    assert cache.get("aa01", os.path.join(str(tmp_path), "out.mov"))
+
+    cache.max_bytes = 250
+    cache.evict()
+    assert not os.path.exists(cache.path_for("bb02"))
+    assert os.path.exists(cache.path_for("aa01"))
+    assert os.path.exists(cache.path_for("cc03"))
+    assert cache.total_bytes == 200
+
+
+def test_put_stays_under_cap(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=350)
+    for n in range(10):
+        key = f"{n:02d}ff"
+        cache.put(key, segment(tmp_path, key + ".mov"))
+        os.utime(cache.path_for(key), (1000 + n, 1000 + n))
+        assert cache.total_bytes <= 350
+    # The three newest survive
+    assert cached_files(cache) == ["07ff.mov", "08ff.mov", "09ff.mov"]
+
+
+def test_walks_only_when_running_total_exceeds_cap(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=450)
+    walks = []
+    evict = cache.evict
+    cache.evict = lambda: walks.append(1) or evict()
+
+    for n in range(4):
+        cache.put(f"{n:02d}ee", segment(tmp_path, f"{n}.mov"))
+    # The first put measures the cache; the next three only add to the total
+    assert len(walks) == 1
+    assert cache.total_bytes == 400
+    # Replacing an entry does not count it twice
+    cache.put("00ee", segment(tmp_path, "0.mov"))
+    assert cache.total_bytes == 400 and len(walks) == 1
+
+    cache.put("04ee", segment(tmp_path, "4.mov"))
+    assert len(walks) == 2
+    assert cache.total_bytes <= 450
+
+
+def test_put_leaves_no_temp_files(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=10**6)
+    src = segment(tmp_path, "a.mov")
+    cache.put("ab12", src)
+    cache.put("ab12", src)
+    assert cached_files(cache) == ["ab12.mov"]
+
+
+def test_key_covers_every_input():
+    base = ("t", "c", 1920, 1080, 30, 0.0, 60.0)
+    keys = {ChunkCache.make_key(*base)}
+    for i, changed in enumerate(("t2", "c2", 1280, 720, 25, 60.0, 120.0)):
+        args = list(base)
+        args[i] = changed
+        keys.add(ChunkCache.make_key(*args))
+    assert len(keys) == 8
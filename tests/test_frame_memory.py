@@ -0,0 +1,85 @@
+"""
+Peak frame memory of the chunk render path (generate.make_chunk_renderer ->
+create_frame_rgba -> framepipe.encode_frames) stays within the frame ring,
+however long the chunk is.
+
+The encoder is a slow stand-in reader (no ffmpeg needed), so the renderer outruns
+it and only backpressure from the ring keeps memory flat.
+"""
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import generate
+from src.core.framepipe import encode_frames, ring_bytes, chunk_frame_range
+
+
+WIDTH, HEIGHT, FPS = 640, 360, 30
+RING_FRAMES = 4
+# Text widgets and the history chart; the map needs tile downloads
+CONFIG = {'map': {'enabled': False}, 'elevation': {'enabled': False},
+          'chart': {'enabled': True, 'scale': 1.0, 'opacity': 1.0}}
+
+
+def slow_reader_command(frame_bytes, delay=0.001):
+    """A stand-in encoder that reads one frame every `delay` seconds."""
+    code = (
+        "import sys, time\n"
+        f"while sys.stdin.buffer.read({frame_bytes}):\n"
+        f"    time.sleep({delay})\n"
+    )
+    return [sys.executable, "-c", code]
+
+
+def synthetic_ride(seconds):
+    t = np.arange(seconds)
+    index = pd.date_range('2026-01-01', periods=seconds, freq='1s', tz='UTC')
+    return pd.DataFrame({
+        'speed_mph': 18 + 4 * np.sin(t / 30.0),
+        'power': 200 + 80 * np.sin(t / 9.0),
+        'cadence': 85 + 5 * np.sin(t / 7.0),
+        'heart_rate': 140 + 20 * np.sin(t / 60.0),
+        'grade': 2 * np.sin(t / 100.0),
+    }, index=index)
+
+
+def peak_render_memory(duration):
+    """Peak traced bytes while rendering and encoding a chunk of `duration` seconds."""
+    spec = generate.make_render_spec(WIDTH, HEIGHT, FPS, 0.0, HEIGHT / 1080.0, RING_FRAMES)
+    first_frame, last_frame = chunk_frame_range(0.0, duration, FPS)
+    command = slow_reader_command(WIDTH * HEIGHT * 4)
+
+    # Warm fonts and chart tiles so only per-frame memory is measured
+    generate.make_chunk_renderer(spec, 0, 0.0, CONFIG, None)(0, np.zeros((HEIGHT, WIDTH, 4), dtype=np.uint8))
+
+    render_into = generate.make_chunk_renderer(spec, first_frame, 0.0, CONFIG, None)
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        encode_frames(command, WIDTH, HEIGHT, last_frame - first_frame, render_into, RING_FRAMES)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def test_peak_memory_bounded_by_ring():
+    generate.init_worker(synthetic_ride(600))
+    frame_bytes = WIDTH * HEIGHT * 4
+    # The ring, plus at a row change the renderer's held frame, the new one and
+    # the bytes PIL hands to numpy while converting it
+    budget = ring_bytes(WIDTH, HEIGHT, RING_FRAMES) + 3 * frame_bytes + 1024**2
+
+    short = peak_render_memory(2)
+    long = peak_render_memory(20)
+
+    assert short <= budget
+    assert long <= budget
+    # Ten times the frames, same memory
+    assert long - short < frame_bytes
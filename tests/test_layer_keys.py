@@ -0,0 +1,66 @@
+"""
+Widget streams (generate.plan_layers with widget_streams=True): a change to one
+widget's settings invalidates only the layers that depend on it.
+"""
+import copy
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import generate
+
+
+WIDTH, HEIGHT = 1920, 1080
+CONFIG = {name: {'enabled': True, 'scale': 1.0, 'opacity': 1.0} for name in generate.WIDGETS}
+
+
+def ride(seconds=120):
+    t = np.arange(seconds)
+    index = pd.date_range('2026-01-01', periods=seconds, freq='1s', tz='UTC')
+    return pd.DataFrame({
+        'speed_mph': 18 + 4 * np.sin(t / 30.0),
+        'power': 200 + 80 * np.sin(t / 9.0),
+        'cadence': np.full(seconds, 85.0),
+        'heart_rate': np.full(seconds, 140.0),
+        'grade': np.zeros(seconds),
+        'position_lat': 47.0 + t * 1e-4,
+        'position_long': 8.0 + t * 1e-4,
+        'distance': t * 8.0,
+        'altitude': np.full(seconds, 400.0),
+    }, index=index)
+
+
+def layer_hashes(config, tmp_path):
+    """config_hash of every widget layer's first chunk."""
+    spec = generate.make_render_spec(WIDTH, HEIGHT, 30, 0.0, 1.0)
+    layers = generate.plan_layers(config, WIDTH, HEIGHT, 1.0, widget_streams=True)
+    plan = generate.prepare_chunks(ride(), spec, layers, [(0.0, 60.0, 0)], str(tmp_path))
+    return {name: plan['expected'][generate.chunk_key(name, 0)]['config_hash'] for name, _, _ in layers}
+
+
+def changed_layers(tmp_path, widget, setting, value):
+    config = copy.deepcopy(CONFIG)
+    config[widget][setting] = value
+    before = layer_hashes(CONFIG, tmp_path / "before")
+    after = layer_hashes(config, tmp_path / "after")
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_one_widget_setting_changes_only_its_layer(tmp_path):
+    assert changed_layers(tmp_path, 'elevation', 'opacity', 0.5) == {'elevation'}
+    assert changed_layers(tmp_path, 'speed', 'opacity', 0.5) == {'speed'}
+    assert changed_layers(tmp_path, 'chart', 'metric', 'heart_rate') == {'chart'}
+
+
+def test_map_scale_also_moves_the_chart(tmp_path):
+    # The chart is laid out below the map
+    assert changed_layers(tmp_path, 'map', 'scale', 1.5) == {'map', 'chart'}
+
+
+def test_map_opacity_leaves_the_chart(tmp_path):
+    assert changed_layers(tmp_path, 'map', 'opacity', 0.5) == {'map'}
@@ -0,0 +1,103 @@
+"""
+Chunk manifest (src/core/manifest.py): a recorded chunk is reused only while the
+telemetry it reads, the sync offset and its file are unchanged.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import manifest as chunk_manifest
+
+
+def ride(seconds=120):
+    index = pd.date_range('2026-01-01', periods=seconds, freq='1s', tz='UTC')
+    return pd.DataFrame({'power': np.arange(seconds, dtype=float),
+                         'speed_mph': np.full(seconds, 18.0)}, index=index)
+
+
+def recorded_chunk(tmp_path, df, offset, start=30.0, end=60.0):
+    """A manifest holding one finished chunk, plus its work dir and expected entry."""
+    chunk_path = os.path.join(str(tmp_path), "ovr_000.mov")
+    with open(chunk_path, 'wb') as f:
+        f.write(b"chunk")
+    entry = expected_entry(df, offset, chunk_path, start, end)
+    return {'version': chunk_manifest.MANIFEST_VERSION, 'chunks': {'000': entry}}, chunk_path
+
+
+def expected_entry(df, offset, chunk_path, start=30.0, end=60.0):
+    telemetry_hash = chunk_manifest.hash_telemetry_slice(df, offset, start, end)
+    return chunk_manifest.chunk_entry(start, end, 1920, 1080, 30, "config", telemetry_hash, chunk_path)
+
+
+def test_unchanged_chunk_is_reused(tmp_path):
+    df = ride()
+    manifest, chunk_path = recorded_chunk(tmp_path, df, 5.0)
+    assert chunk_manifest.is_chunk_valid(manifest, '000', expected_entry(df, 5.0, chunk_path), str(tmp_path))
+
+
+def test_edit_inside_window_invalidates(tmp_path):
+    df = ride()
+    manifest, chunk_path = recorded_chunk(tmp_path, df, 5.0)
+    edited = df.copy()
+    # Chunk 30-60 s at offset 5 reads rows 35-65
+    edited.iloc[50, 0] = -1.0
+    assert not chunk_manifest.is_chunk_valid(manifest, '000', expected_entry(edited, 5.0, chunk_path), str(tmp_path))
+
+
+def test_edit_outside_window_keeps_chunk(tmp_path):
+    df = ride()
+    manifest, chunk_path = recorded_chunk(tmp_path, df, 5.0)
+    edited = df.copy()
+    edited.iloc[100, 0] = -1.0
+    assert chunk_manifest.is_chunk_valid(manifest, '000', expected_entry(edited, 5.0, chunk_path), str(tmp_path))
+
+
+def test_offset_change_invalidates(tmp_path):
+    df = ride()
+    manifest, chunk_path = recorded_chunk(tmp_path, df, 5.0)
+    for offset in (6.0, 5.5):
+        assert not chunk_manifest.is_chunk_valid(
+            manifest, '000', expected_entry(df, offset, chunk_path), str(tmp_path))
+
+
+def test_window_clamped_at_both_ends_still_tracks_offset():
+    df = ride(10)
+    # The chunk overhangs the 10 s track at both ends for all these offsets
+    assert chunk_manifest.telemetry_window(df, -20.0, 0.0, 60.0) == chunk_manifest.telemetry_window(df, -30.0, 0.0, 60.0)
+    hashes = {chunk_manifest.hash_telemetry_slice(df, offset, 0.0, 60.0) for offset in (-20.0, -30.0, -40.0)}
+    assert len(hashes) == 3
+
+
+def test_column_restriction_ignores_other_columns():
+    df = ride()
+    edited = df.copy()
+    edited['speed_mph'] = 25.0
+    assert (chunk_manifest.hash_telemetry_slice(df, 0.0, 30.0, 60.0, columns=['power'])
+            == chunk_manifest.hash_telemetry_slice(edited, 0.0, 30.0, 60.0, columns=['power']))
+    assert (chunk_manifest.hash_telemetry_slice(df, 0.0, 30.0, 60.0)
+            != chunk_manifest.hash_telemetry_slice(edited, 0.0, 30.0, 60.0))
+
+
+def test_missing_or_empty_file_invalidates(tmp_path):
+    df = ride()
+    manifest, chunk_path = recorded_chunk(tmp_path, df, 5.0)
+    expected = expected_entry(df, 5.0, chunk_path)
+    open(chunk_path, 'wb').close()
+    assert not chunk_manifest.is_chunk_valid(manifest, '000', expected, str(tmp_path))
+    os.remove(chunk_path)
+    assert not chunk_manifest.is_chunk_valid(manifest, '000', expected, str(tmp_path))
+
+
+def test_manifest_round_trip_and_corrupt_file(tmp_path):
+    path = os.path.join(str(tmp_path), chunk_manifest.MANIFEST_NAME)
+    manifest, _ = recorded_chunk(tmp_path, ride(), 0.0)
+    chunk_manifest.save_manifest(path, manifest)
+    assert chunk_manifest.load_manifest(path) == manifest
+    with open(path, 'w') as f:
+        f.write("{not json")
+    assert chunk_manifest.load_manifest(path)['chunks'] == {}
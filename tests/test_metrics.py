@@ -0,0 +1,80 @@
+"""
+Derived metrics (src/core/metrics.py) against straightforward reference loops.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.metrics import (
+    rolling_mean, trailing_max, build_sparse_table, range_query, normalized_power,
+    hr_zones, metric_info, required_metrics, add_metrics,
+)
+
+
+def power(seconds=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.clip(rng.normal(220, 90, seconds), 0, None)
+
+
+def test_rolling_mean_matches_a_loop():
+    values = power()
+    for window in (1, 3, 30, 2000):
+        expected = [values[max(0, i - window + 1):i + 1].mean() for i in range(len(values))]
+        np.testing.assert_allclose(rolling_mean(values, window), expected)
+
+
+def test_trailing_max_matches_a_loop():
+    values = power()
+    for window in (1, 2, 7, 60, 300, 5000):
+        expected = [values[max(0, i - window + 1):i + 1].max() for i in range(len(values))]
+        np.testing.assert_array_equal(trailing_max(values, window), expected)
+
+
+def test_sparse_table_range_minimum():
+    values = power(257)
+    table = build_sparse_table(values, np.minimum)
+    rng = np.random.default_rng(1)
+    starts = rng.integers(0, len(values), 500)
+    ends = np.minimum(len(values) - 1, starts + rng.integers(0, 100, 500))
+    expected = [values[s:e + 1].min() for s, e in zip(starts, ends)]
+    np.testing.assert_array_equal(range_query(table, starts, ends, np.minimum), expected)
+
+
+def test_normalized_power_of_steady_power_is_that_power():
+    np.testing.assert_allclose(normalized_power(np.full(600, 250.0)), 250.0)
+    # Surges weigh more than their average
+    surges = np.tile(np.r_[np.full(60, 400.0), np.full(60, 100.0)], 10)
+    assert normalized_power(surges)[-1] > surges.mean()
+
+
+def test_hr_zones():
+    np.testing.assert_array_equal(hr_zones(np.array([0, 100, 120, 140, 160, 180]), 190.0), [0, 1, 2, 3, 4, 5])
+
+
+def test_max_metric_names():
+    assert metric_info('power_max_5m') == ('power', "{:.0f}", "MAX 5MIN")
+    assert metric_info('grade_max_1m')[1] == "{:.1f}"
+    assert metric_info('speed') is None
+
+
+def test_add_metrics_only_what_the_config_asks_for():
+    index = pd.date_range('2026-01-01', periods=600, freq='1s', tz='UTC')
+    df = pd.DataFrame({'power': power(600), 'heart_rate': np.full(600, 150.0)}, index=index)
+    config = {
+        'power': {'enabled': True, 'metric': 'power_3s'},
+        'heart_rate': {'enabled': False, 'metric': 'hr_zone'},
+        'cadence': {'enabled': True, 'metric': 'watts_per_kg', 'weight_kg': 50},
+        'speed': {'enabled': True, 'metric': 'power_30s_max_1m'},
+    }
+    assert set(required_metrics(config)) == {'power_3s', 'watts_per_kg', 'power_30s_max_1m'}
+    out = add_metrics(df, config)
+    assert 'hr_zone' not in out
+    np.testing.assert_allclose(out['watts_per_kg'], df['power'] / 50)
+    # A max over a metric: the best 30 s power of the last minute
+    np.testing.assert_array_equal(out['power_30s_max_1m'], trailing_max(rolling_mean(df['power'].to_numpy(), 30), 60))
+    assert add_metrics(df, {}) is df
@@ -0,0 +1,37 @@
+"""
+Directory scan (src/api/scan_videos.py): clip / activity overlap, including clips
+whose creation_time tag has no time zone.
+"""
+import datetime
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.scan_videos import activity_overlap
+from src.core.metadata import creation_datetime
+
+
+UTC = datetime.timezone.utc
+SPAN = (datetime.datetime(2024, 5, 1, 9, 0, tzinfo=UTC), datetime.datetime(2024, 5, 1, 12, 0, tzinfo=UTC))
+
+
+def test_creation_time_without_zone_is_utc():
+    created = creation_datetime({'creation_time': '2024-05-01T10:00:00'})
+    assert created == datetime.datetime(2024, 5, 1, 10, 0, tzinfo=UTC)
+    assert creation_datetime({'creation_time': '2024-05-01T10:00:00.000000Z'}) == created
+    assert creation_datetime({'creation_time': 'yesterday'}) is None
+    assert creation_datetime({}) is None
+
+
+def test_overlap():
+    created = creation_datetime({'creation_time': '2024-05-01T11:59:30Z'})
+    assert activity_overlap(created, 60.0, SPAN) == 30.0
+    assert activity_overlap(created - datetime.timedelta(hours=5), 60.0, SPAN) == 0.0
+    assert activity_overlap(None, 60.0, SPAN) is None
+    assert activity_overlap(created, 60.0, None) is None
+
+
+def test_naive_creation_time_is_compared_as_utc():
+    assert activity_overlap(datetime.datetime(2024, 5, 1, 10, 0), 60.0, SPAN) == 60.0
@@ -0,0 +1,54 @@
+"""
+SMPTE timecode math (src/core/timecode.py), including drop-frame counting at
+29.97 and 59.94 fps.
+"""
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.timecode import timecode_to_frames, frames_to_timecode, shift_timecode
+
+
+def test_non_drop_frame():
+    assert frames_to_timecode(0, 25) == "00:00:00:00"
+    assert frames_to_timecode(25 * 3600 + 24, 25) == "01:00:00:24"
+    assert timecode_to_frames("01:00:00:24", 25) == 25 * 3600 + 24
+    assert frames_to_timecode(24 * 3600 * 30 + 5, 30) == "00:00:00:05"
+
+
+def test_drop_frame_skips_two_numbers_per_minute_at_2997():
+    assert frames_to_timecode(1799, 29.97, drop_frame=True) == "00:00:59;29"
+    # ;00 and ;01 do not exist at the start of minute 1
+    assert frames_to_timecode(1800, 29.97, drop_frame=True) == "00:01:00;02"
+    # ...except every tenth minute
+    assert frames_to_timecode(17982, 29.97, drop_frame=True) == "00:10:00;00"
+    assert frames_to_timecode(107892, 29.97, drop_frame=True) == "01:00:00;00"
+    assert timecode_to_frames("00:01:00;02", 29.97) == 1800
+    assert timecode_to_frames("01:00:00;00", 29.97) == 107892
+
+
+def test_drop_frame_skips_four_numbers_per_minute_at_5994():
+    assert frames_to_timecode(3600, 59.94, drop_frame=True) == "00:01:00;04"
+    assert frames_to_timecode(35964, 59.94, drop_frame=True) == "00:10:00;00"
+    assert timecode_to_frames("00:01:00;04", 59.94) == 3600
+
+
+def test_drop_frame_round_trip():
+    for fps in (29.97, 59.94):
+        for frames in range(0, 200000, 97):
+            tc = frames_to_timecode(frames, fps, drop_frame=True)
+            assert timecode_to_frames(tc, fps) == frames, tc
+
+
+def test_period_separator_is_drop_frame():
+    assert timecode_to_frames("00:01:00.02", 29.97) == 1800
+
+
+def test_shift_timecode_keeps_the_format():
+    assert shift_timecode(None, 25, 2.0) == "00:00:02:00"
+    assert shift_timecode("10:00:00:00", 25, 1.0) == "10:00:01:00"
+    # 60 s at 29.97 fps is 1798 frames, two short of the displayed minute
+    assert shift_timecode("01:00:00;00", 29.97, 60.0) == frames_to_timecode(107892 + 1798, 29.97, True)
+    assert shift_timecode("01:00:00;00", 29.97, 60.0) == "01:00:59;28"